@@ -1,4 +1,17 @@
-from django.db.models import Manager
+from django.db.models import (
+    Case,
+    ExpressionWrapper,
+    F,
+    IntegerField,
+    Manager,
+    OuterRef,
+    QuerySet,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, Greatest
 from typing import List, Dict
 
 
@@ -6,15 +19,81 @@ class BarPayrolCustomManager(Manager):
     """Custom Manager for Bar Payrolls"""
 
     def get_monthly_payments(self, queryset) -> List[Dict]:
-        response: List[Dict] = []
-
-        for q in queryset:
-            response.append(
-                {
-                    "id": q.id,
-                    "payee": q.name,
-                    "amount": q.amount_paid,
-                }
-            )
-
-        return response
+        return [
+            {"id": id_, "payee": name, "amount": amount_paid}
+            for id_, name, amount_paid in queryset.values_list("id", "name", "amount_paid")
+        ]
+
+
+class InventoryRecordQuerySet(QuerySet):
+    """Inventory batches with their breakage, sales and profitability
+    annotated by the database, for any number of batches in one query.
+
+    The model names the fields involved: sold_lookup (the quantity ordered,
+    through a reverse relation), items_field (the items a batch holds),
+    units_per_item (sellable units per item, None for one) and price_field
+    (selling price of a unit). Breakage is read from the stored broken_total.
+    """
+
+    def get_related_total(self, lookup: str) -> Coalesce:
+        totals = (
+            self.model.objects.filter(pk=OuterRef("pk"))
+            .order_by()
+            .values("pk")
+            .annotate(total=Sum(lookup))
+            .values("total")
+        )
+
+        return Coalesce(Subquery(totals, output_field=IntegerField()), 0)
+
+    def with_profitability(self):
+        model = self.model
+        price = F(model.price_field)
+        units = F(model.units_per_item) if model.units_per_item else Value(1)
+
+        return self.annotate(
+            broken_items=F("broken_total"),
+            sold_items=self.get_related_total(model.sold_lookup),
+        ).annotate(
+            estimated_revenue=ExpressionWrapper(
+                price * (F(model.items_field) - F("broken_items")) * units,
+                output_field=IntegerField(),
+            ),
+            realized_revenue=ExpressionWrapper(
+                price * F("sold_items"), output_field=IntegerField()
+            ),
+            breakage_loss=ExpressionWrapper(
+                price * F("broken_items") * units, output_field=IntegerField()
+            ),
+            estimated_profit=ExpressionWrapper(
+                F("estimated_revenue") - F("purchasing_price"), output_field=IntegerField()
+            ),
+            realized_profit=ExpressionWrapper(
+                F("realized_revenue") - F("purchasing_price"), output_field=IntegerField()
+            ),
+        )
+
+    def deduct_broken(self, quantity: int) -> int:
+        """Take quantity broken items out of the records, in one UPDATE that
+        also keeps broken_total and marks emptied records unavailable"""
+
+        return self.update(
+            available_quantity=F("available_quantity") - quantity,
+            broken_total=F("broken_total") + quantity,
+            # Right hand sides read the row before the update
+            stock_status=Case(
+                When(available_quantity__lte=quantity, then=Value("unavailable")),
+                default=F("stock_status"),
+            ),
+        )
+
+    def restore_broken(self, quantity: int) -> int:
+        """Put quantity broken items back into the records, undoing
+        deduct_broken() for a deleted broken entry"""
+
+        return self.update(
+            available_quantity=F("available_quantity") + quantity,
+            broken_total=Greatest(F("broken_total") - quantity, 0),
+            # Records hold items again
+            stock_status=Value("available") if quantity > 0 else F("stock_status"),
+        )
@@ -1,10 +1,12 @@
 from typing import Dict, List, Set
 
+from django.contrib.postgres.indexes import BrinIndex, GinIndex
 from django.db import models
+from django.db.models import Q
 from django.db.models.aggregates import Sum
 from django.db.models.manager import Manager
 
-from bar.managers import BarPayrolCustomManager
+from bar.managers import BarPayrolCustomManager, InventoryRecordQuerySet
 from core.models import (
     BaseCreditCustomerPayment,
     BaseCustomerOrderRecord,
@@ -25,6 +27,16 @@ class RegularInventoryRecord(BaseInventory):
     total_items = models.IntegerField()
     selling_price_per_item = models.IntegerField()
     threshold = models.IntegerField()
+    broken_total = models.PositiveIntegerField(
+        default=0, help_text="Leave blank: sum of the broken entries, kept by deduct_broken()"
+    )
+    objects = InventoryRecordQuerySet.as_manager()
+
+    # Fields of InventoryRecordQuerySet.with_profitability()
+    sold_lookup: str = "regularorderrecord__quantity"
+    items_field: str = "total_items"
+    units_per_item = None
+    price_field: str = "selling_price_per_item"
 
     def __str__(self) -> str:
         return str(self.item)
@@ -45,12 +57,7 @@ class RegularInventoryRecord(BaseInventory):
         return self.estimate_sales() - self.purchasing_price
 
     def total_broken_items(self) -> int:  # 34
-        return (
-            self.regularinventoryrecordbroken_set.aggregate(
-                total=Sum("quantity_broken")
-            )["total"]
-            or 0
-        )
+        return self.broken_total
 
     def get_price_of_items(self, item_quantity) -> int:
         return int(item_quantity * self.selling_price_per_item)
@@ -146,24 +153,25 @@ class RegularInventoryRecordsTrunk(models.Model):
         stock_in: List[Dict] = []
         for record in self.regular_inventory_record.select_related(
             "item", "item__unit"
-        ):
+        ).prefetch_related("regularinventoryrecordbroken_set").with_profitability():
             temp_stock_in: Dict = {
                 "id": record.id,
                 "quantity": str(record.quantity) + " " + record.item.unit.name,
                 "total_items": record.total_items,
-                "total_broken_items": record.total_broken_items(),
+                "total_broken_items": record.broken_items,
                 "purchasing_price": record.purchasing_price,
                 "selling_price_per_item": record.selling_price_per_item,
                 "available_items": record.available_quantity,
                 "threshold": record.threshold,
-                "estimated_sales": record.estimate_sales(),
-                "estimated_profit": record.estimate_profit(),
+                "estimated_sales": record.estimated_revenue,
+                "estimated_profit": record.estimated_profit,
                 "stock_status": record.get_stock_status_display(),
                 "date_purchased": record.date_purchased.__str__(),
                 "date_perished": record.date_perished.__str__(),
-                "broken_items": record.regularinventoryrecordbroken_set.values(
-                    "quantity_broken", "created_at"
-                ),
+                "broken_items": [
+                    {"quantity_broken": broken.quantity_broken, "created_at": broken.created_at}
+                    for broken in record.regularinventoryrecordbroken_set.all()
+                ],
             }
             stock_in.append(temp_stock_in)
 
@@ -215,6 +223,17 @@ class TekilaInventoryRecord(BaseInventory):
     total_shots_per_tekila = models.IntegerField()
     selling_price_per_shot = models.IntegerField()
     threshold = models.IntegerField()
+    broken_total = models.PositiveIntegerField(
+        default=0, help_text="Leave blank: sum of the broken entries, kept by deduct_broken()"
+    )
+    objects = InventoryRecordQuerySet.as_manager()
+
+    # Fields of InventoryRecordQuerySet.with_profitability(), following
+    # estimate_sales()
+    sold_lookup: str = "tequilaorderrecord__quantity"
+    items_field: str = "total_shots_per_tekila"
+    units_per_item: str = "total_shots_per_tekila"
+    price_field: str = "selling_price_per_shot"
 
     def __str__(self) -> str:
         return self.item.name
@@ -239,12 +258,7 @@ class TekilaInventoryRecord(BaseInventory):
         return self.estimate_sales() - self.purchasing_price
 
     def total_broken_items(self) -> int:  # 34
-        return (
-            self.tequilainventoryrecordbroken_set.aggregate(
-                total=Sum("quantity_broken")
-            )["total"]
-            or 0
-        )
+        return self.broken_total
 
     class Meta:
         ordering: List[str] = ["-id"]
@@ -335,23 +349,24 @@ class TequilaInventoryRecordsTrunk(models.Model):
         stock_in: List[Dict] = []
         for record in self.tequila_inventory_record.select_related(
             "item", "item__unit"
-        ):
+        ).prefetch_related("tequilainventoryrecordbroken_set").with_profitability():
             temp_stock_in: Dict = {
                 "id": record.id,
                 "quantity": str(record.quantity) + " " + record.item.unit.name,
                 "total_shots": record.total_shots_per_tekila,
-                "total_broken_items": record.total_broken_items(),
+                "total_broken_items": record.broken_items,
                 "selling_price_per_item": record.selling_price_per_shot,
                 "available_items": record.available_quantity,
                 "threshold": record.threshold,
-                "estimated_sales": record.estimate_sales(),
-                "estimated_profit": record.estimate_profit(),
+                "estimated_sales": record.estimated_revenue,
+                "estimated_profit": record.estimated_profit,
                 "stock_status": record.get_stock_status_display(),
                 "date_purchased": record.date_purchased.__str__(),
                 "date_perished": record.date_perished.__str__(),
-                "broken_items": record.tequilainventoryrecordbroken_set.values(
-                    "quantity_broken", "created_at"
-                ),
+                "broken_items": [
+                    {"quantity_broken": broken.quantity_broken, "created_at": broken.created_at}
+                    for broken in record.tequilainventoryrecordbroken_set.all()
+                ],
             }
             stock_in.append(temp_stock_in)
 
@@ -416,7 +431,11 @@ class TequilaOrderRecord(BaseOrderRecord):
                     "created_by",
                     "date_created",
                 ]
-            )
+            ),
+            models.Index(fields=["item", "date_created"]),
+            # Rows are appended in date order: a few pages of block ranges
+            # narrow day and month scans down to the recent blocks
+            BrinIndex(fields=["date_created"], name="tequila_order_date_brin"),
         ]
 
 
@@ -492,7 +511,11 @@ class CustomerTequilaOrderRecord(BaseCustomerOrderRecord):
                     "created_by",
                     "date_created",
                 ]
-            )
+            ),
+            GinIndex(fields=["search_name"], opclasses=["gin_trgm_ops"], name="tequila_cust_name_trgm"),
+            models.Index(
+                fields=["search_phone"], opclasses=["varchar_pattern_ops"], name="tequila_cust_phone_prefix"
+            ),
         ]
 
 
@@ -572,7 +595,9 @@ class RegularOrderRecord(BaseOrderRecord):
                     "created_by",
                     "date_created",
                 ]
-            )
+            ),
+            models.Index(fields=["item", "date_created"]),
+            BrinIndex(fields=["date_created"], name="regular_order_date_brin"),
         ]
 
 
@@ -652,7 +677,11 @@ class CustomerRegularOrderRecord(BaseCustomerOrderRecord):
                     "created_by",
                     "date_created",
                 ]
-            )
+            ),
+            GinIndex(fields=["search_name"], opclasses=["gin_trgm_ops"], name="regular_cust_name_trgm"),
+            models.Index(
+                fields=["search_phone"], opclasses=["varchar_pattern_ops"], name="regular_cust_phone_prefix"
+            ),
         ]
 
 
@@ -1022,7 +1051,16 @@ class CustomerRegularTequilaOrderRecord(BaseCustomerOrderRecord):
                     "created_by",
                     "date_created",
                 ]
-            )
+            ),
+            BrinIndex(fields=["date_created"], name="bar_customer_order_date_brin"),
+            GinIndex(fields=["search_name"], opclasses=["gin_trgm_ops"], name="bar_cust_name_trgm"),
+            models.Index(
+                fields=["search_phone"], opclasses=["varchar_pattern_ops"], name="bar_cust_phone_prefix"
+            ),
+            # Only the open orders: the orders list reads them every time
+            models.Index(
+                fields=["date_created"], name="bar_open_customer_orders", condition=~Q(status="paid")
+            ),
         ]
 
 
@@ -1063,7 +1101,8 @@ class CustomerRegularTequilaOrderRecordPayment(BasePayment):
                     "date_paid",
                     "created_by",
                 ]
-            )
+            ),
+            BrinIndex(fields=["date_paid"], name="bar_payment_date_brin"),
         ]
 
 
@@ -1091,7 +1130,8 @@ class CreditCustomerRegularTequilaOrderRecordPayment(BaseCreditCustomerPayment):
                     "date_created",
                     "amount_paid",
                 ]
-            )
+            ),
+            models.Index(fields=["customer", "date_created"]),
         ]
 
 
@@ -1141,7 +1181,22 @@ class BarPayrol(BasePayrol):
     bar_payer = models.ForeignKey(
         User, related_name="bar_payer", on_delete=models.CASCADE
     )
+    payee = models.ForeignKey(
+        User,
+        related_name="bar_payrolls",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        help_text="The paid worker; name is kept for display and older payments",
+    )
     objects = BarPayrolCustomManager()
 
     def __str__(self) -> str:
         return f"{self.name} Paid: {self.amount_paid}"
+
+    class Meta(BasePayrol.Meta):
+        indexes = [
+            models.Index(fields=["payment_method", "amount_paid", "date_paid"]),
+            models.Index(fields=["payee", "date_paid"], name="bar_payrol_payee_date"),
+            models.Index(fields=["date_paid"], name="bar_payrol_date"),
+        ]
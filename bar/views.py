@@ -1,7 +1,10 @@
 import datetime
 from typing import Dict, List
 
+from django.db import transaction
+from django.db.models import Count, F, Q
 from django.db.models.aggregates import Sum
+from django.db.models.functions import TruncDate
 from django.utils import timezone
 from rest_framework import status, viewsets, serializers
 from rest_framework.decorators import action
@@ -30,6 +33,7 @@ from bar.models import (
     BarPayrol, RegularInventoryRecordsTrunk, RegularInventoryRecordBroken, TequilaInventoryRecordsTrunk,
     TequilaInventoryRecordBroken,
 )
+from bar.pagination import OrdersHistoryPagination
 from bar.serializers import (
     CreditCustomerRegularOrderRecordPaymentHistorySerializer,
     CreditCustomerRegularTequilaOrderRecordPaymentHistorySerializer,
@@ -46,15 +50,71 @@ from bar.serializers import (
     OrderRecordSerializer,
     BarPayrolSerializer,
 )
-from core.models import CreditCustomer, Item
+from core.models import CreditCustomer, Item, StockMovement
+from core.movements import record_movements
+from core.payroll import get_month_range, get_payee, get_payee_totals
+from core.search import MAX_PAGE_SIZE, search_queryset
+from core.serialization import FlatSerializer, date_part, time_part
 from core.serializers import InventoryItemSerializer
-from core.utils import get_date_objects, orders_number_generator, validate_dates
+from core.sync import log_change
+from core.utils import get_date_objects, get_day_range, orders_number_generator, validate_dates
 from restaurant.utils import send_notification
 from user.models import User
 
 
 # import uuid
 
+PROFITABILITY_ACTIONS = (
+    "estimate_total_cash_after_sale",
+    "estimate_profit_after_sale",
+    "get_profitability",
+)
+PROFITABILITY_FIELDS = (
+    "purchasing_price",
+    "sold_items",
+    "broken_items",
+    "realized_revenue",
+    "estimated_revenue",
+    "breakage_loss",
+    "realized_profit",
+    "estimated_profit",
+)
+
+
+def get_batch_profitability(queryset, params, items_field: str) -> Dict:
+    """Profitability of every batch of queryset (annotated by
+    with_profitability()) matching the item and date params, and their totals"""
+
+    if params.get("item"):
+        try:
+            queryset = queryset.filter(item_id=int(params["item"]))
+        except ValueError:
+            raise ValidationError({"message": "item must be a number."})
+    if params.get("from_date") and params.get("to_date"):
+        try:
+            from_date, to_date = get_date_objects(params["from_date"], params["to_date"])
+        except (ValueError, OverflowError):
+            raise ValidationError({"message": "Invalid dates."})
+        if validate_dates(from_date, to_date):
+            raise ValidationError({"message": "from_date must be less than or equal to to_date"})
+        queryset = queryset.filter(date_purchased__range=(from_date, to_date))
+
+    batches: List[Dict] = list(
+        queryset.values(
+            "id",
+            "item",
+            "date_purchased",
+            "stock_status",
+            "available_quantity",
+            items_field,
+            *PROFITABILITY_FIELDS,
+            item_name=F("item__name"),
+        )
+    )
+    totals: Dict = {field: sum(batch[field] for batch in batches) for field in PROFITABILITY_FIELDS}
+
+    return {"batches": batches, "totals": totals}
+
 
 class BarInventoryItemView(ListAPIView):
     serializer_class = InventoryItemSerializer
@@ -63,6 +123,67 @@ class BarInventoryItemView(ListAPIView):
         return Item.objects.filter(item_for__in=["bar", "both"])
 
 
+def get_trunk_orders_history(request, view, queryset, price_field: str, quantity_key: str) -> Response:
+    """Cursor paginated orders of a trunk, optionally within from_date and to_date,
+    with per day totals computed by the database on the first page."""
+
+    from_date = request.query_params.get("from_date")
+    to_date = request.query_params.get("to_date")
+    if from_date and to_date:
+        try:
+            from_date, to_date = get_date_objects(from_date, to_date)
+        except (ValueError, OverflowError):
+            raise serializers.ValidationError({"message": "Invalid dates."})
+        if validate_dates(from_date, to_date):
+            raise serializers.ValidationError(
+                {"message": "from_date must be less than or equal to to_date"}
+            )
+        start, end = get_day_range(from_date, to_date)
+        queryset = queryset.filter(date_created__gte=start, date_created__lt=end)
+
+    paginator = OrdersHistoryPagination()
+    rows = paginator.paginate_queryset(
+        queryset.annotate(total_price=F("quantity") * F(price_field)).values(
+            "id", "quantity", "order_number", "total_price", "date_created", "created_by__username"
+        ),
+        request,
+        view=view,
+    )
+    orders_history: List[Dict] = [
+        {
+            "id": row["id"],
+            quantity_key: row["quantity"],
+            "order_number": row["order_number"],
+            "total_price": row["total_price"],
+            "created_by": row["created_by__username"],
+            "date_created": str(timezone.localtime(row["date_created"]).date()),
+        }
+        for row in rows
+    ]
+    response = paginator.get_paginated_response(orders_history)
+
+    if not request.query_params.get(paginator.cursor_query_param):
+        response.data["daily_totals"] = [
+            {
+                "date": str(row["day"]),
+                "orders": row["orders"],
+                quantity_key: row["quantity_total"],
+                "total_price": row["total_price"],
+            }
+            for row in queryset.annotate(day=TruncDate("date_created"))
+            .values("day")
+            .annotate(
+                orders=Count("id"),
+                # Named apart from the quantity field, which total_price multiplies
+                quantity_total=Sum("quantity"),
+                total_price=Sum(F("quantity") * F(price_field)),
+            )
+            .order_by("-day")
+        ]
+
+    return response
+
+
 class RegularInventoryRecordsTrunkView(viewsets.ModelViewSet):
     """  """
 
@@ -98,17 +219,13 @@ class RegularInventoryRecordsTrunkView(viewsets.ModelViewSet):
     def get_orders_history(self, request, pk=None):
         try:
             trunk = RegularInventoryRecordsTrunk.objects.get(id=pk)
-            orders_history: List[Dict] = []
-            for record in trunk.regular_inventory_record.all():
-                for order in record.regularorderrecord_set.values():
-                    temp = {
-                        "id": order["id"],
-                        "item_quantity": order["quantity"],
-                        "order_number": order["order_number"],
-                        "date_created": str(order["date_created"].date()),
-                    }
-                    orders_history.append(temp)
-            return Response(data=orders_history, status=status.HTTP_200_OK)
+            return get_trunk_orders_history(
+                request,
+                self,
+                RegularOrderRecord.objects.filter(item__item_id=trunk.item_id),
+                price_field="item__selling_price_per_item",
+                quantity_key="item_quantity",
+            )
         except RegularInventoryRecordsTrunk.DoesNotExist:
             return Response(data={"message": "Not Contents"}, status=status.HTTP_204_NO_CONTENT)
 
@@ -124,7 +241,147 @@ class RegularInventoryRecordsTrunkView(viewsets.ModelViewSet):
             return Response(data={"message": "Not Contents"}, status=status.HTTP_204_NO_CONTENT)
 
 
-class RegularInventoryBrokenCreateView(viewsets.ModelViewSet):
+def record_broken_items(
+    model, broken_model, record_field: str, section: str, entries: List[Dict], created_by_id=None
+) -> List[Dict]:
+    """Record the broken entries of many inventory records, all or none.
+    The records are locked in id order, so concurrent calls neither
+    interleave their checks nor deadlock, and each is updated once with F()."""
+
+    quantities: Dict[int, int] = {}
+    for entry in entries:
+        quantities[entry["record_id"]] = quantities.get(entry["record_id"], 0) + entry["quantity_broken"]
+
+    with transaction.atomic():
+        records: Dict[int, object] = {
+            record.id: record
+            for record in model.objects.select_for_update().filter(id__in=quantities).order_by("id")
+        }
+        errors: List[str] = []
+        for record_id, quantity in quantities.items():
+            record = records.get(record_id)
+            if record is None:
+                errors.append(f"Inventory record {record_id} does not exist")
+            elif (record.available_quantity or 0) < quantity:
+                errors.append(
+                    f"Quantity broken of inventory record {record_id} must be less than or "
+                    f"equal to {record.available_quantity}"
+                )
+        if errors:
+            raise ValidationError({"message": errors})
+
+        # bulk_create sends no post_save, so the signal does not deduct again
+        broken_model.objects.bulk_create(
+            [
+                broken_model(**{record_field: records[entry["record_id"]]}, quantity_broken=entry["quantity_broken"])
+                for entry in entries
+            ]
+        )
+        for record_id, quantity in quantities.items():
+            model.objects.filter(id=record_id).deduct_broken(quantity)
+        record_movements(
+            [
+                StockMovement(
+                    item_id=records[record_id].item_id,
+                    section=section,
+                    kind="breakage",
+                    quantity=-quantity,
+                    record_id=record_id,
+                    created_by_id=created_by_id,
+                )
+                for record_id, quantity in quantities.items()
+            ]
+        )
+
+        return list(
+            model.objects.filter(id__in=quantities)
+            .order_by("id")
+            .values("id", "item", "available_quantity", "broken_total", "stock_status")
+        )
+
+
+class BrokenItemsMixin:
+    """Create broken items one at a time (create) or many in one call (bulk),
+    and delete a mistaken entry (destroy). Subclasses name the inventory record model, its broken model, the
+    broken model's foreign key, the low stock section and the synced trunks."""
+
+    MAX_ENTRIES: int = 200
+    record_model = None
+    broken_model = None
+    record_field: str = ""
+    section: str = ""
+
+    class BulkSerializer(serializers.Serializer):
+        class EntrySerializer(serializers.Serializer):
+            record_id = serializers.IntegerField()
+            quantity_broken = serializers.IntegerField(min_value=1)
+
+        items = EntrySerializer(many=True, allow_empty=False)
+
+    def record(self, entries: List[Dict]) -> List[Dict]:
+        records: List[Dict] = record_broken_items(
+            self.record_model,
+            self.broken_model,
+            self.record_field,
+            self.section,
+            entries,
+            self.request.user.id,
+        )
+        for item_id in {record["item"] for record in records}:
+            log_change(f"{self.section}_trunks", item_id)
+
+        return records
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.record(
+            [
+                {
+                    "record_id": serializer.validated_data.get(f"{self.record_field}_id"),
+                    "quantity_broken": serializer.validated_data.get("quantity_broken"),
+                }
+            ]
+        )
+
+        return Response(status=status.HTTP_201_CREATED)
+
+    def destroy(self, request, *args, **kwargs):
+        """Delete a broken entry: the post_delete signal puts its items back
+        into the record and the ledger records them as an adjustment"""
+
+        with transaction.atomic():
+            instance = self.get_object()
+            record = getattr(instance, self.record_field)
+            instance.delete()
+            record_movements(
+                [
+                    StockMovement(
+                        item_id=record.item_id,
+                        section=self.section,
+                        kind="adjustment",
+                        quantity=instance.quantity_broken,
+                        record_id=record.id,
+                        created_by_id=request.user.id,
+                    )
+                ]
+            )
+            log_change(f"{self.section}_trunks", record.item_id)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=["POST"])
+    def bulk(self, request, *args, **kwargs):
+        serializer = self.BulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        entries: List[Dict] = serializer.validated_data["items"]
+        if len(entries) > self.MAX_ENTRIES:
+            raise ValidationError({"message": f"At most {self.MAX_ENTRIES} items per call"})
+
+        return Response(data={"records": self.record(entries)}, status=status.HTTP_201_CREATED)
+
+
+class RegularInventoryBrokenCreateView(BrokenItemsMixin, viewsets.ModelViewSet):
     """ Create Broken Items For Regular Inventory """
 
     class InputSerializer(serializers.Serializer):
@@ -137,28 +394,16 @@ class RegularInventoryBrokenCreateView(viewsets.ModelViewSet):
             return quantity_broken
 
     serializer_class = InputSerializer
+    record_model = RegularInventoryRecord
+    broken_model = RegularInventoryRecordBroken
+    record_field = "regular_inventory_record"
+    section = "regular"
 
     def get_queryset(self):
         return RegularInventoryRecordBroken.objects.select_related("regular_inventory_record")
 
-    def create(self, request, *args, **kwargs):
-        serializer = self.serializer_class(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        regular_inventory_record_id = serializer.validated_data.get("regular_inventory_record_id")
-        quantity_broken = serializer.validated_data.get("quantity_broken")
-        regular_inventory_record = RegularInventoryRecord.objects.get(id=regular_inventory_record_id)
-        if regular_inventory_record.available_quantity < quantity_broken:
-            raise serializers.ValidationError(
-                f"Quantity broken must be less than or equal to {regular_inventory_record.available_quantity}")
-        RegularInventoryRecordBroken.objects.create(
-            regular_inventory_record=regular_inventory_record,
-            quantity_broken=quantity_broken
-        )
 
-        return Response(status=status.HTTP_201_CREATED)
-
-
-class TequilaInventoryBrokenCreateView(viewsets.ModelViewSet):
+class TequilaInventoryBrokenCreateView(BrokenItemsMixin, viewsets.ModelViewSet):
     """ Create Broken Items For Tequila Inventory """
 
     class InputSerializer(serializers.Serializer):
@@ -171,26 +416,14 @@ class TequilaInventoryBrokenCreateView(viewsets.ModelViewSet):
             return quantity_broken
 
     serializer_class = InputSerializer
+    record_model = TekilaInventoryRecord
+    broken_model = TequilaInventoryRecordBroken
+    record_field = "tequila_inventory_record"
+    section = "tequila"
 
     def get_queryset(self):
         return TequilaInventoryRecordBroken.objects.select_related("tequila_inventory_record")
 
-    def create(self, request, *args, **kwargs):
-        serializer = self.serializer_class(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        tequila_inventory_record_id = serializer.validated_data.get("tequila_inventory_record_id")
-        quantity_broken = serializer.validated_data.get("quantity_broken")
-        tequila_inventory_record = TekilaInventoryRecord.objects.get(id=tequila_inventory_record_id)
-        if tequila_inventory_record.available_quantity < quantity_broken:
-            raise serializers.ValidationError(
-                f"Quantity broken must be less than or equal to {tequila_inventory_record.available_quantity}")
-        TequilaInventoryRecordBroken.objects.create(
-            tequila_inventory_record=tequila_inventory_record,
-            quantity_broken=quantity_broken
-        )
-
-        return Response(status=status.HTTP_201_CREATED)
-
 
 class RegularInventoryRecordViewSet(viewsets.ModelViewSet):
     """  """
@@ -198,7 +431,10 @@ class RegularInventoryRecordViewSet(viewsets.ModelViewSet):
     serializer_class = RegularInventoryRecordSerializer
 
     def get_queryset(self):
-        return RegularInventoryRecord.objects.select_related("item", "item__unit")
+        queryset = RegularInventoryRecord.objects.select_related("item", "item__unit")
+        if self.action in PROFITABILITY_ACTIONS:
+            return queryset.with_profitability()
+        return queryset
 
     def retrieve(self, request, pk=None):
         instance = self.get_object()
@@ -240,7 +476,7 @@ class RegularInventoryRecordViewSet(viewsets.ModelViewSet):
         return Response(
             {
                 "estimated_total_cash_after_sale": float(
-                    self.get_object().estimate_sales()
+                    self.get_object().estimated_revenue
                 )
             },
             status.HTTP_200_OK,
@@ -252,7 +488,20 @@ class RegularInventoryRecordViewSet(viewsets.ModelViewSet):
     )
     def estimate_profit_after_sale(self, request, pk=None):
         return Response(
-            {"estimated_profit_after_sale": float(self.get_object().estimate_profit())},
+            {"estimated_profit_after_sale": float(self.get_object().estimated_profit)},
+            status.HTTP_200_OK,
+        )
+
+    @action(
+        detail=False,
+        methods=["GET"],
+    )
+    def get_profitability(self, request, *args, **kwargs):
+        """Realized and estimated revenue, breakage and profit per batch, for
+        an item's trunk (?item=) and/or a purchase date range"""
+
+        return Response(
+            get_batch_profitability(self.get_queryset(), request.query_params, "total_items"),
             status.HTTP_200_OK,
         )
 
@@ -261,7 +510,10 @@ class TekilaInventoryRecordViewSet(viewsets.ModelViewSet):
     serializer_class = TekilaInventoryRecordSerializer
 
     def get_queryset(self):
-        return TekilaInventoryRecord.objects.select_related("item", "item__unit")
+        queryset = TekilaInventoryRecord.objects.select_related("item", "item__unit")
+        if self.action in PROFITABILITY_ACTIONS:
+            return queryset.with_profitability()
+        return queryset
 
     def retrieve(self, request, pk=None):
         instance = self.get_object()
@@ -302,7 +554,7 @@ class TekilaInventoryRecordViewSet(viewsets.ModelViewSet):
     )
     def estimate_total_cash_after_sale(self, request, pk=None) -> Response:
         return Response(
-            {"estimated_total_cash_after_sale": self.get_object().estimate_sales()},
+            {"estimated_total_cash_after_sale": self.get_object().estimated_revenue},
             status.HTTP_200_OK,
         )
 
@@ -312,7 +564,22 @@ class TekilaInventoryRecordViewSet(viewsets.ModelViewSet):
     )
     def estimate_profit_after_sale(self, request, pk=None) -> Response:
         return Response(
-            {"estimated_profit_after_sale": self.get_object().estimate_profit()},
+            {"estimated_profit_after_sale": self.get_object().estimated_profit},
+            status.HTTP_200_OK,
+        )
+
+    @action(
+        detail=False,
+        methods=["GET"],
+    )
+    def get_profitability(self, request, *args, **kwargs) -> Response:
+        """Realized and estimated revenue, breakage and profit per batch, for
+        an item's trunk (?item=) and/or a purchase date range"""
+
+        return Response(
+            get_batch_profitability(
+                self.get_queryset(), request.query_params, "total_shots_per_tekila"
+            ),
             status.HTTP_200_OK,
         )
 
@@ -352,17 +619,13 @@ class TequilaInventoryRecordsTrunkView(viewsets.ModelViewSet):
     def get_orders_history(self, request, pk=None):
         try:
             trunk = TequilaInventoryRecordsTrunk.objects.get(id=pk)
-            orders_history: List[Dict] = []
-            for record in trunk.tequila_inventory_record.all():
-                for order in record.tequilaorderrecord_set.values():
-                    temp = {
-                        "id": order["id"],
-                        "shots_quantity": order["quantity"],
-                        "order_number": order["order_number"],
-                        "date_created": str(order["date_created"].date()),
-                    }
-                    orders_history.append(temp)
-            return Response(data=orders_history, status=status.HTTP_200_OK)
+            return get_trunk_orders_history(
+                request,
+                self,
+                TequilaOrderRecord.objects.filter(item__item_id=trunk.item_id),
+                price_field="item__selling_price_per_shot",
+                quantity_key="shots_quantity",
+            )
         except TequilaInventoryRecordsTrunk.DoesNotExist:
             return Response(data={"message": "Not Contents"}, status=status.HTTP_204_NO_CONTENT)
 
@@ -403,6 +666,16 @@ class BarRegularItemViewSet(viewsets.ModelViewSet):
 
 class RegularOrderRecordViewSet(viewsets.ModelViewSet):
     serializer_class = OrderRecordSerializer
+    output_serializer = FlatSerializer(
+        id="id",
+        item="item__item__name",
+        ordered_quantity="quantity",
+        total_price="total_price",
+        order_number="order_number",
+        created_by="created_by__username",
+        date_created=("date_created", date_part),
+        time_created=("date_created", time_part),
+    )
 
     def get_queryset(self):
         return RegularOrderRecord.objects.select_related(
@@ -419,32 +692,16 @@ class RegularOrderRecordViewSet(viewsets.ModelViewSet):
                 "total_price": instance.total,
                 "order_number": instance.order_number,
                 "created_by": instance.created_by.username,
-                "date_created": str(instance.date_created).split(" ")[0],
-                "time_created": str(instance.date_created).split(" ")[1].split(".")[0],
+                "date_created": date_part(instance.date_created),
+                "time_created": time_part(instance.date_created),
             },
             status.HTTP_200_OK,
         )
 
     def list(self, request, *args, **kwargs):
-        response: List[Dict] = []
-        [
-            response.append(
-                {
-                    "id": record.id,
-                    "item": record.item.item.name,
-                    "ordered_quantity": record.quantity,
-                    "total_price": record.total,
-                    "order_number": record.order_number,
-                    "created_by": record.created_by.username,
-                    "date_created": str(record.date_created).split(" ")[0],
-                    "time_created": str(record.date_created)
-                        .split(" ")[1]
-                        .split(".")[0],
-                }
-            )
-            for record in self.queryset
-        ]
-        return Response(response, status.HTTP_200_OK)
+        queryset = self.get_queryset().annotate(total_price=F("quantity") * F("item__selling_price_per_item"))
+
+        return Response(self.output_serializer.serialize(queryset), status.HTTP_200_OK)
 
     def create(self, request, *args, **kwargs):
         serializer = self.serializer_class(data=request.data)
@@ -455,7 +712,7 @@ class RegularOrderRecordViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, request):
         object_ = RegularOrderRecord.objects.create(
-            item=RegularInventoryRecord.objects.get(id=request.data.get("item")),
+            item=RegularInventoryRecord.objects.select_related("item").get(id=request.data.get("item")),
             quantity=request.data.get("quantity"),
             order_number=str(
                 orders_number_generator(RegularOrderRecord, "order_number")
@@ -524,14 +781,14 @@ class CustomerRegularOrderRecordViewSet(viewsets.ModelViewSet):
             "customer_orders_number": object_.customer_orders_number,
             "orders": object_.get_orders_detail,
             "created_by": object_.created_by.username,
-            "date_created": str(object_.date_created).split(" ")[0],
-            "time_created": str(object_.date_created).split(" ")[1].split(".")[0],
+            "date_created": date_part(object_.date_created),
+            "time_created": time_part(object_.date_created),
         }
 
     def add_orders(self, request, object_):
         for _ in request.data.get("orders"):
             order = RegularOrderRecord.objects.create(
-                item=RegularInventoryRecord.objects.get(id=int(_["menu_id"])),
+                item=RegularInventoryRecord.objects.select_related("item").get(id=int(_["menu_id"])),
                 quantity=_["quantity"],
                 order_number=str(
                     orders_number_generator(RegularOrderRecord, "order_number")
@@ -554,10 +811,8 @@ class CustomerRegularOrderRecordViewSet(viewsets.ModelViewSet):
     )
     def search(self, request, *args, **kwargs):
         try:
-            customer_name = request.data["customer_name"]
-            results = CustomerRegularOrderRecord.objects.filter(
-                customer_name=customer_name
-            )
+            customer_name = request.query_params.get("customer_name") or request.data["customer_name"]
+            results = search_queryset(CustomerRegularOrderRecord.objects.all(), customer_name)[:MAX_PAGE_SIZE]
             return Response(self.get_list(results), status.HTTP_200_OK)
         except KeyError:
             return Response(
@@ -569,8 +824,8 @@ class CustomerRegularOrderRecordViewSet(viewsets.ModelViewSet):
         methods=["GET"],
     )
     def get_today_orders(self, request, *args, **kwargs):
-        today_date = timezone.localdate()
-        qs = self.queryset.filter(date_created__date=today_date)
+        start, end = get_day_range(timezone.localdate())
+        qs = self.queryset.filter(date_created__gte=start, date_created__lt=end)
         response = self.append_orders(qs)
 
         return Response(response, status.HTTP_200_OK)
@@ -626,6 +881,14 @@ class CustomerRegularOrderRecordViewSet(viewsets.ModelViewSet):
 
 class CustomerRegularOrderRecordPaymentViewSet(viewsets.ModelViewSet):
     serializer_class = CustomerOrderRecordPaymentSerializer
+    paid_serializer = FlatSerializer(
+        customer_name="customer_order_record__customer_name",
+        customer_phone="customer_order_record__customer_phone",
+        customer_orders_number="customer_order_record__customer_orders_number",
+        paid_amount=("amount_paid", float),
+        date_paid=("date_paid", date_part),
+        time_paid=("date_paid", time_part),
+    )
     today = timezone.localdate()
 
     def get_queryset(self):
@@ -646,8 +909,8 @@ class CustomerRegularOrderRecordPaymentViewSet(viewsets.ModelViewSet):
             "amount_remaining": float(instance.get_remaining_amount),
             "orders": instance.customer_order_record.get_orders_detail,
             "created_by": instance.created_by.username,
-            "date_paid": str(instance.date_paid).split(" ")[0],
-            "time_paid": str(instance.date_paid).split(" ")[1].split(".")[0],
+            "date_paid": date_part(instance.date_paid),
+            "time_paid": time_part(instance.date_paid),
         }
         return Response(response, status.HTTP_200_OK)
 
@@ -673,8 +936,8 @@ class CustomerRegularOrderRecordPaymentViewSet(viewsets.ModelViewSet):
                     "remained_amount": float(payment.get_remaining_amount),
                     "orders": payment.customer_order_record.get_orders_detail,
                     "created_by": payment.created_by.username,
-                    "date_paid": str(payment.date_paid).split(" ")[0],
-                    "time_paid": str(payment.date_paid).split(" ")[1].split(".")[0],
+                    "date_paid": date_part(payment.date_paid),
+                    "time_paid": time_part(payment.date_paid),
                 }
             )
             for payment in objects
@@ -823,22 +1086,9 @@ class CustomerRegularOrderRecordPaymentViewSet(viewsets.ModelViewSet):
         methods=["GET"],
     )
     def get_all_paid(self, request, *args, **kwargs):
-        res: List[Dict] = []
         filtered_qs = self.get_queryset().filter(payment_status="paid")
-        [
-            res.append(
-                {
-                    "customer_name": qs.customer_order_record.customer_name,
-                    "customer_phone": qs.customer_order_record.customer_phone,
-                    "customer_orders_number": qs.customer_order_record.customer_orders_number,
-                    "paid_amount": float(qs.amount_paid),
-                    "date_paid": str(qs.date_paid).split(" ")[0],
-                    "time_paid": str(qs.date_paid).split(" ")[1].split(".")[0],
-                }
-            )
-            for qs in filtered_qs
-        ]
-        return Response(res, status.HTTP_200_OK)
+
+        return Response(self.paid_serializer.serialize(filtered_qs), status.HTTP_200_OK)
 
     @action(
         detail=False,
@@ -856,8 +1106,8 @@ class CustomerRegularOrderRecordPaymentViewSet(viewsets.ModelViewSet):
                     "payable_amount": qs.get_total_amount_to_pay,
                     "paid_amount": qs.amount_paid,
                     "remaining_amount": qs.get_remaining_amount,
-                    "date_paid": str(qs.date_paid).split(" ")[0],
-                    "time_paid": str(qs.date_paid).split(" ")[1].split(".")[0],
+                    "date_paid": date_part(qs.date_paid),
+                    "time_paid": time_part(qs.date_paid),
                 }
             )
             for qs in filtered_qs
@@ -910,8 +1160,8 @@ class RegularTequilaOrderRecordViewSet(viewsets.ModelViewSet):
                 "regular_orders": instance.get_regular_items_details(),
                 "tequila_orders": instance.get_tequila_items_details(),
                 "created_by": instance.created_by.username,
-                "date_created": str(instance.date_created).split(" ")[0],
-                "time_created": str(instance.date_created).split(" ")[1].split(".")[0],
+                "date_created": date_part(instance.date_created),
+                "time_created": time_part(instance.date_created),
             },
             status.HTTP_200_OK,
         )
@@ -927,10 +1177,8 @@ class RegularTequilaOrderRecordViewSet(viewsets.ModelViewSet):
                     "regular_orders": record.get_regular_items_details(),
                     "tequila_orders": record.get_tequila_items_details(),
                     "created_by": record.created_by.username,
-                    "date_created": str(record.date_created).split(" ")[0],
-                    "time_created": str(record.date_created)
-                        .split(" ")[1]
-                        .split(".")[0],
+                    "date_created": date_part(record.date_created),
+                    "time_created": time_part(record.date_created),
                 }
             )
             for record in self.get_queryset()
@@ -1008,6 +1256,7 @@ class RegularTequilaOrderRecordViewSet(viewsets.ModelViewSet):
         )
 
     def create_tequila_orders(self, request, object_, tequila_orders):
+        movements: List[StockMovement] = []
         for tequila_order in tequila_orders:
             required_qty = tequila_order["quantity"]
             tequila_inv_record = TekilaInventoryRecord.objects.get(id=tequila_order["item_id"])
@@ -1017,6 +1266,16 @@ class RegularTequilaOrderRecordViewSet(viewsets.ModelViewSet):
             flag = True  # Loop controller
             while flag:
                 last_tequila_inv_record = trunk.get_last_inventory_record()
+                movements.append(
+                    StockMovement(
+                        item_id=item.id,
+                        section="tequila",
+                        kind="sale",
+                        quantity=-min(last_tequila_inv_record.available_quantity, required_qty),
+                        record_id=last_tequila_inv_record.id,
+                        created_by_id=request.user.id,
+                    )
+                )
                 res = last_tequila_inv_record.available_quantity - required_qty  # 2 - 8 = -6
                 if res < 0:
                     last_tequila_inv_record.available_quantity = 0
@@ -1038,7 +1297,7 @@ class RegularTequilaOrderRecordViewSet(viewsets.ModelViewSet):
             trunk.save()
 
             tequila_order_object = TequilaOrderRecord.objects.create(
-                item=TekilaInventoryRecord.objects.get(id=tequila_order["item_id"]),
+                item=TekilaInventoryRecord.objects.select_related("item").get(id=tequila_order["item_id"]),
                 quantity=tequila_order["quantity"],
                 order_number=str(
                     orders_number_generator(RegularOrderRecord, "order_number")
@@ -1047,8 +1306,10 @@ class RegularTequilaOrderRecordViewSet(viewsets.ModelViewSet):
                 date_created=timezone.now(),
             )
             object_.tequila_items.add(tequila_order_object)
+        record_movements(movements)
 
     def create_regular_orders(self, request, object_, regular_orders):
+        movements: List[StockMovement] = []
         for regular_order in regular_orders:
             required_qty = regular_order["quantity"]
             regular_inv_record = RegularInventoryRecord.objects.get(id=regular_order["item_id"])
@@ -1058,6 +1319,16 @@ class RegularTequilaOrderRecordViewSet(viewsets.ModelViewSet):
             flag = True  # Loop controller
             while flag:
                 last_regular_inv_record = trunk.get_last_inventory_record()
+                movements.append(
+                    StockMovement(
+                        item_id=item.id,
+                        section="regular",
+                        kind="sale",
+                        quantity=-min(last_regular_inv_record.available_quantity, required_qty),
+                        record_id=last_regular_inv_record.id,
+                        created_by_id=request.user.id,
+                    )
+                )
                 res = last_regular_inv_record.available_quantity - required_qty  # 2 - 8 = -6
                 if res < 0:
                     last_regular_inv_record.available_quantity = 0
@@ -1077,7 +1348,7 @@ class RegularTequilaOrderRecordViewSet(viewsets.ModelViewSet):
             trunk.save()
 
             regular_order_object = RegularOrderRecord.objects.create(
-                item=RegularInventoryRecord.objects.get(id=regular_order["item_id"]),
+                item=RegularInventoryRecord.objects.select_related("item").get(id=regular_order["item_id"]),
                 quantity=regular_order["quantity"],
                 order_number=str(
                     orders_number_generator(RegularOrderRecord, "order_number")
@@ -1086,6 +1357,7 @@ class RegularTequilaOrderRecordViewSet(viewsets.ModelViewSet):
                 date_created=timezone.now(),
             )
             object_.regular_items.add(regular_order_object)
+        record_movements(movements)
 
     @action(
         detail=False,
@@ -1230,7 +1502,9 @@ class CustomerRegularTequilaOrderRecordViewSet(viewsets.ModelViewSet):
 
     def list(self, request, *args, **kwargs):
         res: List = []
-        for q in self.get_queryset():
+        # Paid orders of past days are skipped: leave them out of the query
+        start, _ = get_day_range(timezone.localdate())
+        for q in self.get_queryset().filter(~Q(status="paid") | Q(date_created__gte=start)):
             if q.status == "paid" and q.date_created.date() != self.today.date():
                 pass
             else:
@@ -1288,10 +1562,10 @@ class CustomerRegularTequilaOrderRecordViewSet(viewsets.ModelViewSet):
     )
     def search(self, request):
         try:
-            customer_name = request.data["customer_name"]
-            results = CustomerRegularTequilaOrderRecord.objects.filter(
-                customer_name=customer_name
-            )
+            customer_name = request.query_params.get("customer_name") or request.data["customer_name"]
+            results = search_queryset(CustomerRegularTequilaOrderRecord.objects.all(), customer_name)[
+                :MAX_PAGE_SIZE
+            ]
             return Response(data=self.OutputSerializer(results, many=True).data, status=status.HTTP_200_OK)
         except KeyError:
             return Response(
@@ -1303,8 +1577,8 @@ class CustomerRegularTequilaOrderRecordViewSet(viewsets.ModelViewSet):
         methods=["GET"],
     )
     def get_today_orders(self, request, *args, **kwargs):
-        today_date = timezone.localdate()
-        qs = self.get_queryset().filter(date_created__date=today_date)
+        start, end = get_day_range(timezone.localdate())
+        qs = self.get_queryset().filter(date_created__gte=start, date_created__lt=end)
 
         return Response(data=self.OutputSerializer(qs, many=True).data, status=status.HTTP_200_OK)
 
@@ -1337,6 +1611,14 @@ class CustomerRegularTequilaOrderRecordViewSet(viewsets.ModelViewSet):
 
 class CustomerRegularTequilaOrderRecordPaymentViewSet(viewsets.ModelViewSet):
     serializer_class = CustomerRegularTequilaOrderRecordPaymentSerializer
+    paid_serializer = FlatSerializer(
+        customer_name="customer_regular_tequila_order_record__customer_name",
+        customer_phone="customer_regular_tequila_order_record__customer_phone",
+        customer_orders_number="customer_regular_tequila_order_record__customer_orders_number",
+        paid_amount=("amount_paid", float),
+        date_paid=("date_paid", date_part),
+        time_paid=("date_paid", time_part),
+    )
     today = timezone.localtime()
 
     def get_queryset(self):
@@ -1357,8 +1639,8 @@ class CustomerRegularTequilaOrderRecordPaymentViewSet(viewsets.ModelViewSet):
             "amount_remaining": float(instance.get_remaining_amount),
             "orders": instance.customer_regular_tequila_order_record.get_orders_detail,
             "created_by": instance.created_by.username,
-            "date_paid": str(instance.date_paid).split(" ")[0],
-            "time_paid": str(instance.date_paid).split(" ")[1].split(".")[0],
+            "date_paid": date_part(instance.date_paid),
+            "time_paid": time_part(instance.date_paid),
         }
         return Response(response, status.HTTP_200_OK)
 
@@ -1384,8 +1666,8 @@ class CustomerRegularTequilaOrderRecordPaymentViewSet(viewsets.ModelViewSet):
                     "remained_amount": float(payment.get_remaining_amount),
                     "orders": payment.customer_regular_tequila_order_record.get_orders_detail,
                     "created_by": payment.created_by.username,
-                    "date_paid": str(payment.date_paid).split(" ")[0],
-                    "time_paid": str(payment.date_paid).split(" ")[1].split(".")[0],
+                    "date_paid": date_part(payment.date_paid),
+                    "time_paid": time_part(payment.date_paid),
                 }
             )
             for payment in objects
@@ -1562,22 +1844,9 @@ class CustomerRegularTequilaOrderRecordPaymentViewSet(viewsets.ModelViewSet):
         methods=["GET"],
     )
     def get_all_paid(self, request, *args, **kwargs):
-        res: List[Dict] = []
         filtered_qs = self.get_queryset().filter(payment_status="paid")
-        [
-            res.append(
-                {
-                    "customer_name": qs.customer_regular_tequila_order_record.customer_name,
-                    "customer_phone": qs.customer_regular_tequila_order_record.customer_phone,
-                    "customer_orders_number": qs.customer_regular_tequila_order_record.customer_orders_number,
-                    "paid_amount": float(qs.amount_paid),
-                    "date_paid": str(qs.date_paid).split(" ")[0],
-                    "time_paid": str(qs.date_paid).split(" ")[1].split(".")[0],
-                }
-            )
-            for qs in filtered_qs
-        ]
-        return Response(res, status.HTTP_200_OK)
+
+        return Response(self.paid_serializer.serialize(filtered_qs), status.HTTP_200_OK)
 
     @action(
         detail=False,
@@ -1595,8 +1864,8 @@ class CustomerRegularTequilaOrderRecordPaymentViewSet(viewsets.ModelViewSet):
                     "payable_amount": qs.get_total_amount_to_pay,
                     "paid_amount": qs.amount_paid,
                     "remaining_amount": qs.get_remaining_amount,
-                    "date_paid": str(qs.date_paid).split(" ")[0],
-                    "time_paid": str(qs.date_paid).split(" ")[1].split(".")[0],
+                    "date_paid": date_part(qs.date_paid),
+                    "time_paid": time_part(qs.date_paid),
                 }
             )
             for qs in filtered_qs
@@ -1724,6 +1993,8 @@ class BarPayrolViewSet(viewsets.ModelViewSet):
         payment_method = request.data.get("payment_method")
         if bar_payee:
             instance.name = request.data.get("name")
+        if "payee" in request.data:
+            instance.payee = get_payee(request.data.get("payee"))
         if amount_paid:
             instance.amount_paid = amount_paid
         if payment_method:
@@ -1773,29 +2044,26 @@ class BarPayrolViewSet(viewsets.ModelViewSet):
     )
     def get_monthly_payments(self, request, *args, **kwargs):
         today = datetime.date.today()
-        payments_this_month = BarPayrol.objects.filter(
-            date_paid__year=today.year,
-            date_paid__month=today.month,
-        )
-        response: Dict = {}
-        response["total_amount_paid"] = (
-                payments_this_month.aggregate(total=Sum("amount_paid"))["total"] or 0
-        )
-        payments: List[Dict] = []
-        [
-            payments.append(
-                {
-                    "id": payment.id,
-                    "payee": payment.name,
-                    "payer": payment.bar_payer.username,
-                    "amount_paid": payment.amount_paid,
-                    "date_paid": payment.date_paid,
-                    "payment_method": payment.payment_method,
-                }
+        start, end = get_month_range(today.year, today.month)
+        payments_this_month = BarPayrol.objects.filter(date_paid__gte=start, date_paid__lt=end)
+        payments: List[Dict] = list(
+            payments_this_month.values(
+                "id",
+                "amount_paid",
+                "date_paid",
+                "payment_method",
+                "payee_id",
+                payee_name=F("name"),
+                payer=F("bar_payer__username"),
             )
-            for payment in payments_this_month
-        ]
-        response["payments"] = payments
+        )
+        for payment in payments:
+            payment["payee"] = payment.pop("payee_name")
+        response: Dict = {
+            "total_amount_paid": sum(payment["amount_paid"] for payment in payments),
+            "payments": payments,
+            "payees": list(get_payee_totals(payments_this_month)),
+        }
         return Response(response, status.HTTP_200_OK)
 
 
@@ -1803,6 +2071,8 @@ class BarPayrolViewSet(viewsets.ModelViewSet):
 
 
 class BarTequilaItemViewSet(viewsets.ModelViewSet):
+    serializer_class = TekilaInventoryRecordSerializer
+
     def get_queryset(self):
         return TequilaInventoryRecordsTrunk.objects.select_related("item", "item__unit").prefetch_related(
             "tequila_inventory_record")
@@ -1821,6 +2091,16 @@ class BarTequilaItemViewSet(viewsets.ModelViewSet):
 
 class TequilaOrderRecordViewSet(viewsets.ModelViewSet):
     serializer_class = TequilaOrderRecordSerializer
+    output_serializer = FlatSerializer(
+        id="id",
+        item="item__item__name",
+        ordered_quantity="quantity",
+        total_price=("total_price", float),
+        order_number="order_number",
+        created_by="created_by__username",
+        date_created=("date_created", date_part),
+        time_created=("date_created", time_part),
+    )
 
     def get_queryset(self):
         return TequilaOrderRecord.objects.select_related(
@@ -1837,33 +2117,16 @@ class TequilaOrderRecordViewSet(viewsets.ModelViewSet):
                 "total_price": instance.total,
                 "order_number": instance.order_number,
                 "created_by": instance.created_by.username,
-                "date_created": str(instance.date_created).split(" ")[0],
-                "time_created": str(instance.date_created).split(" ")[1].split(".")[0],
+                "date_created": date_part(instance.date_created),
+                "time_created": time_part(instance.date_created),
             },
             status.HTTP_200_OK,
         )
 
     def list(self, request, *args, **kwargs):
-        response: List[Dict] = []
-        [
-            response.append(
-                {
-                    "id": record.id,
-                    "item": record.item.item.name,
-                    "ordered_quantity": record.quantity,
-                    "total_price": record.total,
-                    "order_number": record.order_number,
-                    "created_by": record.created_by.username,
-                    "date_created": str(record.date_created).split(" ")[0],
-                    "time_created": str(record.date_created)
-                        .split(" ")[1]
-                        .split(".")[0],
-                }
-            )
-            for record in self.get_queryset()
-        ]
+        queryset = self.get_queryset().annotate(total_price=F("quantity") * F("item__selling_price_per_shot"))
 
-        return Response(response, status.HTTP_200_OK)
+        return Response(self.output_serializer.serialize(queryset), status.HTTP_200_OK)
 
     def create(self, request, *args, **kwargs):
         serializer = self.serializer_class(data=request.data)
@@ -1874,7 +2137,7 @@ class TequilaOrderRecordViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, request):
         object = TequilaOrderRecord.objects.create(
-            item=TekilaInventoryRecord.objects.get(id=request.data.get("item")),
+            item=TekilaInventoryRecord.objects.select_related("item").get(id=request.data.get("item")),
             quantity=request.data.get("quantity"),
             order_number=str(
                 orders_number_generator(TequilaOrderRecord, "order_number")
@@ -1888,8 +2151,8 @@ class TequilaOrderRecordViewSet(viewsets.ModelViewSet):
             "quantity": object.quantity,
             "order_number": object.order_number,
             "created_by": object.created_by.username,
-            "date_created": str(object.date_created).split(" ")[0],
-            "time_created": str(object.date_created).split(" ")[1].split(".")[0],
+            "date_created": date_part(object.date_created),
+            "time_created": time_part(object.date_created),
         }
 
 
@@ -1944,14 +2207,14 @@ class CustomerTequilaOrderRecordViewSet(viewsets.ModelViewSet):
             "customer_orders_number": object.customer_orders_number,
             "orders": object.get_orders_detail,
             "created_by": object.created_by.username,
-            "date_created": str(object.date_created).split(" ")[0],
-            "time_created": str(object.date_created).split(" ")[1].split(".")[0],
+            "date_created": date_part(object.date_created),
+            "time_created": time_part(object.date_created),
         }
 
     def add_orders(self, request, object):
         for _ in request.data.get("orders"):
             order = TequilaOrderRecord.objects.create(
-                item=TekilaInventoryRecord.objects.get(id=int(_["order_id"])),
+                item=TekilaInventoryRecord.objects.select_related("item").get(id=int(_["order_id"])),
                 quantity=_["quantity"],
                 order_number=str(
                     orders_number_generator(TequilaOrderRecord, "order_number")
@@ -1974,12 +2237,10 @@ class CustomerTequilaOrderRecordViewSet(viewsets.ModelViewSet):
     )
     def search(self, request, *args, **kwargs):
         try:
-            customer_name = request.data["customer_name"]
-            results = (
-                CustomerTequilaOrderRecord.objects.filter(customer_name=customer_name)
-                    .select_related("orders")
-                    .prefetch_related("orders")
-            )
+            customer_name = request.query_params.get("customer_name") or request.data["customer_name"]
+            results = search_queryset(
+                CustomerTequilaOrderRecord.objects.prefetch_related("orders"), customer_name
+            )[:MAX_PAGE_SIZE]
             return Response(self.get_list(results), status.HTTP_200_OK)
         except KeyError:
             return Response(
@@ -1991,8 +2252,8 @@ class CustomerTequilaOrderRecordViewSet(viewsets.ModelViewSet):
         methods=["GET"],
     )
     def get_today_orders(self, request, *args, **kwargs):
-        todays_date = timezone.localdate()
-        qs = self.get_queryset().filter(date_created__date=todays_date)
+        start, end = get_day_range(timezone.localdate())
+        qs = self.get_queryset().filter(date_created__gte=start, date_created__lt=end)
         response = self.append_orders(qs)
 
         return Response(response, status.HTTP_200_OK)
@@ -2051,6 +2312,14 @@ class CustomerTequilaOrderRecordViewSet(viewsets.ModelViewSet):
 
 class CustomerTequilaOrderRecordPaymentViewSet(viewsets.ModelViewSet):
     serializer_class = TequilaCustomerOrderRecordPaymentSerializer
+    paid_serializer = FlatSerializer(
+        customer_name="customer_order_record__customer_name",
+        customer_phone="customer_order_record__customer_phone",
+        customer_orders_number="customer_order_record__customer_orders_number",
+        paid_amount=("amount_paid", float),
+        date_paid=("date_paid", date_part),
+        time_paid=("date_paid", time_part),
+    )
     today = timezone.localdate()
 
     def get_queryset(self):
@@ -2098,8 +2367,8 @@ class CustomerTequilaOrderRecordPaymentViewSet(viewsets.ModelViewSet):
                     "remained_amount": float(payment.get_remaining_amount),
                     "orders": payment.customer_order_record.get_orders_detail,
                     "created_by": payment.created_by.username,
-                    "date_created": str(payment.date_paid).split(" ")[0],
-                    "time_created": str(payment.date_paid).split(" ")[1].split(".")[0],
+                    "date_created": date_part(payment.date_paid),
+                    "time_created": time_part(payment.date_paid),
                 }
             )
             for payment in objects
@@ -2175,8 +2444,8 @@ class CustomerTequilaOrderRecordPaymentViewSet(viewsets.ModelViewSet):
             "customer_order_record": str(object),
             "payment_status": object.payment_status,
             "amount_paid": object.amount_paid,
-            "date_paid": str(object.date_paid).split(" ")[0],
-            "time_paid": str(object.date_paid).split(" ")[1].split(".")[0],
+            "date_paid": date_part(object.date_paid),
+            "time_paid": time_part(object.date_paid),
             "created_by": str(object.created_by),
         }
 
@@ -2255,23 +2524,9 @@ class CustomerTequilaOrderRecordPaymentViewSet(viewsets.ModelViewSet):
         methods=["GET"],
     )
     def get_all_paid(self, request, *args, **kwargs):
-        res: List[Dict] = []
         filtered_qs = self.get_queryset().filter(payment_status="paid")
-        [
-            res.append(
-                {
-                    "customer_name": qs.customer_order_record.customer_name,
-                    "customer_phone": qs.customer_order_record.customer_phone,
-                    "customer_orders_number": qs.customer_order_record.customer_orders_number,
-                    "paid_amount": float(qs.amount_paid),
-                    "date_paid": str(qs.date_paid).split(" ")[0],
-                    "time_paid": str(qs.date_paid).split(" ")[1].split(".")[0],
-                }
-            )
-            for qs in filtered_qs
-        ]
 
-        return Response(res, status.HTTP_200_OK)
+        return Response(self.paid_serializer.serialize(filtered_qs), status.HTTP_200_OK)
 
     @action(
         detail=False,
@@ -2289,8 +2544,8 @@ class CustomerTequilaOrderRecordPaymentViewSet(viewsets.ModelViewSet):
                     "payable_amount": qs.get_total_amount_to_pay,
                     "paid_amount": qs.amount_paid,
                     "remaining_amount": qs.get_remaining_amount,
-                    "date_paid": str(qs.date_paid).split(" ")[0],
-                    "time_paid": str(qs.date_paid).split(" ")[1].split(".")[0],
+                    "date_paid": date_part(qs.date_paid),
+                    "time_paid": time_part(qs.date_paid),
                 }
             )
             for qs in filtered_qs
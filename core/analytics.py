@@ -0,0 +1,219 @@
+"""
+Sales analytics: quantity and revenue per time bucket and item or waiter.
+
+Bar and restaurant order lines are truncated to hour, day or week buckets
+and grouped by the database, in one UNION query over the three order tables.
+Results are cached per closed day (per closed week for weekly buckets) in
+the shared cache: a request over a year of data only queries the days it
+has not seen yet plus the current, still open, day. Saving or deleting an
+order line drops the cached day it belongs to once the write has committed,
+so a request running meanwhile cannot cache the day without the change.
+"""
+import datetime
+from typing import Dict, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import CharField, DateTimeField, ExpressionWrapper, F, FloatField, Sum, Value
+from django.db.models.functions import Trunc
+from django.db.models.query import QuerySet
+from django.utils import timezone
+
+from bar.models import RegularOrderRecord, TequilaOrderRecord
+from core.utils import get_day_start
+from restaurant.models import RestaurantCustomerOrder
+
+CACHE_KEY: str = "sales-analytics:{}:{}:{}"
+CACHE_TIMEOUT: int = 60 * 60 * 24 * 7
+MAX_DAYS: int = 366
+# bucket: days covered by one cached unit of buckets
+BUCKETS: Dict[str, int] = {"hour": 1, "day": 1, "week": 7}
+# dimension: (id, name) of an order line's model, keyed by the model
+DIMENSIONS: Dict[str, Dict] = {
+    "item": {
+        RegularOrderRecord: ("item__item", "item__item__name"),
+        TequilaOrderRecord: ("item__item", "item__item__name"),
+        RestaurantCustomerOrder: ("sub_menu", "sub_menu__name"),
+    },
+    "waiter": {
+        RegularOrderRecord: ("created_by", "created_by__username"),
+        TequilaOrderRecord: ("created_by", "created_by__username"),
+        RestaurantCustomerOrder: ("created_by", "created_by__username"),
+    },
+}
+# (section, order line model, unit price)
+SOURCES: Tuple[Tuple, ...] = (
+    ("bar", RegularOrderRecord, "item__selling_price_per_item"),
+    ("bar", TequilaOrderRecord, "item__selling_price_per_shot"),
+    ("restaurant", RestaurantCustomerOrder, "sub_menu__price"),
+)
+
+
+def get_unit_start(bucket: str, date: datetime.date) -> datetime.date:
+    if bucket == "week":
+        return date - datetime.timedelta(days=date.weekday())
+    return date
+
+
+def get_units(bucket: str, from_date: datetime.date, to_date: datetime.date) -> List[datetime.date]:
+    step = datetime.timedelta(days=BUCKETS[bucket])
+    units: List[datetime.date] = []
+    unit: datetime.date = get_unit_start(bucket, from_date)
+    while unit <= to_date:
+        units.append(unit)
+        unit += step
+
+    return units
+
+
+def get_sales(
+    bucket: str, dimension: str, start: datetime.date, end: datetime.date
+) -> QuerySet:
+    """Quantity and revenue per bucket, section and dimension of the order
+    lines created from start to end (exclusive), as one UNION query"""
+
+    parts: List[QuerySet] = []
+    for section, model, price in SOURCES:
+        dimension_id, dimension_name = DIMENSIONS[dimension][model]
+        parts.append(
+            model.objects.filter(
+                date_created__gte=get_day_start(start), date_created__lt=get_day_start(end)
+            )
+            .annotate(
+                bucket=Trunc(
+                    "date_created",
+                    bucket,
+                    output_field=DateTimeField(),
+                    tzinfo=timezone.get_current_timezone(),
+                ),
+                section=Value(section, output_field=CharField()),
+                dimension_id=F(dimension_id),
+                dimension_name=F(dimension_name),
+            )
+            .values("bucket", "section", "dimension_id", "dimension_name")
+            .annotate(
+                sold_quantity=Sum("quantity"),
+                revenue=Sum(
+                    ExpressionWrapper(F("quantity") * F(price), output_field=FloatField())
+                ),
+            )
+            .order_by()
+        )
+    first, *others = parts
+
+    return first.union(*others, all=True)
+
+
+def get_unit_rows(
+    bucket: str, dimension: str, units: List[datetime.date]
+) -> Dict[datetime.date, List[Dict]]:
+    """Rows of every unit, from the cache for closed units"""
+
+    today: datetime.date = timezone.localdate()
+    step = datetime.timedelta(days=BUCKETS[bucket])
+    keys: Dict[datetime.date, str] = {
+        unit: CACHE_KEY.format(bucket, dimension, unit) for unit in units if unit + step <= today
+    }
+    cached: Dict[str, List[Dict]] = cache.get_many(list(keys.values()))
+    rows: Dict[datetime.date, List[Dict]] = {
+        unit: cached[key] for unit, key in keys.items() if key in cached
+    }
+
+    missing: List[datetime.date] = [unit for unit in units if unit not in rows]
+    if missing:
+        grouped: Dict[datetime.date, Dict[Tuple, Dict]] = {unit: {} for unit in missing}
+        for row in get_sales(bucket, dimension, missing[0], missing[-1] + step):
+            # Buckets are local datetimes, so their date is their unit's start
+            unit: datetime.date = get_unit_start(bucket, row["bucket"].date())
+            if unit not in grouped:
+                continue
+            # Regular and tequila lines of one waiter share a bucket row
+            sales: Dict = grouped[unit].setdefault(
+                (row["bucket"], row["section"], row["dimension_id"]),
+                {
+                    "bucket": row["bucket"].isoformat(),
+                    "section": row["section"],
+                    "id": row["dimension_id"],
+                    "name": row["dimension_name"],
+                    "quantity": 0,
+                    "revenue": 0.0,
+                },
+            )
+            sales["quantity"] += row["sold_quantity"]
+            sales["revenue"] += row["revenue"] or 0.0
+        computed: Dict[datetime.date, List[Dict]] = {
+            unit: list(unit_sales.values()) for unit, unit_sales in grouped.items()
+        }
+        cache.set_many(
+            {keys[unit]: computed[unit] for unit in missing if unit in keys}, CACHE_TIMEOUT
+        )
+        rows.update(computed)
+
+    return rows
+
+
+def get_sales_analytics(
+    bucket: str,
+    dimension: str,
+    from_date: datetime.date,
+    to_date: datetime.date,
+    section: Optional[str] = None,
+    top: int = 10,
+) -> Dict:
+    """Sales per bucket and item or waiter, and the top sellers of the period.
+    Weekly buckets cover whole weeks (Monday to Sunday)."""
+
+    units: List[datetime.date] = get_units(bucket, from_date, to_date)
+    unit_rows: Dict[datetime.date, List[Dict]] = get_unit_rows(bucket, dimension, units)
+
+    buckets: Dict[str, Dict] = {}
+    sellers: Dict[Tuple, Dict] = {}
+    for unit in units:
+        for row in unit_rows[unit]:
+            if section and row["section"] != section:
+                continue
+            totals: Dict = buckets.setdefault(
+                row["bucket"], {"bucket": row["bucket"], "quantity": 0, "revenue": 0.0, "rows": []}
+            )
+            totals["quantity"] += row["quantity"]
+            totals["revenue"] += row["revenue"]
+            totals["rows"].append(row)
+
+            seller: Dict = sellers.setdefault(
+                (row["section"], row["id"]),
+                {
+                    "section": row["section"],
+                    "id": row["id"],
+                    "name": row["name"],
+                    "quantity": 0,
+                    "revenue": 0.0,
+                },
+            )
+            seller["quantity"] += row["quantity"]
+            seller["revenue"] += row["revenue"]
+
+    for totals in buckets.values():
+        totals["rows"].sort(key=lambda row: -row["revenue"])
+
+    return {
+        "bucket": bucket,
+        "by": dimension,
+        "section": section or "all",
+        "from_date": str(units[0] if units else from_date),
+        "to_date": str(to_date),
+        "buckets": sorted(buckets.values(), key=lambda totals: totals["bucket"]),
+        "top": sorted(sellers.values(), key=lambda seller: -seller["revenue"])[:top],
+    }
+
+
+def invalidate_sales_analytics(date_created: datetime.datetime):
+    """Drop the cached units holding order lines created at date_created,
+    once the current transaction commits"""
+
+    date: datetime.date = timezone.localtime(date_created).date()
+    keys: List[str] = [
+        CACHE_KEY.format(bucket, dimension, get_unit_start(bucket, date))
+        for bucket in BUCKETS
+        for dimension in DIMENSIONS
+    ]
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,48 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.authtoken.models import Token
+
+from core.displays import SCREENS
+
+
+@database_sync_to_async
+def get_token_user(key):
+    try:
+        return Token.objects.select_related("user").get(key=key).user
+    except Token.DoesNotExist:
+        return AnonymousUser()
+
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """Authenticate websockets with the API token passed as ?token=<key>"""
+
+    async def __call__(self, scope, receive, send):
+        key = parse_qs(scope["query_string"].decode()).get("token", [None])[0]
+        scope["user"] = await get_token_user(key) if key else AnonymousUser()
+
+        return await super().__call__(scope, receive, send)
+
+
+class DisplayConsumer(AsyncJsonWebsocketConsumer):
+    """ Order events for the kitchen or bar display screens """
+
+    async def connect(self):
+        screen = self.scope["url_route"]["kwargs"]["screen"]
+        if not self.scope["user"].is_authenticated or screen not in SCREENS:
+            await self.close()
+            return
+
+        self.group_name = SCREENS[screen]
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if hasattr(self, "group_name"):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def display_event(self, message):
+        await self.send_json(message["event"])
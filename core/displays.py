@@ -0,0 +1,74 @@
+"""
+Push events for kitchen and bar display screens.
+
+Order signals publish compact events to a channel layer group per screen
+once the transaction commits; DisplayConsumer forwards them to the connected
+screens, so displays no longer poll the order listings. The API is served
+by gunicorn (WSGI) workers and the websockets by a separate daphne (ASGI)
+process, so the channel layer is Redis, shared by every process, when
+REDIS_URL is set; single node setups and tests use the in-memory layer.
+
+The order is committed before its event is sent, so a delivery failure is
+logged and never fails the request: the screens catch up on their next
+reload of the order listings.
+"""
+import logging
+from typing import Dict
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+SCREENS: Dict[str, str] = {"kitchen": "displays-kitchen", "bar": "displays-bar"}
+
+logger = logging.getLogger(__name__)
+
+
+def get_restaurant_order_event(order, created: bool) -> Dict:
+    return {
+        "model": "restaurant_order",
+        "action": "created" if created else "changed",
+        "id": order.id,
+        "order_number": order.order_number,
+        "sub_menu_id": order.sub_menu_id,
+        "sub_menu": order.sub_menu.name,
+        "quantity": order.quantity,
+        "date_created": order.date_created.isoformat(),
+    }
+
+
+def get_bar_order_event(order, model: str, created: bool) -> Dict:
+    """Order views fetch the inventory record with its item selected, so
+    reading the item's name costs no query"""
+
+    return {
+        "model": model,
+        "action": "created" if created else "changed",
+        "id": order.id,
+        "order_number": order.order_number,
+        "item_record_id": order.item_id,
+        "item": order.item.item.name,
+        "quantity": order.quantity,
+        "date_created": order.date_created.isoformat(),
+    }
+
+
+def send(channel_layer, screen: str, event: Dict):
+    try:
+        async_to_sync(channel_layer.group_send)(
+            SCREENS[screen], {"type": "display.event", "event": event}
+        )
+    except Exception:
+        logger.exception(
+            "Display event %s %s for the %s screens was not delivered", event["model"], event["id"], screen
+        )
+
+
+def publish(screen: str, event: Dict):
+    """Send event to every screen of a kind once the transaction commits"""
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+
+    transaction.on_commit(lambda: send(channel_layer, screen, event))
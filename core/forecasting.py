@@ -0,0 +1,220 @@
+"""
+Depletion-rate forecasting for bar and restaurant inventory.
+
+Consumption history is grouped per item and day in the database, loaded
+into NumPy arrays and turned into weekday-aware moving averages so that
+items with spiky (e.g. weekend) demand are projected correctly.
+"""
+import datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from bar.models import (
+    RegularInventoryRecord,
+    RegularInventoryRecordsTrunk,
+    RegularOrderRecord,
+    TekilaInventoryRecord,
+    TequilaInventoryRecordsTrunk,
+    TequilaOrderRecord,
+)
+from core.models import StockOutProjection
+from restaurant.models import (
+    MainInventoryItemRecord,
+    MainInventoryItemRecordStockOut,
+    MainInventoryItemRecordTrunk,
+)
+
+HISTORY_WEEKS: int = 8
+HORIZON_DAYS: int = 90
+COVER_DAYS: int = 14
+
+
+def get_sections() -> Dict[str, Dict]:
+    """Where to find items, consumption and stock for every section"""
+
+    return {
+        "regular": {
+            "items": RegularInventoryRecordsTrunk.objects.filter(item__tequila=False),
+            "consumption": RegularOrderRecord.objects.annotate(
+                day=TruncDate("date_created")
+            ),
+            "item_field": "item__item",
+            "quantity_field": "quantity",
+            "stock": RegularInventoryRecord.objects.all(),
+            "stock_item_field": "item",
+        },
+        "tequila": {
+            "items": TequilaInventoryRecordsTrunk.objects.filter(item__tequila=True),
+            "consumption": TequilaOrderRecord.objects.annotate(
+                day=TruncDate("date_created")
+            ),
+            "item_field": "item__item",
+            "quantity_field": "quantity",
+            "stock": TekilaInventoryRecord.objects.all(),
+            "stock_item_field": "item",
+        },
+        "restaurant": {
+            "items": MainInventoryItemRecordTrunk.objects.filter(
+                item__item_for="restaurant"
+            ),
+            "consumption": MainInventoryItemRecordStockOut.objects.annotate(
+                day=F("date_out")
+            ),
+            "item_field": "item_record__main_inventory_item__item",
+            "quantity_field": "quantity_out",
+            "stock": MainInventoryItemRecord.objects.all(),
+            "stock_item_field": "main_inventory_item__item",
+        },
+    }
+
+
+def load_consumption(
+    section: Dict, start_date: datetime.date, end_date: datetime.date
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns (item ids, day offsets from start_date, quantities) per item-day"""
+
+    rows: List = list(
+        section["consumption"]
+        .filter(day__gte=start_date, day__lt=end_date)
+        .values(section["item_field"], "day")
+        .annotate(total=Sum(section["quantity_field"]))
+        .values_list(section["item_field"], "day", "total")
+        .order_by()
+    )
+    count: int = len(rows)
+    item_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=count)
+    offsets = np.fromiter(
+        ((row[1] - start_date).days for row in rows), dtype=np.int64, count=count
+    )
+    totals = np.fromiter((row[2] or 0 for row in rows), dtype=np.float64, count=count)
+
+    return item_ids, offsets, totals
+
+
+def load_available(section: Dict, item_ids: np.ndarray) -> np.ndarray:
+    """Returns the available quantity per item aligned with item_ids"""
+
+    rows: List = list(
+        section["stock"]
+        .values(section["stock_item_field"])
+        .annotate(total=Sum("available_quantity"))
+        .values_list(section["stock_item_field"], "total")
+        .order_by()
+    )
+    available = np.zeros(len(item_ids), dtype=np.float64)
+    if rows and len(item_ids):
+        stock_items = np.array([row[0] for row in rows], dtype=np.int64)
+        stock_totals = np.array([row[1] or 0 for row in rows], dtype=np.float64)
+        positions, valid = match_items(item_ids, stock_items)
+        available[positions[valid]] = stock_totals[valid]
+
+    return available
+
+
+def match_items(item_ids: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Locate values inside the sorted item_ids array"""
+
+    positions = np.searchsorted(item_ids, values)
+    clipped = np.clip(positions, 0, max(len(item_ids) - 1, 0))
+    valid = (positions < len(item_ids)) & (item_ids[clipped] == values)
+
+    return clipped, valid
+
+
+def weekday_rates(
+    item_ids: np.ndarray,
+    consumption: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    start_date: datetime.date,
+    weeks: int,
+) -> np.ndarray:
+    """Linearly weighted moving average of consumption per item and weekday.
+
+    Returns an (items x 7) array indexed Monday=0 ... Sunday=6.
+    """
+
+    consumed_items, offsets, totals = consumption
+    matrix = np.zeros((len(item_ids), weeks * 7), dtype=np.float64)
+    if len(item_ids) and len(consumed_items):
+        positions, valid = match_items(item_ids, consumed_items)
+        np.add.at(matrix, (positions[valid], offsets[valid]), totals[valid])
+
+    weights = np.arange(1, weeks + 1, dtype=np.float64)  # recent weeks count more
+    averaged = np.average(matrix.reshape(len(item_ids), weeks, 7), axis=1, weights=weights)
+    rates = np.empty_like(averaged)
+    rates[:, (start_date.weekday() + np.arange(7)) % 7] = averaged
+
+    return rates
+
+
+def project(
+    rates: np.ndarray,
+    available: np.ndarray,
+    today: datetime.date,
+    horizon: int = HORIZON_DAYS,
+    cover_days: int = COVER_DAYS,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns (days until stock out or -1, reorder quantity) per item.
+    Items without consumption (never stocked or discontinued) never stock
+    out, even with nothing available."""
+
+    future_weekdays = (today.weekday() + np.arange(horizon)) % 7
+    cumulative = np.cumsum(rates[:, future_weekdays], axis=1)
+    reached = cumulative >= available[:, None]
+    consumed = cumulative[:, -1] > 0
+    days_to_stock_out = np.where(reached.any(axis=1) & consumed, reached.argmax(axis=1), -1)
+    cover_demand = cumulative[:, min(cover_days, horizon) - 1]
+    reorder_quantity = np.ceil(np.clip(cover_demand - available, 0, None))
+
+    return days_to_stock_out, reorder_quantity.astype(np.int64)
+
+
+@transaction.atomic
+def forecast_stock_outs(weeks: int = HISTORY_WEEKS, cover_days: int = COVER_DAYS) -> int:
+    """Recompute and store the stock out projections of every section"""
+
+    now = timezone.now()
+    today: datetime.date = timezone.localdate()
+    start_date: datetime.date = today - datetime.timedelta(days=weeks * 7)
+    total: int = 0
+
+    for name, section in get_sections().items():
+        item_ids = np.array(
+            sorted(section["items"].values_list("item_id", flat=True)), dtype=np.int64
+        )
+        rates = weekday_rates(
+            item_ids, load_consumption(section, start_date, today), start_date, weeks
+        )
+        available = load_available(section, item_ids)
+        days_to_stock_out, reorder_quantity = project(
+            rates, available, today, cover_days=cover_days
+        )
+
+        projections: List[StockOutProjection] = []
+        for index, item_id in enumerate(item_ids.tolist()):
+            days = int(days_to_stock_out[index])
+            projections.append(
+                StockOutProjection(
+                    item_id=item_id,
+                    section=name,
+                    available_quantity=int(available[index]),
+                    daily_rate=round(float(rates[index].mean()), 3),
+                    weekday_rates=[round(float(rate), 3) for rate in rates[index]],
+                    days_to_stock_out=days if days >= 0 else None,
+                    projected_stock_out_date=(
+                        today + datetime.timedelta(days=days) if days >= 0 else None
+                    ),
+                    reorder_quantity=int(reorder_quantity[index]),
+                    computed_at=now,
+                )
+            )
+
+        StockOutProjection.objects.filter(section=name).delete()
+        StockOutProjection.objects.bulk_create(projections)
+        total += len(projections)
+
+    return total
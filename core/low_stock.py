@@ -0,0 +1,151 @@
+"""
+Set-based low stock evaluation for bar and restaurant inventory.
+
+An item is low when the sum of its available quantities is at or below the
+threshold of its latest inventory record. Every section is evaluated with a
+single grouped query and alerts are deduplicated against LowStockAlert, so
+managers get one SMS per item until it is restocked.
+
+Scans run out of the request path, from the scan_low_stock command (cron, or
+a worker with --interval). Alerts are marked notified once their SMS went
+out, so alerts of a failed send are sent again by the next scan.
+"""
+from typing import Dict, Iterable, List
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from bar.models import RegularInventoryRecord, TekilaInventoryRecord
+from core.models import LowStockAlert
+from restaurant.models import MainInventoryItemRecord
+from restaurant.utils import get_recipients, send_notification
+
+SECTIONS: Dict[str, Dict] = {
+    "regular": {"model": RegularInventoryRecord, "item_field": "item"},
+    "tequila": {"model": TekilaInventoryRecord, "item_field": "item"},
+    "restaurant": {
+        "model": MainInventoryItemRecord,
+        "item_field": "main_inventory_item__item",
+    },
+}
+
+
+def get_low_stock(section: str) -> List[Dict]:
+    """All items of a section whose available quantity is <= threshold"""
+
+    model = SECTIONS[section]["model"]
+    item_field: str = SECTIONS[section]["item_field"]
+    latest_threshold = (
+        model.objects.filter(**{item_field: OuterRef(item_field)})
+        .order_by("-id")
+        .values("threshold")[:1]
+    )
+
+    rows = (
+        model.objects.values(
+            item_field,
+            name=F(f"{item_field}__name"),
+            unit=F(f"{item_field}__unit__name"),
+        )
+        .annotate(
+            available=Sum("available_quantity"),
+            latest_threshold=Subquery(latest_threshold),
+        )
+        .filter(available__lte=F("latest_threshold"))
+        .order_by()
+    )
+
+    return [
+        {
+            "item_id": row[item_field],
+            "name": row["name"],
+            "unit": row["unit"],
+            "available": row["available"] or 0,
+            "threshold": row["latest_threshold"],
+        }
+        for row in rows
+    ]
+
+
+def get_message(row: Dict) -> str:
+    if row["available"] > 0:
+        return "{} is nearly out of stock. The remained quantity is {} {}".format(
+            row["name"], row["available"], row["unit"]
+        )
+    return "{} is out of stock. The remained quantity is {} {}".format(
+        row["name"], row["available"], row["unit"]
+    )
+
+
+@transaction.atomic
+def evaluate_section(section: str):
+    """Create, escalate and resolve the alerts of a section"""
+
+    now = timezone.now()
+    low: Dict[int, Dict] = {row["item_id"]: row for row in get_low_stock(section)}
+    open_alerts: Dict[int, LowStockAlert] = {
+        alert.item_id: alert
+        for alert in LowStockAlert.objects.select_for_update().filter(
+            section=section, resolved_at__isnull=True
+        )
+    }
+
+    new_alerts: List[LowStockAlert] = []
+    for item_id, row in low.items():
+        level: str = "low" if row["available"] > 0 else "out"
+        alert = open_alerts.get(item_id)
+        if alert and (alert.level == level or alert.level == "out"):
+            continue  # Already alerted
+        if alert:
+            alert.resolved_at = now
+            alert.save(update_fields=["resolved_at"])
+        new_alerts.append(
+            LowStockAlert(
+                item_id=item_id,
+                section=section,
+                level=level,
+                available_quantity=row["available"],
+                threshold=row["threshold"],
+            )
+        )
+
+    LowStockAlert.objects.bulk_create(new_alerts)
+    LowStockAlert.objects.filter(
+        section=section, resolved_at__isnull=True
+    ).exclude(item_id__in=list(low)).update(resolved_at=now)
+
+
+@transaction.atomic
+def notify_alerts(sections: Iterable[str]) -> List[str]:
+    """Send the open alerts not notified yet as one SMS batch; they stay
+    pending when the SMS fails"""
+
+    alerts: List[Dict] = list(
+        LowStockAlert.objects.select_for_update(skip_locked=True, of=("self",))
+        .filter(section__in=list(sections), resolved_at__isnull=True, notified_at__isnull=True)
+        .values("id", available=F("available_quantity"), name=F("item__name"), unit=F("item__unit__name"))
+        .order_by("id")
+    )
+    messages: List[str] = [get_message(alert) for alert in alerts]
+    if not messages:
+        return []
+
+    error = send_notification(
+        message="\n".join(messages), recipients=get_recipients(), source_addr="RESTAURANT"
+    )
+    if error is not None:
+        return []
+    LowStockAlert.objects.filter(id__in=[alert["id"] for alert in alerts]).update(notified_at=timezone.now())
+
+    return messages
+
+
+def scan_low_stock(sections: Iterable[str] = tuple(SECTIONS)) -> List[str]:
+    """Evaluate the given sections and send the new alerts; returns the
+    messages sent"""
+
+    for section in sections:
+        evaluate_section(section)
+
+    return notify_alerts(sections)
@@ -0,0 +1,106 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.core.management.base import BaseCommand, CommandError
+
+READ_PATHS: List[str] = [
+    "restaurant/reports/get-daily-report",
+    "restaurant/reports/get-monthly-report",
+    "bar/reports/get-daily-report",
+    "bar/reports/get-monthly-report",
+    "bar/regular/inventory-records/",
+    "bar/tequila/inventory-records/",
+    "restaurant/inventory/records/",
+    "bar/sales/customer-order-payments/",
+    "restaurant/customer-order-dish-payments/",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare concurrent read throughput of the heavy read endpoints served "
+        "by a WSGI deployment (gunicorn) and an ASGI one (daphne)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--token", required=True, help="API token used for the requests")
+        parser.add_argument("--wsgi-url", help="e.g. http://127.0.0.1:8000")
+        parser.add_argument("--asgi-url", help="e.g. http://127.0.0.1:8001")
+        parser.add_argument("--concurrency", type=int, default=20)
+        parser.add_argument("--requests", type=int, default=200, help="Requests per deployment")
+
+    def handle(self, *args, **options):
+        if not options["wsgi_url"] and not options["asgi_url"]:
+            raise CommandError("Pass --wsgi-url, --asgi-url or both.")
+
+        bases: Dict[str, str] = {}
+        if options["wsgi_url"]:
+            bases["wsgi"] = f"{options['wsgi_url'].rstrip('/')}/w/api/"
+        if options["asgi_url"]:
+            bases["asgi"] = f"{options['asgi_url'].rstrip('/')}/w/api/"
+        session = self.get_session(options)
+
+        # Time only the paths every deployment answers with 200, so both
+        # serve the same mix and redirects or error pages are not measured
+        paths: List[str] = []
+        for path in READ_PATHS:
+            codes: Dict[str, int] = {
+                name: session.get(base + path, allow_redirects=False).status_code
+                for name, base in bases.items()
+            }
+            if all(code == 200 for code in codes.values()):
+                paths.append(path)
+            else:
+                self.stdout.write(self.style.WARNING(f"Skipping {path}: {codes}"))
+        if not paths:
+            raise CommandError("No read path answered with 200.")
+
+        results: Dict[str, Dict] = {}
+        for name, base in bases.items():
+            results[name] = self.run(session, [base + path for path in paths], options)
+            self.stdout.write(self.format_result(name, results[name]))
+        if len(results) == 2:
+            self.stdout.write(
+                f"asgi/wsgi throughput: {results['asgi']['throughput'] / results['wsgi']['throughput']:.2f}x "
+                f"over {len(paths)} paths"
+            )
+
+    def get_session(self, options) -> requests.Session:
+        session = requests.Session()
+        session.headers["Authorization"] = f"Token {options['token']}"
+        adapter = HTTPAdapter(pool_maxsize=options["concurrency"])
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        return session
+
+    def run(self, session: requests.Session, urls: List[str], options) -> Dict:
+        def fetch(index: int):
+            started = time.perf_counter()
+            response = session.get(urls[index % len(urls)], allow_redirects=False)
+            return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            results = list(executor.map(fetch, range(options["requests"])))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for latency, _ in results)
+        return {
+            "elapsed": elapsed,
+            "throughput": len(results) / elapsed,
+            "p50": statistics.median(latencies),
+            "p95": latencies[max(int(len(latencies) * 0.95) - 1, 0)],
+            "errors": sum(1 for _, code in results if code != 200),
+        }
+
+    def format_result(self, name: str, result: Dict) -> str:
+        return (
+            f"{name}: {result['throughput']:.1f} req/s in {result['elapsed']:.2f}s, "
+            f"p50 {result['p50'] * 1000:.0f} ms, p95 {result['p95'] * 1000:.0f} ms, "
+            f"{result['errors']} errors"
+        )
@@ -0,0 +1,80 @@
+import random
+import statistics
+import string
+import time
+from typing import Dict, List
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import CreditCustomer
+from core.search import SOURCES, normalize_name, normalize_phone, search
+
+NAMES: List[str] = ["Juma", "Neema", "Baraka", "Rehema", "Amani", "Zawadi", "Hamisi", "Mwanaidi"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time customer search queries (exact, prefix, misspelled name and phone), "
+        "optionally over synthetic credit customers that are rolled back afterwards"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Synthetic credit customers to add first")
+        parser.add_argument("--runs", type=int, default=50, help="Runs per query")
+        parser.add_argument("--source", action="append", choices=list(SOURCES), help="Source to search (repeatable)")
+        parser.add_argument("--name", default="Juma", help="Name searched exactly, by prefix and misspelled")
+        parser.add_argument("--phone", default="0712", help="Phone prefix searched")
+
+    def handle(self, *args, **options):
+        name: str = options["name"]
+        queries: Dict[str, str] = {
+            "name": name,
+            "prefix": name[: max(len(name) // 2, 2)],
+            "typo": name[:-2] + name[-1] + name[-2] if len(name) > 2 else name,
+            "phone": options["phone"],
+        }
+
+        with transaction.atomic():
+            if options["seed"]:
+                self.seed(options["seed"])
+            for label, query in queries.items():
+                self.stdout.write(self.format_result(label, query, self.run(query, options)))
+            transaction.set_rollback(True)
+
+    def seed(self, count: int):
+        customers: List[CreditCustomer] = []
+        for index in range(count):
+            suffix = "".join(random.choices(string.ascii_lowercase, k=4))
+            customer = CreditCustomer(
+                name=f"{random.choice(NAMES)} {suffix}",
+                phone=f"07{random.randint(10000000, 99999999)}",
+                address="Benchmark",
+            )
+            # bulk_create sends no pre_save
+            customer.search_name = normalize_name(customer.name)
+            customer.search_phone = normalize_phone(customer.phone)
+            customers.append(customer)
+        CreditCustomer.objects.bulk_create(customers, batch_size=1000)
+        self.stdout.write(f"Seeded {count} credit customers (rolled back at the end).")
+
+    def run(self, query: str, options) -> Dict:
+        latencies: List[float] = []
+        results: int = 0
+        for _ in range(options["runs"]):
+            started = time.perf_counter()
+            results = len(search(query, options["source"])["results"])
+            latencies.append(time.perf_counter() - started)
+
+        latencies.sort()
+        return {
+            "results": results,
+            "p50": statistics.median(latencies),
+            "p95": latencies[max(int(len(latencies) * 0.95) - 1, 0)],
+        }
+
+    def format_result(self, label: str, query: str, result: Dict) -> str:
+        return (
+            f"{label:<7} {query!r:<12} {result['results']:>3} results, "
+            f"p50 {result['p50'] * 1000:.1f} ms, p95 {result['p95'] * 1000:.1f} ms"
+        )
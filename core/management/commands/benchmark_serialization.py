@@ -0,0 +1,122 @@
+import time
+from typing import Callable, Dict, List
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Expenditure
+from core.renderers import FastJSONRenderer, orjson
+from core.serialization import FlatSerializer, date_part, time_part, timestamp
+
+
+class ExpenditureModelSerializer(serializers.ModelSerializer):
+    """The ModelSerializer ExpenditureView used before FlatSerializer"""
+
+    class Meta:
+        model = Expenditure
+        fields = "__all__"
+
+    def to_representation(self, instance) -> Dict:
+        return {
+            "id": instance.id,
+            "name": instance.name,
+            "amount": instance.amount,
+            "expenditure_for": instance.expenditure_for.capitalize(),
+            "date_created": instance.date_created.timestamp(),
+        }
+
+
+EXPENDITURE_SERIALIZER = FlatSerializer(
+    id="id",
+    name="name",
+    amount="amount",
+    expenditure_for=("expenditure_for", str.capitalize),
+    date_created=("date_created", timestamp),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time ModelSerializer against FlatSerializer, str().split() against the "
+        "datetime formatters and DRF's JSONRenderer against FastJSONRenderer on "
+        "list sized payloads, in process"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=5, help="Best of this many runs")
+
+    def handle(self, *args, **options):
+        rows: List[Dict] = self.get_rows(options["rows"])
+        instances: List[Expenditure] = [Expenditure(**row) for row in rows]
+        repeat: int = options["repeat"]
+
+        self.stdout.write(f"{len(rows)} rows, best of {repeat} runs")
+        self.compare(
+            "serialize",
+            repeat,
+            lambda: ExpenditureModelSerializer(instances, many=True).data,
+            lambda: EXPENDITURE_SERIALIZER.serialize_rows(rows),
+        )
+        self.compare(
+            "date/time",
+            repeat,
+            lambda: [
+                (
+                    str(row["date_created"]).split(" ")[0],
+                    str(row["date_created"]).split(" ")[1].split(".")[0],
+                )
+                for row in rows
+            ],
+            lambda: [(date_part(row["date_created"]), time_part(row["date_created"])) for row in rows],
+        )
+
+        data: List[Dict] = EXPENDITURE_SERIALIZER.serialize_rows(rows)
+        if orjson is None:
+            self.stdout.write("orjson is not installed; FastJSONRenderer falls back to JSONRenderer")
+        self.compare(
+            "render",
+            repeat,
+            lambda: JSONRenderer().render(data),
+            lambda: FastJSONRenderer().render(data),
+        )
+
+    def get_rows(self, count: int) -> List[Dict]:
+        """Expenditure rows from the database, repeated (or made up) up to count"""
+
+        fields = ["id", "name", "amount", "expenditure_for", "date_created"]
+        rows: List[Dict] = list(Expenditure.objects.values(*fields)[:count])
+        if not rows:
+            now = timezone.now()
+            rows = [
+                {
+                    "id": index,
+                    "name": f"Expenditure {index}",
+                    "amount": index * 100,
+                    "expenditure_for": ("bar", "restaurant", "both")[index % 3],
+                    "date_created": now,
+                }
+                for index in range(1, count + 1)
+            ]
+
+        return [rows[index % len(rows)] for index in range(count)]
+
+    def compare(self, name: str, repeat: int, before: Callable, after: Callable):
+        before_seconds: float = self.best_of(before, repeat)
+        after_seconds: float = self.best_of(after, repeat)
+        self.stdout.write(
+            f"{name}: {before_seconds * 1000:.1f} ms -> {after_seconds * 1000:.1f} ms "
+            f"({before_seconds / after_seconds:.1f}x)"
+        )
+
+    @staticmethod
+    def best_of(function: Callable, repeat: int) -> float:
+        timings: List[float] = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - started)
+
+        return min(timings)
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from core.forecasting import COVER_DAYS, HISTORY_WEEKS, forecast_stock_outs
+
+
+class Command(BaseCommand):
+    help = "Recompute depletion rates and projected stock out dates (run nightly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--weeks",
+            type=int,
+            default=HISTORY_WEEKS,
+            help="Weeks of history used for the weekday moving averages",
+        )
+        parser.add_argument(
+            "--cover-days",
+            type=int,
+            default=COVER_DAYS,
+            help="Days of demand a reorder should cover",
+        )
+
+    def handle(self, *args, **options):
+        total: int = forecast_stock_outs(
+            weeks=options["weeks"], cover_days=options["cover_days"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"{total} projections computed."))
@@ -0,0 +1,19 @@
+from typing import Dict
+
+from django.core.management.base import BaseCommand
+
+from core.payroll import SECTIONS, link_payees
+from user.models import User
+
+
+class Command(BaseCommand):
+    help = "Link payroll payments without a payee to the user whose username matches their name"
+
+    def handle(self, *args, **options):
+        users: Dict[str, int] = {
+            username.lower(): user_id
+            for user_id, username in User.objects.values_list("id", "username")
+        }
+        for section, model in SECTIONS.items():
+            linked = link_payees(model, users)
+            self.stdout.write(self.style.SUCCESS(f"{linked} {section} payments linked."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.movements import open_ledger
+
+
+class Command(BaseCommand):
+    help = "Record the current stock of every item not yet in the stock movement ledger as an opening adjustment"
+
+    def handle(self, *args, **options):
+        opened: int = open_ledger()
+        self.stdout.write(self.style.SUCCESS(f"{opened} items opened in the stock ledger."))
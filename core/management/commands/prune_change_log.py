@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.sync import RETENTION_DAYS, prune_change_log
+
+
+class Command(BaseCommand):
+    help = "Delete sync change log entries older than the retention period"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=RETENTION_DAYS,
+            help=f"Entries older than this many days are deleted (default {RETENTION_DAYS})",
+        )
+
+    def handle(self, *args, **options):
+        deleted = prune_change_log(options["days"])
+        self.stdout.write(self.style.SUCCESS(f"{deleted} change log entries deleted."))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from core.search import SOURCES, normalize_name, normalize_phone
+
+CHUNK_SIZE: int = 1000
+
+
+class Command(BaseCommand):
+    help = "Fill the normalized search name and phone of credit customers and customer orders (run once after deploying search)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            action="append",
+            choices=list(SOURCES),
+            help="Source to rebuild (repeatable, default: all)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHUNK_SIZE,
+            help="Rows read and updated per round of queries",
+        )
+
+    def handle(self, *args, **options):
+        for source in options["source"] or SOURCES:
+            model = SOURCES[source]["model"]
+            name_field, phone_field, _, _ = SOURCES[source]["fields"]
+            rows = model.objects.only("id", name_field, phone_field).order_by("id")
+            updated: int = 0
+            last_id: int = 0
+            while True:
+                chunk = list(rows.filter(id__gt=last_id)[: options["chunk_size"]])
+                if not chunk:
+                    break
+                for row in chunk:
+                    row.search_name = normalize_name(getattr(row, name_field))
+                    row.search_phone = normalize_phone(getattr(row, phone_field))
+                model.objects.bulk_update(chunk, ["search_name", "search_phone"])
+                updated += len(chunk)
+                last_id = chunk[-1].id
+
+            self.stdout.write(self.style.SUCCESS(f"{source}: {updated} rows rebuilt."))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db.models import IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from bar.models import (
+    RegularInventoryRecord,
+    RegularInventoryRecordBroken,
+    TekilaInventoryRecord,
+    TequilaInventoryRecordBroken,
+)
+
+# section: (inventory record model, broken model, the broken model's foreign key)
+SECTIONS = {
+    "regular": (RegularInventoryRecord, RegularInventoryRecordBroken, "regular_inventory_record"),
+    "tequila": (TekilaInventoryRecord, TequilaInventoryRecordBroken, "tequila_inventory_record"),
+}
+
+
+class Command(BaseCommand):
+    help = "Set the broken_total of every inventory record from its broken entries"
+
+    def handle(self, *args, **options):
+        for section, (model, broken_model, record_field) in SECTIONS.items():
+            totals = (
+                broken_model.objects.filter(**{record_field: OuterRef("pk")})
+                .order_by()
+                .values(record_field)
+                .annotate(total=Sum("quantity_broken"))
+                .values("total")
+            )
+            updated = model.objects.update(
+                broken_total=Coalesce(Subquery(totals, output_field=IntegerField()), 0)
+            )
+            self.stdout.write(self.style.SUCCESS(f"{updated} {section} inventory records updated."))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from core.reconciliation import CHUNK_SIZE, reconcile
+from core.valuation import SECTIONS
+
+
+class Command(BaseCommand):
+    help = "Report inventory items whose available quantity drifted from receipts, sales, breakage and stock outs (run nightly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--section",
+            action="append",
+            choices=list(SECTIONS),
+            help="Section to check (repeatable, default: all)",
+        )
+        parser.add_argument(
+            "--repair",
+            action="store_true",
+            help="Reset drifting items to their expected quantity",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHUNK_SIZE,
+            help="Items read per round of queries",
+        )
+
+    def handle(self, *args, **options):
+        drifting: int = 0
+        for item in reconcile(options["section"], options["repair"], options["chunk_size"]):
+            drifting += 1
+            self.stdout.write(
+                f"{item['section']:<10} item {item['item']:>6}: received {item['received']}, "
+                f"consumed {item['consumed']}, expected {item['expected']}, "
+                f"available {item['available']} ({item['drift']:+d})"
+                + (" repaired" if item["repaired"] else "")
+            )
+
+        style = self.style.WARNING if drifting and not options["repair"] else self.style.SUCCESS
+        self.stdout.write(style(f"{drifting} drifting items{' repaired' if options['repair'] else ''}."))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.low_stock import SECTIONS, scan_low_stock
+
+
+class Command(BaseCommand):
+    help = "Alert managers about bar and restaurant items at or below their threshold (run from cron, or as a worker with --interval)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--section",
+            action="append",
+            choices=list(SECTIONS),
+            help="Section to scan (repeatable). Defaults to all sections",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Seconds between scans, scanning until stopped (default: scan once)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            messages = scan_low_stock(options["section"] or tuple(SECTIONS))
+            for message in messages:
+                self.stdout.write(message)
+            self.stdout.write(self.style.SUCCESS(f"{len(messages)} new alerts sent."))
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
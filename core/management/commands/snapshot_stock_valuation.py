@@ -0,0 +1,38 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.utils import get_date_objects
+from core.valuation import snapshot_stock_valuation
+
+
+class Command(BaseCommand):
+    help = "Store the end of day FIFO stock valuation of every item (run nightly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            help="Day to value, YYYY-MM-DD (default: today)",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=1,
+            help="Number of days to value, ending with --date (backfills history)",
+        )
+
+    def handle(self, *args, **options):
+        date: datetime.date = timezone.localdate()
+        if options["date"]:
+            try:
+                date = get_date_objects(options["date"], options["date"])[0]
+            except (ValueError, OverflowError):
+                raise CommandError("Invalid date.")
+        if options["days"] < 1:
+            raise CommandError("--days must be at least 1.")
+
+        for offset in range(options["days"] - 1, -1, -1):
+            day: datetime.date = date - datetime.timedelta(days=offset)
+            total: int = snapshot_stock_valuation(day)
+            self.stdout.write(self.style.SUCCESS(f"{day}: {total} items valued."))
@@ -0,0 +1,57 @@
+import json
+import subprocess
+import sys
+from typing import Dict, List
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter: this process already paid every lazy cost
+STARTUP_SCRIPT: str = """
+import json, os, time
+
+timings = []
+started = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", {settings_module!r})
+from django.conf import settings
+settings.INSTALLED_APPS  # Imports the settings module (and icecream)
+timings.append({{"step": "settings", "seconds": time.perf_counter() - started, "count": 1, "error": None}})
+
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+timings.append({{"step": "app registry", "seconds": time.perf_counter() - started, "count": 1, "error": None}})
+
+started = time.perf_counter()
+import importlib
+importlib.import_module(settings.ROOT_URLCONF)
+timings.append({{"step": "url modules", "seconds": time.perf_counter() - started, "count": 1, "error": None}})
+
+from core.prewarm import prewarm
+timings.extend(prewarm())
+print(json.dumps(timings))
+"""
+
+
+class Command(BaseCommand):
+    help = "Show where a fresh worker spends its startup and prewarm time"
+
+    def handle(self, *args, **options):
+        script: str = STARTUP_SCRIPT.format(settings_module=settings.SETTINGS_MODULE)
+        completed = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, cwd=settings.BASE_DIR
+        )
+        if completed.returncode != 0:
+            raise CommandError(completed.stderr.strip())
+
+        timings: List[Dict] = json.loads(completed.stdout.strip().splitlines()[-1])
+        total: float = sum(step["seconds"] for step in timings)
+        for step in timings:
+            line: str = (
+                f"{step['step']:<20} {step['seconds'] * 1000:>9.1f} ms "
+                f"{step['seconds'] / total * 100:>5.1f}%"
+            )
+            if step["error"]:
+                line += f"  failed: {step['error']}"
+            self.stdout.write(line)
+        self.stdout.write(f"{'total':<20} {total * 1000:>9.1f} ms")
@@ -1,6 +1,8 @@
 from abc import abstractmethod
 from typing import Dict, List, Set
 
+from django.contrib.postgres.indexes import GinIndex
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.db.models.aggregates import Sum
 from django.db.models.manager import Manager
@@ -211,6 +213,8 @@ class CreditCustomer(models.Model):
     phone = models.CharField(max_length=14)
     address = models.CharField(max_length=255)
     credit_limit = models.FloatField(null=True, blank=True)
+    search_name = models.CharField(max_length=255, blank=True, default="", editable=False)
+    search_phone = models.CharField(max_length=15, blank=True, default="", editable=False)
 
     def __str__(self) -> str:
 
@@ -258,7 +262,13 @@ class CreditCustomer(models.Model):
         ordering: List[str] = ["-id"]
         verbose_name: str = "Credit Customer"
         verbose_name_plural: str = "Credit Customers"
-        indexes = [models.Index(fields=["name", "phone", "address", "credit_limit"])]
+        indexes = [
+            models.Index(fields=["name", "phone", "address", "credit_limit"]),
+            GinIndex(fields=["search_name"], opclasses=["gin_trgm_ops"], name="credit_customer_name_trgm"),
+            models.Index(
+                fields=["search_phone"], opclasses=["varchar_pattern_ops"], name="credit_customer_phone_prefix"
+            ),
+        ]
 
 
 class BaseCreditCustomerPayment(models.Model):
@@ -331,6 +341,8 @@ class BaseCustomerOrderRecord(models.Model):
     customer_orders_number = models.CharField(max_length=8, null=True, blank=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     date_created = models.DateTimeField()
+    search_name = models.CharField(max_length=255, blank=True, default="", editable=False)
+    search_phone = models.CharField(max_length=15, blank=True, default="", editable=False)
     objects = Manager()
 
     @property
@@ -375,3 +387,204 @@ class Expenditure(models.Model):
         indexes = [
             models.Index(fields=["name", "amount", "expenditure_for", "date_created"])
         ]
+
+
+STOCK_SECTION_CHOICES = (
+    ("regular", "Regular"),
+    ("tequila", "Tequila"),
+    ("restaurant", "Restaurant"),
+)
+
+
+class StockOutProjection(models.Model):
+    """Nightly depletion forecast for a single inventory item"""
+
+    item = models.OneToOneField(Item, on_delete=models.CASCADE)
+    section = models.CharField(
+        max_length=10, choices=STOCK_SECTION_CHOICES, db_index=True
+    )
+    available_quantity = models.IntegerField(default=0)
+    daily_rate = models.FloatField(default=0.0)
+    weekday_rates = models.JSONField(default=list)
+    days_to_stock_out = models.IntegerField(null=True, blank=True)
+    projected_stock_out_date = models.DateField(null=True, blank=True)
+    reorder_quantity = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField()
+    objects = Manager()
+
+    def __str__(self) -> str:
+        return f"Stock Out Projection For {self.item.name}"
+
+    class Meta:
+        ordering: List[str] = ["projected_stock_out_date", "-id"]
+        verbose_name: str = "Stock Out Projection"
+        verbose_name_plural: str = "Stock Out Projections"
+        indexes = [
+            models.Index(fields=["section", "projected_stock_out_date"]),
+        ]
+
+
+LOW_STOCK_LEVEL_CHOICES = (
+    ("low", "Nearly Out Of Stock"),
+    ("out", "Out Of Stock"),
+)
+
+
+class LowStockAlert(models.Model):
+    """A low stock alert of an item, notified by SMS once; resolved when the
+    item is restocked"""
+
+    item = models.ForeignKey(Item, on_delete=models.CASCADE)
+    section = models.CharField(max_length=10, choices=STOCK_SECTION_CHOICES)
+    level = models.CharField(max_length=3, choices=LOW_STOCK_LEVEL_CHOICES)
+    available_quantity = models.IntegerField()
+    threshold = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    notified_at = models.DateTimeField(null=True, blank=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    objects = Manager()
+
+    def __str__(self) -> str:
+        return f"{self.item.name}: {self.get_level_display()}"
+
+    class Meta:
+        ordering: List[str] = ["-id"]
+        verbose_name: str = "Low Stock Alert"
+        verbose_name_plural: str = "Low Stock Alerts"
+        indexes = [
+            models.Index(fields=["section", "resolved_at", "item"]),
+        ]
+
+
+class StockValuation(models.Model):
+    """End of day FIFO valuation of an item's stock and the cost of what was
+    consumed that day, computed nightly by snapshot_stock_valuation"""
+
+    item = models.ForeignKey(Item, on_delete=models.CASCADE)
+    section = models.CharField(max_length=10, choices=STOCK_SECTION_CHOICES)
+    date = models.DateField()
+    quantity = models.IntegerField(default=0)
+    value = models.FloatField(default=0.0)
+    consumed_quantity = models.IntegerField(default=0)
+    cost_of_sales = models.FloatField(default=0.0)
+    computed_at = models.DateTimeField()
+    objects = Manager()
+
+    def __str__(self) -> str:
+        return f"{self.item.name} On {self.date}: {self.value}"
+
+    class Meta:
+        ordering: List[str] = ["-date", "item"]
+        verbose_name: str = "Stock Valuation"
+        verbose_name_plural: str = "Stock Valuations"
+        unique_together: Set[str] = ("item", "date")
+        indexes = [
+            models.Index(fields=["date", "section"]),
+        ]
+
+
+MOVEMENT_SECTION_CHOICES = STOCK_SECTION_CHOICES + (("miscellaneous", "Miscellaneous"),)
+
+MOVEMENT_KIND_CHOICES = (
+    ("receipt", "Receipt"),
+    ("sale", "Sale"),
+    ("breakage", "Breakage"),
+    ("issue", "Issue"),
+    ("adjustment", "Adjustment"),
+)
+
+
+class StockMovement(models.Model):
+    """Append-only ledger of stock changes: quantity is signed and balance is
+    the running balance of the item in its section once the movement is
+    applied"""
+
+    item = models.ForeignKey(Item, on_delete=models.CASCADE)
+    section = models.CharField(max_length=13, choices=MOVEMENT_SECTION_CHOICES)
+    kind = models.CharField(max_length=10, choices=MOVEMENT_KIND_CHOICES)
+    quantity = models.IntegerField()
+    balance = models.IntegerField()
+    record_id = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Inventory record the movement added to or drew from"
+    )
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    objects = Manager()
+
+    def __str__(self) -> str:
+        return f"{self.item.name}: {self.get_kind_display()} {self.quantity:+d}"
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("Stock movements are append-only; record an adjustment instead.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Stock movements are append-only; record an adjustment instead.")
+
+    class Meta:
+        ordering: List[str] = ["-id"]
+        verbose_name: str = "Stock Movement"
+        verbose_name_plural: str = "Stock Movements"
+        indexes = [
+            models.Index(fields=["item", "section", "created_at"]),
+            models.Index(fields=["section", "created_at"]),
+        ]
+
+
+CHANGE_ACTION_CHOICES = (
+    ("upsert", "Created or Updated"),
+    ("delete", "Deleted"),
+    ("prune", "Pruned Up To"),
+)
+
+
+class ChangeLog(models.Model):
+    """Log of changes to the rows tablets sync, tagged with the id of the
+    transaction that wrote them; a client's sync token is the transaction id
+    below which it has seen every entry"""
+
+    model = models.CharField(max_length=40)
+    object_id = models.PositiveIntegerField()
+    action = models.CharField(max_length=6, choices=CHANGE_ACTION_CHOICES)
+    txid = models.BigIntegerField()
+    changed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    objects = Manager()
+
+    def __str__(self) -> str:
+        return f"#{self.id} {self.model} {self.object_id}: {self.get_action_display()}"
+
+    class Meta:
+        ordering: List[str] = ["id"]
+        verbose_name: str = "Change Log"
+        verbose_name_plural: str = "Change Logs"
+        indexes = [models.Index(fields=["txid", "id"])]
+
+
+SUBMISSION_KIND_CHOICES = (
+    ("bar_order", "Bar Order"),
+    ("bar_payment", "Bar Order Payment"),
+    ("dish", "Customer Dish"),
+    ("dish_payment", "Customer Dish Payment"),
+)
+
+
+class OfflineSubmission(models.Model):
+    """A queued order or payment a tablet submitted, stored under the
+    client's idempotency key so that retries replay the first response"""
+
+    key = models.CharField(max_length=64, unique=True)
+    kind = models.CharField(max_length=12, choices=SUBMISSION_KIND_CHOICES)
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField(encoder=DjangoJSONEncoder, null=True, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    objects = Manager()
+
+    def __str__(self) -> str:
+        return f"{self.get_kind_display()}: {self.key}"
+
+    class Meta:
+        ordering: List[str] = ["-id"]
+        verbose_name: str = "Offline Submission"
+        verbose_name_plural: str = "Offline Submissions"
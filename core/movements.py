@@ -0,0 +1,209 @@
+"""
+Append-only stock movement ledger.
+
+Every path that changes an inventory record's available quantity (receipts,
+bar sales, breakage, restaurant stock outs, adjustments) appends a signed
+StockMovement carrying the running balance of the item in its section (a
+restaurant item can be held both as main inventory and as miscellaneous
+stock). Movements of one item are appended in turn: the item's row is
+locked, its latest balances read and the new balances assigned, so the
+balance of an item and section at any time is its latest movement up to
+then, one (item, section, created_at) index lookup. Stock on hand at
+a past time and movement reports are range scans of the ledger instead of
+reconstructions from orders, breakage and stock outs.
+
+The ledger starts empty; open_stock_ledger records the current stock of
+every item and section as an opening adjustment.
+"""
+import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.query import QuerySet
+from django.utils import timezone
+
+from bar.models import RegularInventoryRecord, TekilaInventoryRecord
+from core.models import Item, StockMovement
+from restaurant.models import MainInventoryItemRecord, MiscellaneousInventoryRecord
+
+# section: (inventory record model, its item field)
+OPENING_STOCK: Dict[str, tuple] = {
+    "regular": (RegularInventoryRecord, "item"),
+    "tequila": (TekilaInventoryRecord, "item"),
+    "restaurant": (MainInventoryItemRecord, "main_inventory_item__item"),
+    "miscellaneous": (MiscellaneousInventoryRecord, "item"),
+}
+
+
+def get_latest(queryset: QuerySet) -> QuerySet:
+    """Latest movement per item and section of queryset (DISTINCT ON them)"""
+
+    # Ordering by the item relation would expand to Item's ordering (-id),
+    # which DISTINCT ON does not accept
+    return queryset.order_by("item_id", "section", "-created_at", "-id").distinct(
+        "item_id", "section"
+    )
+
+
+def get_balances(
+    item_ids: Optional[Iterable[int]] = None, at: Optional[datetime.datetime] = None
+) -> Dict[Tuple[int, str], int]:
+    """Running balance per (item, section), at the given time or now"""
+
+    queryset = StockMovement.objects.all()
+    if item_ids is not None:
+        queryset = queryset.filter(item__in=list(item_ids))
+    if at is not None:
+        queryset = queryset.filter(created_at__lte=at)
+
+    return {
+        (item_id, section): balance
+        for item_id, section, balance in get_latest(queryset).values_list(
+            "item_id", "section", "balance"
+        )
+    }
+
+
+def record_movements(movements: List[StockMovement]) -> List[StockMovement]:
+    """Append movements, setting the running balance of each"""
+
+    if not movements:
+        return []
+
+    item_ids: List[int] = sorted({movement.item_id for movement in movements})
+    with transaction.atomic():
+        # Writers of one item wait here, so balances and times follow each other
+        list(Item.objects.select_for_update().filter(id__in=item_ids).order_by("id").values_list("id"))
+        balances: Dict[Tuple[int, str], int] = get_balances(item_ids)
+        now = timezone.now()
+        for movement in movements:
+            key: Tuple[int, str] = (movement.item_id, movement.section)
+            balances[key] = balances.get(key, 0) + movement.quantity
+            movement.balance = balances[key]
+            movement.created_at = now
+
+        return StockMovement.objects.bulk_create(movements)
+
+
+def record_movement(
+    item_id: int,
+    section: str,
+    kind: str,
+    quantity: int,
+    record_id: Optional[int] = None,
+    created_by_id: Optional[int] = None,
+) -> StockMovement:
+    return record_movements(
+        [
+            StockMovement(
+                item_id=item_id,
+                section=section,
+                kind=kind,
+                quantity=quantity,
+                record_id=record_id,
+                created_by_id=created_by_id,
+            )
+        ]
+    )[0]
+
+
+def get_stock_at(at: datetime.datetime, section: Optional[str] = None) -> List[Dict]:
+    """Balance of every item and section at the given time"""
+
+    queryset = StockMovement.objects.filter(created_at__lte=at)
+    if section:
+        queryset = queryset.filter(section=section)
+
+    return list(
+        get_latest(queryset).values("item", "section", "balance", name=F("item__name"))
+    )
+
+
+def get_movements(
+    start: datetime.datetime,
+    end: datetime.datetime,
+    item_id: Optional[int] = None,
+    section: Optional[str] = None,
+    kind: Optional[str] = None,
+) -> QuerySet:
+    """Movements from start to end (exclusive), newest first"""
+
+    queryset = StockMovement.objects.filter(created_at__gte=start, created_at__lt=end)
+    if item_id:
+        queryset = queryset.filter(item=item_id)
+    if section:
+        queryset = queryset.filter(section=section)
+    if kind:
+        queryset = queryset.filter(kind=kind)
+
+    return queryset.order_by("-created_at", "-id").values(
+        "id",
+        "item",
+        "section",
+        "kind",
+        "quantity",
+        "balance",
+        "record_id",
+        "created_at",
+        name=F("item__name"),
+        created_by_name=F("created_by__username"),
+    )
+
+
+def get_movement_report(
+    start: datetime.datetime, end: datetime.datetime, section: Optional[str] = None
+) -> List[Dict]:
+    """Opening balance, total per kind and closing balance of every item and
+    section that moved from start to end (exclusive)"""
+
+    queryset = StockMovement.objects.filter(created_at__gte=start, created_at__lt=end)
+    if section:
+        queryset = queryset.filter(section=section)
+
+    items: Dict[Tuple[int, str], Dict] = {}
+    for row in (
+        queryset.values("item", "section", "kind", name=F("item__name"))
+        .annotate(total=Sum("quantity"))
+        .order_by()
+    ):
+        item: Dict = items.setdefault(
+            (row["item"], row["section"]),
+            {"item": row["item"], "name": row["name"], "section": row["section"], "movements": {}},
+        )
+        item["movements"][row["kind"]] = row["total"]
+
+    item_ids = {item_id for item_id, _ in items}
+    opening = get_balances(item_ids, at=start - datetime.timedelta(microseconds=1))
+    closing = get_balances(item_ids, at=end - datetime.timedelta(microseconds=1))
+    for key, item in items.items():
+        item["opening_balance"] = opening.get(key, 0)
+        item["closing_balance"] = closing.get(key, 0)
+
+    return sorted(items.values(), key=lambda item: (item["section"], item["name"]))
+
+
+def open_ledger() -> int:
+    """Record the current stock of every item and section without movements
+    yet as an opening adjustment"""
+
+    movements: List[StockMovement] = []
+    with transaction.atomic():
+        started = set(StockMovement.objects.values_list("item_id", "section").distinct().order_by())
+        for section, (model, item_field) in OPENING_STOCK.items():
+            rows = (
+                model.objects.values(item_field)
+                .annotate(total=Sum("available_quantity"))
+                .values_list(item_field, "total")
+                .order_by()
+            )
+            for item_id, total in rows:
+                if (item_id, section) not in started:
+                    started.add((item_id, section))
+                    movements.append(
+                        StockMovement(
+                            item_id=item_id, section=section, kind="adjustment", quantity=total or 0
+                        )
+                    )
+
+        return len(record_movements(movements))
@@ -0,0 +1,162 @@
+"""
+Bulk submission of orders and payments queued by tablets while offline.
+
+Every submission carries a client generated idempotency key. A batch is
+applied in one transaction, each submission inside its own savepoint, using
+the same create views as online requests; a submission that fails for any
+reason only rolls back its own savepoint and is reported as failed.
+Successful submissions are stored with their response under the key (unique
+index), so a retried key replays the stored response instead of creating a
+duplicate.
+"""
+import logging
+from typing import Dict, List, Optional
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from bar.views import (
+    CustomerRegularTequilaOrderRecordPaymentViewSet,
+    RegularTequilaOrderRecordViewSet,
+)
+from core.models import OfflineSubmission
+from restaurant.views import CustomerDishPaymentViewSet, CustomerDishViewSet
+
+logger = logging.getLogger(__name__)
+MAX_BATCH_SIZE: int = 200
+SUBMISSION_VIEWS: Dict = {
+    "bar_order": RegularTequilaOrderRecordViewSet,
+    "bar_payment": CustomerRegularTequilaOrderRecordPaymentViewSet,
+    "dish": CustomerDishViewSet,
+    "dish_payment": CustomerDishPaymentViewSet,
+}
+
+
+class QueuedRequest:
+    """The parts of a request the create views read, for one submission"""
+
+    def __init__(self, request, data: Dict):
+        self.data = data
+        self.user = request.user
+        self.query_params = request.query_params
+        self.method = "POST"
+
+
+class SubmissionRejected(Exception):
+    def __init__(self, status_code: int, detail):
+        self.status_code = status_code
+        self.detail = detail
+
+
+def get_result(submission: OfflineSubmission, replayed: bool) -> Dict:
+    return {
+        "key": submission.key,
+        "type": submission.kind,
+        "status": submission.status_code,
+        "replayed": replayed,
+        "response": submission.response,
+    }
+
+
+def get_error(key: str, kind: str, status_code: int, detail) -> Dict:
+    return {
+        "key": key,
+        "type": kind,
+        "status": status_code,
+        "replayed": False,
+        "response": detail,
+    }
+
+
+def apply_submission(request, key: str, kind: str, data: Dict) -> OfflineSubmission:
+    """Run the create view of kind and store its response under key"""
+
+    view = SUBMISSION_VIEWS[kind](
+        request=QueuedRequest(request, data), args=(), kwargs={}, format_kwarg=None, action="create"
+    )
+    with transaction.atomic():
+        response = view.create(view.request)
+        if response.status_code >= 400:
+            raise SubmissionRejected(response.status_code, response.data)
+
+        return OfflineSubmission.objects.create(
+            key=key,
+            kind=kind,
+            status_code=response.status_code,
+            response=response.data,
+            created_by=request.user,
+        )
+
+
+def validate_submission(submission) -> Optional[str]:
+    if not isinstance(submission, dict):
+        return "Every submission must be an object."
+    key = submission.get("key")
+    if not isinstance(key, str) or not key or len(key) > 64:
+        return "key must be a string of 1 to 64 characters."
+    if submission.get("type") not in SUBMISSION_VIEWS:
+        return f"type must be one of {', '.join(SUBMISSION_VIEWS)}."
+    if not isinstance(submission.get("data"), dict):
+        return "data must be an object."
+    return None
+
+
+@transaction.atomic
+def submit_batch(request, submissions: List) -> List[Dict]:
+    """Apply the submissions in order and return one result per submission"""
+
+    keys: List[str] = [
+        submission["key"] for submission in submissions if not validate_submission(submission)
+    ]
+    stored: Dict[str, OfflineSubmission] = {
+        submission.key: submission
+        for submission in OfflineSubmission.objects.filter(key__in=keys)
+    }
+
+    results: List[Dict] = []
+    for submission in submissions:
+        message: Optional[str] = validate_submission(submission)
+        if message:
+            key = submission.get("key") if isinstance(submission, dict) else None
+            results.append(get_error(key, None, status.HTTP_400_BAD_REQUEST, {"message": message}))
+            continue
+
+        key, kind = submission["key"], submission["type"]
+        if key in stored:
+            results.append(get_result(stored[key], replayed=True))
+            continue
+
+        try:
+            stored[key] = apply_submission(request, key, kind, submission["data"])
+            results.append(get_result(stored[key], replayed=False))
+        except SubmissionRejected as error:
+            results.append(get_error(key, kind, error.status_code, error.detail))
+        except APIException as error:
+            results.append(get_error(key, kind, error.status_code, error.detail))
+        except IntegrityError:
+            # A concurrent batch stored the same key first
+            existing = OfflineSubmission.objects.filter(key=key).first()
+            if existing:
+                stored[key] = existing
+                results.append(get_result(existing, replayed=True))
+            else:
+                results.append(
+                    get_error(key, kind, status.HTTP_409_CONFLICT, {"message": "Conflicting submission."})
+                )
+        except (ObjectDoesNotExist, KeyError, TypeError, ValueError):
+            results.append(
+                get_error(key, kind, status.HTTP_400_BAD_REQUEST, {"message": "Invalid submission data."})
+            )
+        except Exception:
+            # Only this submission's savepoint was rolled back; the rest of
+            # the batch still applies
+            logger.exception("Offline submission %s (%s) failed", key, kind)
+            results.append(
+                get_error(
+                    key, kind, status.HTTP_500_INTERNAL_SERVER_ERROR, {"message": "Submission failed."}
+                )
+            )
+
+    return results
@@ -0,0 +1,129 @@
+"""
+Payroll rollups over the bar and restaurant payroll tables.
+
+Payments are summed in SQL, grouped by payee and month, with one query per
+table for the whole year; per-payee month and year-to-date totals are folded
+from those few rows. A payment counts for its payee user when it has one and
+for its free-text name otherwise, so payments recorded before payees were
+linked still roll up (see the link_payroll_payees command).
+"""
+import datetime
+from typing import Dict, List, Optional, Tuple
+
+from django.db.models import Sum
+from django.db.models.functions import Coalesce, ExtractMonth
+from django.db.models.query import QuerySet
+from rest_framework import serializers
+
+from bar.models import BarPayrol
+from restaurant.models import RestaurantPayrol
+from user.models import User
+
+SECTIONS: Dict = {"bar": BarPayrol, "restaurant": RestaurantPayrol}
+PAYEE_FIELD = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
+
+
+def get_payee(value) -> Optional[User]:
+    """The payee user of an update, None when it is cleared"""
+
+    if value in (None, ""):
+        return None
+    try:
+        return PAYEE_FIELD.to_internal_value(value)
+    except serializers.ValidationError:
+        raise serializers.ValidationError({"message": "Payee does not exist."})
+
+
+def get_month_range(year: int, month: int) -> Tuple[datetime.date, datetime.date]:
+    """First day of the month and first day of the next month"""
+
+    start = datetime.date(year, month, 1)
+    end = datetime.date(year + month // 12, month % 12 + 1, 1)
+
+    return start, end
+
+
+def get_payee_totals(queryset: QuerySet) -> QuerySet:
+    """Amount paid per payee over the payments of queryset"""
+
+    return (
+        queryset.values("payee", payee_name=Coalesce("payee__username", "name"))
+        .annotate(total=Sum("amount_paid"))
+        .order_by("-total")
+    )
+
+
+def get_monthly_totals(model, year: int, month: int) -> QuerySet:
+    """Amount paid per payee and month, from January to month of year"""
+
+    _, end = get_month_range(year, month)
+
+    return (
+        model.objects.filter(date_paid__gte=datetime.date(year, 1, 1), date_paid__lt=end)
+        .values(
+            "payee",
+            payee_name=Coalesce("payee__username", "name"),
+            paid_month=ExtractMonth("date_paid"),
+        )
+        .annotate(total=Sum("amount_paid"))
+        .order_by()
+    )
+
+
+def get_payroll_summary(year: int, month: int) -> Dict:
+    """Totals of month per payee and section, year to date totals per payee
+    and the totals of every month of the year up to month"""
+
+    months: List[Dict] = [
+        {"month": number, "bar": 0.0, "restaurant": 0.0, "total": 0.0}
+        for number in range(1, month + 1)
+    ]
+    payees: Dict[Tuple, Dict] = {}
+    for section, model in SECTIONS.items():
+        for row in get_monthly_totals(model, year, month):
+            payee: Dict = payees.setdefault(
+                (row["payee"], row["payee_name"]),
+                {
+                    "payee_id": row["payee"],
+                    "payee": row["payee_name"],
+                    "bar": 0.0,
+                    "restaurant": 0.0,
+                    "total": 0.0,
+                    "year_to_date": 0.0,
+                },
+            )
+            payee["year_to_date"] += row["total"]
+            if row["paid_month"] == month:
+                payee[section] += row["total"]
+                payee["total"] += row["total"]
+
+            totals: Dict = months[row["paid_month"] - 1]
+            totals[section] += row["total"]
+            totals["total"] += row["total"]
+
+    return {
+        "year": year,
+        "month": month,
+        "bar": months[-1]["bar"],
+        "restaurant": months[-1]["restaurant"],
+        "total": months[-1]["total"],
+        "year_to_date": sum(totals["total"] for totals in months),
+        "payees": sorted(payees.values(), key=lambda payee: -payee["year_to_date"]),
+        "months": months,
+    }
+
+
+def link_payees(model, users: Dict[str, int]) -> int:
+    """Set the payee of payments without one whose name is a username
+    (case insensitive); users maps lower cased usernames to user ids"""
+
+    linked: int = 0
+    names: List[str] = list(
+        model.objects.filter(payee__isnull=True).values_list("name", flat=True).distinct()
+    )
+    for name in names:
+        user_id = users.get(name.strip().lower())
+        if user_id:
+            linked += model.objects.filter(payee__isnull=True, name=name).update(payee=user_id)
+
+    return linked
@@ -0,0 +1,95 @@
+"""
+Worker prewarm.
+
+Django and DRF build most of their per-process state on first use: the URL
+resolver, router generated viewsets, the API schema, model metadata behind
+the first queries and the database connection itself (kept open for the
+worker's requests by CONN_MAX_AGE). Left alone, the first requests a fresh
+gunicorn worker serves pay for all of it. prewarm() does that work while the
+worker starts (gunicorn.conf.py) and reports how long each step took; the
+startup_report command shows the same timings.
+"""
+import time
+from typing import Callable, Dict, List, Tuple
+
+from django.db import connection
+from django.urls import URLPattern, URLResolver, get_resolver, resolve, reverse
+
+from core.reference import prime_reference_data
+from core.schema import get_schema
+
+
+def get_route_patterns(resolver: URLResolver, prefix: str = "") -> List[Tuple[str, URLPattern]]:
+    routes: List[Tuple[str, URLPattern]] = []
+    for pattern in resolver.url_patterns:
+        route: str = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            routes.extend(get_route_patterns(pattern, route))
+        else:
+            routes.append((route, pattern))
+
+    return routes
+
+
+def connect_database() -> int:
+    connection.ensure_connection()
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+
+    return 1
+
+
+def resolve_routes() -> int:
+    """Populate the resolver and import every view behind it"""
+
+    resolver = get_resolver()
+    resolver.reverse_dict  # Builds the lookups used by resolve() and reverse()
+    routes = get_route_patterns(resolver)
+    for _, pattern in routes:
+        pattern.callback  # Resolves string views and DRF's generated viewsets
+
+    return len(routes)
+
+
+def build_schema() -> int:
+    schema_view = resolve(reverse("waiterapi-schema")).func
+    schema = get_schema(schema_view.initkwargs["schema_generator"])
+
+    return len(schema.get("paths", {})) if isinstance(schema, dict) else 1
+
+
+def prime_caches() -> int:
+    prime_reference_data()
+
+    return 1
+
+
+PREWARM_STEPS: Dict[str, Callable[[], int]] = {
+    "database connection": connect_database,
+    "url resolver": resolve_routes,
+    "api schema": build_schema,
+    "reference data": prime_caches,
+}
+
+
+def prewarm() -> List[Dict]:
+    """Run every step; a failing step is reported, not raised, so a worker
+    still starts and initializes lazily instead"""
+
+    report: List[Dict] = []
+    for name, step in PREWARM_STEPS.items():
+        started = time.perf_counter()
+        try:
+            count, error = step(), None
+        except Exception as e:
+            count, error = 0, str(e)
+        report.append(
+            {
+                "step": name,
+                "seconds": time.perf_counter() - started,
+                "count": count,
+                "error": error,
+            }
+        )
+
+    return report
@@ -0,0 +1,157 @@
+"""
+Receivables aging for credit customers.
+
+Outstanding credit of every posting (credit taken less its repayments, the
+credit taken being net of the upfront payment only) is
+bucketed by the posting's age and summed per customer and section in one
+grouped query. The report is cached for the business day and dropped from
+the cache once a transaction saving a credit posting, a repayment or an
+order line (which changes what an open credit order owes) commits.
+"""
+import datetime
+from typing import Dict, List, Tuple
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import CharField, F, Value
+from django.db.models.query import QuerySet
+from django.utils import timezone
+
+from bar.models import CreditCustomerRegularTequilaOrderRecordPayment
+from core.statements import (
+    get_bar_credit_taken,
+    get_bar_repaid,
+    get_restaurant_credit_taken,
+    get_restaurant_repaid,
+)
+from restaurant.models import CreditCustomerDishPayment
+
+CACHE_KEY: str = "receivables-aging:{}"
+CACHE_TIMEOUT: int = 60 * 60 * 24
+POSTING_FIELDS: Tuple[str, ...] = (
+    "credit_customer",
+    "customer_name",
+    "customer_phone",
+    "section",
+    "posting_date",
+    "credit_taken",
+    "repaid",
+)
+BUCKETS: Tuple[Tuple[str, int, int], ...] = (
+    ("days_0_7", 0, 7),
+    ("days_8_30", 8, 30),
+    ("days_31_60", 31, 60),
+    ("days_60_plus", 61, 2 ** 31 - 1),
+)
+
+
+def as_postings(queryset: QuerySet, **expressions) -> QuerySet:
+    """Annotate in POSTING_FIELDS order so every part of the UNION lines up"""
+
+    return (
+        queryset.annotate(**{field: expressions[field] for field in POSTING_FIELDS})
+        .values(*POSTING_FIELDS)
+        .order_by()
+    )
+
+
+def get_restaurant_postings() -> QuerySet:
+    return as_postings(
+        CreditCustomerDishPayment.objects.all(),
+        credit_customer=F("customer"),
+        customer_name=F("customer__name"),
+        customer_phone=F("customer__phone"),
+        section=Value("restaurant", output_field=CharField()),
+        posting_date=F("date_created"),
+        credit_taken=get_restaurant_credit_taken(),
+        repaid=get_restaurant_repaid(),
+    )
+
+
+def get_bar_postings() -> QuerySet:
+    return as_postings(
+        CreditCustomerRegularTequilaOrderRecordPayment.objects.all(),
+        credit_customer=F("customer"),
+        customer_name=F("customer__name"),
+        customer_phone=F("customer__phone"),
+        section=Value("bar", output_field=CharField()),
+        posting_date=F("date_created"),
+        credit_taken=get_bar_credit_taken(),
+        repaid=get_bar_repaid(),
+    )
+
+
+def compute_aging(today: datetime.date) -> List[Dict]:
+    """Outstanding credit per customer and section, bucketed by age in days"""
+
+    postings_sql, params = get_restaurant_postings().union(
+        get_bar_postings(), all=True
+    ).query.sql_with_params()
+    buckets_sql: str = ",\n".join(
+        f"SUM(outstanding) FILTER (WHERE age BETWEEN {low} AND {high}) AS {name}"
+        for name, low, high in BUCKETS
+    )
+    sql: str = f"""
+        SELECT credit_customer, customer_name, customer_phone, section,
+               {buckets_sql},
+               SUM(outstanding) AS total
+        FROM (
+            SELECT postings.*,
+                   credit_taken - repaid AS outstanding,
+                   %s::date - posting_date AS age
+            FROM ({postings_sql}) AS postings
+        ) AS receivables
+        WHERE outstanding > 0
+        GROUP BY credit_customer, customer_name, customer_phone, section
+        ORDER BY customer_name, credit_customer, section
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (today, *params))
+        columns: List[str] = [column[0] for column in cursor.description]
+        rows: List[Dict] = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    customers: Dict[int, Dict] = {}
+    for row in rows:
+        customer: Dict = customers.setdefault(
+            row["credit_customer"],
+            {
+                "customer_id": row["credit_customer"],
+                "name": row["customer_name"],
+                "phone": row["customer_phone"],
+                "restaurant": None,
+                "bar": None,
+                "total": 0.0,
+            },
+        )
+        customer[row["section"]] = {
+            **{name: row[name] or 0.0 for name, _, _ in BUCKETS},
+            "total": row["total"],
+        }
+        customer["total"] += row["total"]
+
+    return list(customers.values())
+
+
+def get_aging() -> Dict:
+    """The aging report of the current business day, computed once per day"""
+
+    today: datetime.date = timezone.localdate()
+    key: str = CACHE_KEY.format(today)
+    report = cache.get(key)
+    if report is None:
+        report = {
+            "date": str(today),
+            "computed_at": timezone.now().timestamp(),
+            "customers": compute_aging(today),
+        }
+        cache.set(key, report, CACHE_TIMEOUT)
+
+    return report
+
+
+def invalidate_aging():
+    """Drop today's report once the current transaction commits: a read
+    running before the commit would cache the old amounts again"""
+
+    key: str = CACHE_KEY.format(timezone.localdate())
+    transaction.on_commit(lambda: cache.delete(key))
@@ -0,0 +1,131 @@
+"""
+Inventory reconciliation: find (and optionally repair) drift between the
+available quantities of inventory records and what receipts, sales,
+breakage and stock outs imply.
+
+Bar sales drain a trunk's oldest available record whatever record the order
+line names, so availability is reconciled per item (trunk): expected stock is
+the units received minus everything consumed, compared with the sum of the
+records' available quantities. Items are read in chunks of ids, each chunk
+with one grouped query per table. Repairing an item refills its records
+first in, first out (the newest records hold what is left), locked while they
+are rewritten, and records the difference as a ledger adjustment.
+"""
+from typing import Dict, Iterator, List, Optional
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+from core.movements import record_movement
+from core.sync import log_change
+from core.valuation import SECTIONS
+
+CHUNK_SIZE: int = 500
+
+
+def get_item_chunks(section: Dict, chunk_size: int = CHUNK_SIZE) -> Iterator[List[int]]:
+    """Ids of the items with inventory records, chunk by chunk, by keyset"""
+
+    # Ordering by the item relation would expand to Item's ordering (-id)
+    # and walk the keyset backwards, so order and page on the column
+    item_id_field: str = f"{section['item_field']}_id"
+    items = section["batches"].objects.values_list(item_id_field, flat=True).distinct().order_by(item_id_field)
+    last_id: int = 0
+    while True:
+        chunk: List[int] = list(items.filter(**{f"{item_id_field}__gt": last_id})[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]
+
+
+def get_chunk_drift(section: Dict, item_ids: List[int]) -> List[Dict]:
+    """Received, consumed, expected and available quantities of the items
+    whose availability does not match"""
+
+    item_field: str = section["item_field"]
+    totals: Dict[int, Dict] = {}
+    for item_id, received, available in (
+        section["batches"]
+        .objects.filter(**{f"{item_field}__in": item_ids})
+        .values(item_field)
+        .annotate(
+            received=Sum(section["units_field"]),
+            available=Sum(Coalesce("available_quantity", 0)),
+        )
+        .values_list(item_field, "received", "available")
+        .order_by()
+    ):
+        totals[item_id] = {
+            "item": item_id,
+            "received": received or 0,
+            "available": available or 0,
+            "consumed": 0,
+        }
+    for model, consumed_item_field, quantity_field, _ in section["consumption"]:
+        for item_id, consumed in (
+            model.objects.filter(**{f"{consumed_item_field}__in": item_ids})
+            .values(consumed_item_field)
+            .annotate(total=Sum(quantity_field))
+            .values_list(consumed_item_field, "total")
+            .order_by()
+        ):
+            if item_id in totals:
+                totals[item_id]["consumed"] += consumed or 0
+
+    drift: List[Dict] = []
+    for item in totals.values():
+        item["expected"] = max(item["received"] - item["consumed"], 0)
+        item["drift"] = item["available"] - item["expected"]
+        if item["drift"]:
+            drift.append(item)
+
+    return drift
+
+
+@transaction.atomic
+def repair_item(name: str, item_id: int) -> Optional[Dict]:
+    """Refill the item's records first in, first out to its expected quantity,
+    checked again once they are locked"""
+
+    section: Dict = SECTIONS[name]
+    records = list(
+        section["batches"]
+        .objects.select_for_update(of=("self",))
+        .filter(**{section["item_field"]: item_id})
+        .order_by("-id")
+    )
+    drift: List[Dict] = get_chunk_drift(section, [item_id])
+    if not drift:
+        return None
+
+    remaining: int = drift[0]["expected"]
+    for record in records:
+        record.available_quantity = min(getattr(record, section["units_field"]) or 0, remaining)
+        record.stock_status = "available" if record.available_quantity > 0 else "unavailable"
+        remaining -= record.available_quantity
+    section["batches"].objects.bulk_update(records, ["available_quantity", "stock_status"])
+
+    # Expected stock beyond the records' capacity cannot be placed
+    repaired: int = drift[0]["expected"] - remaining
+    if repaired != drift[0]["available"]:
+        record_movement(item_id, name, "adjustment", repaired - drift[0]["available"])
+    log_change(f"{name}_trunks", item_id)
+
+    return drift[0]
+
+
+def reconcile(
+    sections: Optional[List[str]] = None, repair: bool = False, chunk_size: int = CHUNK_SIZE
+) -> Iterator[Dict]:
+    """Drifting items of every section, repaired as they are found if repair"""
+
+    for name in sections or list(SECTIONS):
+        for item_ids in get_item_chunks(SECTIONS[name], chunk_size):
+            for item in get_chunk_drift(SECTIONS[name], item_ids):
+                if repair:
+                    item = repair_item(name, item["item"])
+                    if item is None:  # Settled since it was read
+                        continue
+                yield {"section": name, "repaired": repair, **item}
@@ -0,0 +1,49 @@
+"""
+Cached reference data: measurement units, items and menus.
+
+Every tablet reloads these lists on start and after each sync, but they
+change a few times a day. Each list is built once from a .values() query and
+kept in the shared cache until a row of its model is saved or deleted (see
+core.signals), a day at most in case a write bypassed the signals; workers
+fill it at startup (see core.prewarm).
+"""
+from typing import Callable, Dict, List
+
+from django.core.cache import cache
+from django.db import transaction
+
+from core.models import Item, MeasurementUnit
+from core.serializers import ItemFlatSerializer
+from restaurant.models import Menu
+
+CACHE_KEY: str = "reference-data:{}"
+CACHE_TIMEOUT: int = 60 * 60 * 24
+
+REFERENCE_DATA: Dict[str, Callable[[], List[Dict]]] = {
+    "units": lambda: list(MeasurementUnit.objects.values("id", "name")),
+    "items": lambda: ItemFlatSerializer.serialize(Item.objects.all()),
+    "menus": lambda: list(Menu.objects.values("id", "name", "price")),
+}
+
+
+def get_reference_data(name: str) -> List[Dict]:
+    key: str = CACHE_KEY.format(name)
+    rows = cache.get(key)
+    if rows is None:
+        rows = REFERENCE_DATA[name]()
+        cache.set(key, rows, CACHE_TIMEOUT)
+
+    return rows
+
+
+def prime_reference_data():
+    for name in REFERENCE_DATA:
+        cache.set(CACHE_KEY.format(name), REFERENCE_DATA[name](), CACHE_TIMEOUT)
+
+
+def invalidate_reference_data(name: str):
+    """Drop the cached list once the current transaction commits: a read
+    running before the commit would cache the old rows again"""
+
+    key: str = CACHE_KEY.format(name)
+    transaction.on_commit(lambda: cache.delete(key))
@@ -0,0 +1,32 @@
+"""
+JSON renderer using orjson when it is installed.
+
+orjson encodes the plain dicts, lists and numbers the views return several
+times faster than the standard library. Datetimes, dates and times, and
+anything it does not know (Decimal, lazy translations, querysets...), are
+handed to DRF's own encoder, so responses keep DRF's format (milliseconds,
+"Z" for UTC). Without orjson this is DRF's JSONRenderer.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # Optional dependency
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    encoder = JSONEncoder()
+    options = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+        # Indented output (browsable API, "; indent=" requests) stays with DRF
+        if self.get_indent(accepted_media_type or "", renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return orjson.dumps(data, default=self.encoder.default, option=self.options)
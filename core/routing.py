@@ -0,0 +1,7 @@
+from django.urls import path
+
+from core.consumers import DisplayConsumer
+
+websocket_urlpatterns = [
+    path("ws/displays/<str:screen>/", DisplayConsumer.as_asgi()),
+]
@@ -0,0 +1,41 @@
+"""
+API schema view generated once per process.
+
+DRF's schema view walks every route and introspects every serializer on each
+request. The schema only changes with a deploy, so CachedSchemaView generates
+it once (as a public schema, the same for every user) and keeps it in the
+process, not in the shared cache, which would outlive the deploy;
+core.prewarm builds it while workers start.
+"""
+from typing import Dict, Optional
+
+from rest_framework.response import Response
+from rest_framework.schemas import get_schema_view
+from rest_framework.schemas.views import SchemaView
+
+_schema: Optional[Dict] = None
+
+
+def get_schema(generator, request=None):
+    global _schema
+    if _schema is None:
+        _schema = generator.get_schema(request=request, public=True)
+
+    return _schema
+
+
+class CachedSchemaView(SchemaView):
+    def get(self, request, *args, **kwargs):
+        schema = get_schema(self.schema_generator, request)
+        if schema is None:
+            return super().get(request, *args, **kwargs)
+
+        return Response(schema)
+
+
+def get_cached_schema_view(**kwargs):
+    """get_schema_view, answered from the cache"""
+
+    view = get_schema_view(public=True, **kwargs)
+
+    return CachedSchemaView.as_view(**view.initkwargs)
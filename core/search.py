@@ -0,0 +1,169 @@
+"""
+Fuzzy search over credit customers and customer orders.
+
+Names and phones are stored normalized next to what was typed (search_name:
+lower case, without accents or repeated spaces; search_phone: the national
+number, digits only), kept by pre_save signals. search_name has a trigram
+GIN index, serving similarity (pg_trgm %) and substring matches, and
+search_phone a pattern index serving prefix matches: "juma " finds "Juma"
+and "0712 34" finds "+255712345678". Prefix matches rank first, then by
+similarity; orders are limited to recent days by default. Every source reads
+at most the rows of the pages asked for, and they are merged in Python, so
+paging stops at MAX_RESULTS matches.
+"""
+import datetime
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.query import QuerySet
+from django.utils import timezone
+
+from bar.models import (
+    CustomerRegularOrderRecord,
+    CustomerRegularTequilaOrderRecord,
+    CustomerTequilaOrderRecord,
+)
+from core.models import CreditCustomer
+from restaurant.models import CustomerDish
+
+COUNTRY_CODE: str = "255"
+MIN_PHONE_DIGITS: int = 3
+SEARCH_DAYS: int = 90
+PAGE_SIZE: int = 20
+MAX_PAGE_SIZE: int = 100
+MAX_RESULTS: int = 1000
+# source: model and its (name, phone, number, date) fields
+SOURCES: Dict[str, Dict] = {
+    "credit_customers": {
+        "model": CreditCustomer,
+        "fields": ("name", "phone", None, None),
+    },
+    "bar_orders": {
+        "model": CustomerRegularTequilaOrderRecord,
+        "fields": ("customer_name", "customer_phone", "customer_orders_number", "date_created"),
+    },
+    "regular_orders": {
+        "model": CustomerRegularOrderRecord,
+        "fields": ("customer_name", "customer_phone", "customer_orders_number", "date_created"),
+    },
+    "tequila_orders": {
+        "model": CustomerTequilaOrderRecord,
+        "fields": ("customer_name", "customer_phone", "customer_orders_number", "date_created"),
+    },
+    "dishes": {
+        "model": CustomerDish,
+        "fields": ("customer_name", "customer_phone", "dish_number", "date_created"),
+    },
+}
+
+
+def normalize_name(value: Optional[str]) -> str:
+    text: str = unicodedata.normalize("NFKD", value or "")
+    text = "".join(char for char in text if not unicodedata.combining(char))
+
+    return " ".join(text.lower().split())
+
+
+def normalize_phone(value: Optional[str]) -> str:
+    digits: str = "".join(char for char in (value or "") if char.isdigit())
+    if digits.startswith(COUNTRY_CODE) and len(digits) > 9:
+        digits = digits[len(COUNTRY_CODE):]
+
+    return digits.lstrip("0")
+
+
+def parse_query(query: str) -> Tuple[str, str]:
+    """(name, phone) to look for: a name when the query has letters, a phone
+    when it is made of enough digits"""
+
+    if any(char.isalpha() for char in query):
+        return normalize_name(query), ""
+    phone: str = normalize_phone(query)
+    if sum(char.isdigit() for char in query) >= MIN_PHONE_DIGITS and phone:
+        return "", phone
+
+    return "", ""
+
+
+def get_matches(queryset: QuerySet, name: str, phone: str) -> QuerySet:
+    """Rows of queryset matching name or phone, best first"""
+
+    if phone:
+        return queryset.filter(search_phone__startswith=phone).annotate(
+            rank=Value(1.0, output_field=FloatField())
+        ).order_by("-id")
+    if not name:
+        return queryset.none()
+
+    return (
+        queryset.filter(
+            Q(search_name__trigram_similar=name) | Q(search_name__contains=name)
+        )
+        .annotate(
+            rank=TrigramSimilarity("search_name", name)
+            + Case(
+                When(search_name__startswith=name, then=Value(1.0)),
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+        )
+        .order_by("-rank", "-id")
+    )
+
+
+def search_queryset(queryset: QuerySet, query: str) -> QuerySet:
+    return get_matches(queryset, *parse_query(query))
+
+
+def search(
+    query: str,
+    sources: Optional[Iterable[str]] = None,
+    days: Optional[int] = SEARCH_DAYS,
+    page: int = 1,
+    page_size: int = PAGE_SIZE,
+) -> Dict:
+    """One page of the matches of every source, ranked together. Orders
+    older than days are left out (all of them when days is None)."""
+
+    name, phone = parse_query(query)
+    since = timezone.now() - datetime.timedelta(days=days) if days else None
+    end: int = min(page * page_size, MAX_RESULTS)
+    limit: int = end + 1  # One more row tells whether a next page exists
+
+    results: List[Dict] = []
+    for source in sources or SOURCES:
+        name_field, phone_field, number_field, date_field = SOURCES[source]["fields"]
+        queryset = SOURCES[source]["model"].objects.all()
+        if date_field and since:
+            queryset = queryset.filter(**{f"{date_field}__gte": since})
+        fields = [field for field in (number_field, date_field) if field]
+        for row in get_matches(queryset, name, phone).values_list(
+            "id", name_field, phone_field, "rank", *fields
+        )[:limit]:
+            extra: Dict = dict(zip(fields, row[4:]))
+            date = extra.get(date_field)
+            results.append(
+                {
+                    "source": source,
+                    "id": row[0],
+                    "name": row[1],
+                    "phone": row[2],
+                    "number": extra.get(number_field),
+                    "date_created": date.isoformat() if isinstance(date, datetime.datetime) else date,
+                    "rank": round(row[3], 3),
+                }
+            )
+
+    results.sort(key=lambda result: result["date_created"] or "", reverse=True)
+    results.sort(key=lambda result: -result["rank"])  # Stable: newest first among equal ranks
+    start: int = (page - 1) * page_size
+
+    return {
+        "query": query,
+        "page": page,
+        "page_size": page_size,
+        "has_next": len(results) > end and end < MAX_RESULTS,
+        "results": results[start:start + page_size],
+    }
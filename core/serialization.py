@@ -0,0 +1,63 @@
+"""
+Flat serialization of list endpoints from .values() rows.
+
+ModelSerializer builds a field object per column and runs it for every row,
+and hand-built dicts call str(...).split(...) on every datetime. A
+FlatSerializer instead resolves its output keys, source columns and
+formatters once when it is declared, then turns each row of a single
+.values() query into a plain dict, with no model instances involved.
+"""
+import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from django.db.models.query import QuerySet
+
+
+def date_part(value: datetime.datetime) -> str:
+    """The "YYYY-MM-DD" half of str(value)"""
+
+    return value.date().isoformat()
+
+
+def time_part(value: datetime.datetime) -> str:
+    """The "HH:MM:SS" half of str(value), without fractions of a second"""
+
+    return value.time().isoformat(timespec="seconds")
+
+
+def timestamp(value: datetime.datetime) -> float:
+    return value.timestamp()
+
+
+def as_float(value) -> Optional[float]:
+    return None if value is None else float(value)
+
+
+class FlatSerializer:
+    """Output key: source column, or (source column, formatter). Sources may
+    follow relations ("unit__name"); each is fetched once however many keys
+    read it."""
+
+    def __init__(self, **fields: Union[str, Tuple[str, Callable]]):
+        self.fields: List[Tuple[str, str, Optional[Callable]]] = []
+        for key, field in fields.items():
+            source, formatter = (field, None) if isinstance(field, str) else field
+            self.fields.append((key, source, formatter))
+        self.sources: List[str] = list(dict.fromkeys(source for _, source, _ in self.fields))
+
+    def get_rows(self, queryset: QuerySet) -> Iterable[Dict]:
+        return queryset.values(*self.sources)
+
+    def to_representation(self, row: Dict) -> Dict:
+        return {
+            key: row[source] if formatter is None else formatter(row[source])
+            for key, source, formatter in self.fields
+        }
+
+    def serialize_rows(self, rows: Iterable[Dict]) -> List[Dict]:
+        to_representation = self.to_representation
+
+        return [to_representation(row) for row in rows]
+
+    def serialize(self, queryset: QuerySet) -> List[Dict]:
+        return self.serialize_rows(self.get_rows(queryset))
@@ -1,4 +1,5 @@
-from core.models import CreditCustomer, Item, MeasurementUnit
+from core.models import CreditCustomer, Item, MeasurementUnit, StockOutProjection
+from core.serialization import FlatSerializer
 from rest_framework import serializers
 
 
@@ -14,6 +15,12 @@ class ItemSerializer(serializers.ModelSerializer):
         return rep
 
 
+# ItemSerializer's list representation, from one .values() query
+ItemFlatSerializer = FlatSerializer(
+    id="id", name="name", unit="unit__name", item_for=("item_for", str.title)
+)
+
+
 class InventoryItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = Item
@@ -36,3 +43,25 @@ class CreditCustomerSerializer(serializers.ModelSerializer):
         credit_limit = instance.credit_limit
         rep["credit_limit"] = credit_limit or 0.0
         return rep
+
+
+class StockOutProjectionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StockOutProjection
+        fields = "__all__"
+
+    def to_representation(self, instance):
+        return {
+            "id": instance.id,
+            "item_id": instance.item_id,
+            "item": instance.item.name,
+            "unit": instance.item.unit.name,
+            "section": instance.get_section_display(),
+            "available_quantity": instance.available_quantity,
+            "daily_rate": instance.daily_rate,
+            "weekday_rates": instance.weekday_rates,
+            "days_to_stock_out": instance.days_to_stock_out,
+            "projected_stock_out_date": str(instance.projected_stock_out_date or ""),
+            "reorder_quantity": instance.reorder_quantity,
+            "computed_at": instance.computed_at.timestamp(),
+        }
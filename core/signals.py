@@ -1,10 +1,22 @@
-from django.db.models.signals import post_save
+from django.db import connections
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_migrate, pre_save
 from django.dispatch import receiver
 
-from bar.models import RegularInventoryRecordsTrunk, RegularInventoryRecordBroken, TequilaInventoryRecordsTrunk, \
-    TequilaInventoryRecordBroken
-from core.models import Item
-from restaurant.models import MainInventoryItemRecordTrunk
+from bar.models import RegularOrderRecord, TequilaOrderRecord, RegularInventoryRecordsTrunk, RegularInventoryRecordBroken, TequilaInventoryRecordsTrunk, \
+    TequilaInventoryRecordBroken, CreditCustomerRegularTequilaOrderRecordPayment, \
+    CreditCustomerRegularTequilaOrderRecordPaymentHistory, RegularInventoryRecord, TekilaInventoryRecord, \
+    CustomerRegularTequilaOrderRecord, CustomerRegularOrderRecord, CustomerTequilaOrderRecord, RegularTequilaOrderRecord
+from core.analytics import invalidate_sales_analytics
+from core.displays import get_bar_order_event, get_restaurant_order_event, publish
+from core.models import CreditCustomer, Item, MeasurementUnit
+from core.movements import record_movement
+from core.receivables import invalidate_aging
+from core.reference import invalidate_reference_data
+from core.search import normalize_name, normalize_phone
+from core.sync import log_change
+from restaurant.models import MainInventoryItemRecordTrunk, CreditCustomerDishPayment, \
+    CreditCustomerDishPaymentHistory, Additive, CustomerDish, MainInventoryItemRecord, Menu, RestaurantCustomerOrder, \
+    MainInventoryItemRecordStockOut, MiscellaneousInventoryRecord
 
 
 @receiver(post_save, sender=Item)
@@ -21,20 +33,253 @@ def create_inventory_trunk(sender, instance, created, **kwargs):
 @receiver(post_save, sender=RegularInventoryRecordBroken)
 def deduct_regular_inventory_record_on_broken_items(sender, instance, created, **kwargs):
     if created:
-        regular_inventory_record = instance.regular_inventory_record
-        regular_inventory_record.available_quantity = regular_inventory_record.available_quantity - instance.quantity_broken
-        regular_inventory_record.save()
-        if regular_inventory_record.available_quantity <= 0:
-            regular_inventory_record.stock_status = "unavailable"
-            regular_inventory_record.save()
+        RegularInventoryRecord.objects.filter(pk=instance.regular_inventory_record_id).deduct_broken(
+            instance.quantity_broken
+        )
+        item_id = instance.regular_inventory_record.item_id
+        # update() sends no post_save for the record itself
+        log_change("regular_trunks", item_id)
+        record_movement(
+            item_id, "regular", "breakage", -instance.quantity_broken, instance.regular_inventory_record_id
+        )
 
 
 @receiver(post_save, sender=TequilaInventoryRecordBroken)
 def deduct_tequila_inventory_record_on_broken_items(sender, instance, created, **kwargs):
     if created:
-        tequila_inventory_record = instance.tequila_inventory_record
-        tequila_inventory_record.available_quantity = tequila_inventory_record.available_quantity - instance.quantity_broken
-        tequila_inventory_record.save()
-        if tequila_inventory_record.available_quantity <= 0:
-            tequila_inventory_record.stock_status = "unavailable"
-            tequila_inventory_record.save()
+        TekilaInventoryRecord.objects.filter(pk=instance.tequila_inventory_record_id).deduct_broken(
+            instance.quantity_broken
+        )
+        item_id = instance.tequila_inventory_record.item_id
+        log_change("tequila_trunks", item_id)
+        record_movement(
+            item_id, "tequila", "breakage", -instance.quantity_broken, instance.tequila_inventory_record_id
+        )
+
+
+# The record is restored on every delete, cascades included; the ledger
+# adjustment is recorded by the broken items views, which delete one entry
+@receiver(post_delete, sender=RegularInventoryRecordBroken)
+def restore_regular_broken_items(sender, instance, **kwargs):
+    RegularInventoryRecord.objects.filter(pk=instance.regular_inventory_record_id).restore_broken(
+        instance.quantity_broken
+    )
+
+
+@receiver(post_delete, sender=TequilaInventoryRecordBroken)
+def restore_tequila_broken_items(sender, instance, **kwargs):
+    TekilaInventoryRecord.objects.filter(pk=instance.tequila_inventory_record_id).restore_broken(
+        instance.quantity_broken
+    )
+
+
+@receiver(post_save, sender=RegularInventoryRecord)
+def record_regular_receipt(sender, instance, created, **kwargs):
+    if created:
+        record_movement(instance.item_id, "regular", "receipt", instance.total_items, instance.id)
+
+
+@receiver(post_save, sender=TekilaInventoryRecord)
+def record_tequila_receipt(sender, instance, created, **kwargs):
+    if created:
+        record_movement(instance.item_id, "tequila", "receipt", instance.total_shots_per_tekila, instance.id)
+
+
+@receiver(post_save, sender=MainInventoryItemRecord)
+def record_restaurant_receipt(sender, instance, created, **kwargs):
+    if created:
+        record_movement(
+            instance.main_inventory_item.item_id, "restaurant", "receipt", instance.quantity, instance.id
+        )
+
+
+@receiver(post_save, sender=MiscellaneousInventoryRecord)
+def record_miscellaneous_receipt(sender, instance, created, **kwargs):
+    if created:
+        record_movement(instance.item_id, "miscellaneous", "receipt", instance.quantity, instance.id)
+
+
+@receiver(post_save, sender=MainInventoryItemRecordStockOut)
+def record_restaurant_issue(sender, instance, created, **kwargs):
+    if created:
+        record_movement(
+            instance.item_record.main_inventory_item.item_id,
+            "restaurant",
+            "issue",
+            -instance.quantity_out,
+            instance.item_record_id,
+            instance.created_by_id,
+        )
+
+
+@receiver(post_save, sender=CreditCustomerDishPayment)
+@receiver(post_save, sender=CreditCustomerDishPaymentHistory)
+@receiver(post_save, sender=CreditCustomerRegularTequilaOrderRecordPayment)
+@receiver(post_save, sender=CreditCustomerRegularTequilaOrderRecordPaymentHistory)
+@receiver(post_save, sender=RegularOrderRecord)
+@receiver(post_save, sender=TequilaOrderRecord)
+@receiver(post_save, sender=RestaurantCustomerOrder)
+@receiver(post_delete, sender=RegularOrderRecord)
+@receiver(post_delete, sender=TequilaOrderRecord)
+@receiver(post_delete, sender=RestaurantCustomerOrder)
+def invalidate_receivables_aging(sender, instance, **kwargs):
+    invalidate_aging()
+
+
+# Lines added to or removed from an open credit order change what it owes
+@receiver(m2m_changed, sender=RegularTequilaOrderRecord.regular_items.through)
+@receiver(m2m_changed, sender=RegularTequilaOrderRecord.tequila_items.through)
+@receiver(m2m_changed, sender=CustomerDish.orders.through)
+def invalidate_receivables_aging_on_lines(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_aging()
+
+
+@receiver(post_save, sender=MeasurementUnit)
+@receiver(post_delete, sender=MeasurementUnit)
+def invalidate_units(sender, instance, **kwargs):
+    invalidate_reference_data("units")
+    invalidate_reference_data("items")  # Items list their unit name
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def invalidate_items(sender, instance, **kwargs):
+    invalidate_reference_data("items")
+
+
+@receiver(post_save, sender=Menu)
+@receiver(post_delete, sender=Menu)
+def invalidate_menus(sender, instance, **kwargs):
+    invalidate_reference_data("menus")
+
+
+# sender: (synced name, key of the synced row, whether deleting the sender deletes the row)
+SYNC_SENDERS = {
+    Menu: ("menus", lambda instance: instance.id, True),
+    Additive: ("additives", lambda instance: instance.id, True),
+    Item: ("items", lambda instance: instance.id, True),
+    CreditCustomer: ("credit_customers", lambda instance: instance.id, True),
+    RegularInventoryRecordsTrunk: ("regular_trunks", lambda instance: instance.item_id, True),
+    TequilaInventoryRecordsTrunk: ("tequila_trunks", lambda instance: instance.item_id, True),
+    MainInventoryItemRecordTrunk: ("restaurant_trunks", lambda instance: instance.item_id, True),
+    RegularInventoryRecord: ("regular_trunks", lambda instance: instance.item_id, False),
+    TekilaInventoryRecord: ("tequila_trunks", lambda instance: instance.item_id, False),
+    MainInventoryItemRecord: (
+        "restaurant_trunks", lambda instance: instance.main_inventory_item.item_id, False
+    ),
+    CustomerDish: ("open_dishes", lambda instance: instance.id, True),
+    CustomerRegularTequilaOrderRecord: ("open_bar_orders", lambda instance: instance.id, True),
+}
+
+
+def log_sync_change(sender, instance, signal, **kwargs):
+    name, get_key, deletes_row = SYNC_SENDERS[sender]
+    action: str = "delete" if signal is post_delete and deletes_row else "upsert"
+    log_change(name, get_key(instance), action)
+
+
+for sync_sender in SYNC_SENDERS:
+    post_save.connect(log_sync_change, sender=sync_sender, dispatch_uid=f"sync-save-{sync_sender.__name__}")
+    post_delete.connect(log_sync_change, sender=sync_sender, dispatch_uid=f"sync-delete-{sync_sender.__name__}")
+
+
+@receiver(m2m_changed, sender=CustomerDish.orders.through)
+def log_dish_orders_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        log_change("open_dishes", instance.id)
+    else:  # Orders added to / removed from dishes
+        for dish_id in pk_set or ():
+            log_change("open_dishes", dish_id)
+
+
+def log_open_bar_orders(**lookup):
+    """Log the customer orders of the bar orders matching lookup"""
+
+    for customer_order_id in (
+        CustomerRegularTequilaOrderRecord.objects.filter(**lookup).values_list("id", flat=True).order_by()
+    ):
+        log_change("open_bar_orders", customer_order_id)
+
+
+@receiver(m2m_changed, sender=RegularTequilaOrderRecord.regular_items.through)
+@receiver(m2m_changed, sender=RegularTequilaOrderRecord.tequila_items.through)
+def log_bar_orders_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        log_open_bar_orders(regular_tequila_order_record_id=instance.id)
+    else:  # Order lines added to / removed from bar orders
+        log_open_bar_orders(regular_tequila_order_record_id__in=pk_set or ())
+
+
+# Lines are logged with their order when added to it, and again when their quantity changes
+@receiver(post_save, sender=RegularOrderRecord)
+def log_regular_order_line_change(sender, instance, created, **kwargs):
+    if not created:
+        log_open_bar_orders(regular_tequila_order_record__regular_items=instance)
+
+
+@receiver(post_save, sender=TequilaOrderRecord)
+def log_tequila_order_line_change(sender, instance, created, **kwargs):
+    if not created:
+        log_open_bar_orders(regular_tequila_order_record__tequila_items=instance)
+
+
+@receiver(post_save, sender=RestaurantCustomerOrder)
+def log_dish_order_line_change(sender, instance, created, **kwargs):
+    if not created:
+        for dish_id in CustomerDish.objects.filter(orders=instance).values_list("id", flat=True).order_by():
+            log_change("open_dishes", dish_id)
+
+
+@receiver(post_save, sender=RestaurantCustomerOrder)
+def publish_restaurant_order(sender, instance, created, **kwargs):
+    publish("kitchen", get_restaurant_order_event(instance, created))
+
+
+@receiver(post_save, sender=RegularOrderRecord)
+def publish_regular_order(sender, instance, created, **kwargs):
+    publish("bar", get_bar_order_event(instance, "regular_order", created))
+
+
+@receiver(post_save, sender=TequilaOrderRecord)
+def publish_tequila_order(sender, instance, created, **kwargs):
+    publish("bar", get_bar_order_event(instance, "tequila_order", created))
+
+
+@receiver(post_save, sender=RegularOrderRecord)
+@receiver(post_save, sender=TequilaOrderRecord)
+@receiver(post_save, sender=RestaurantCustomerOrder)
+@receiver(post_delete, sender=RegularOrderRecord)
+@receiver(post_delete, sender=TequilaOrderRecord)
+@receiver(post_delete, sender=RestaurantCustomerOrder)
+def invalidate_order_line_analytics(sender, instance, **kwargs):
+    if instance.date_created:
+        invalidate_sales_analytics(instance.date_created)
+
+
+@receiver(pre_migrate)
+def create_trigram_extension(sender, using="default", **kwargs):
+    """The search indexes use pg_trgm operator classes"""
+
+    if sender.name == "core" and connections[using].vendor == "postgresql":
+        with connections[using].cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+
+@receiver(pre_save, sender=CreditCustomer)
+def set_customer_search_fields(sender, instance, **kwargs):
+    instance.search_name = normalize_name(instance.name)
+    instance.search_phone = normalize_phone(instance.phone)
+
+
+@receiver(pre_save, sender=CustomerRegularTequilaOrderRecord)
+@receiver(pre_save, sender=CustomerRegularOrderRecord)
+@receiver(pre_save, sender=CustomerTequilaOrderRecord)
+@receiver(pre_save, sender=CustomerDish)
+def set_order_search_fields(sender, instance, **kwargs):
+    instance.search_name = normalize_name(instance.customer_name)
+    instance.search_phone = normalize_phone(instance.customer_phone)
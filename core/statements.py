@@ -0,0 +1,319 @@
+"""
+Credit customer statements.
+
+A posting is the part of a bar or restaurant order a customer took on credit
+(order total less what was paid upfront) and a payment is a repayment
+recorded in the payment histories. The payment signals add every repayment
+into the credit payment's amount_paid, so the upfront payment is amount_paid
+less the repayments; a posting does not change when repayments arrive.
+
+Both sections are combined into one UNION query and the running balance is
+a SUM() OVER window, so the database walks the customer's history instead
+of Python. The entry count and the opening and closing balances come from a
+separate aggregate over the same entries, so they hold for periods without
+entries and for pages past the end.
+"""
+import datetime
+from typing import Dict, List, Optional, Tuple
+
+from django.db import connection
+from django.db.models import CharField, F, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce
+from django.db.models.query import QuerySet
+
+from bar.models import (
+    CreditCustomerRegularTequilaOrderRecordPayment,
+    CreditCustomerRegularTequilaOrderRecordPaymentHistory,
+    RegularTequilaOrderRecord,
+)
+from restaurant.models import (
+    CreditCustomerDishPayment,
+    CreditCustomerDishPaymentHistory,
+    CustomerDish,
+)
+
+ENTRY_FIELDS: Tuple[str, ...] = (
+    "source_id",
+    "entry_date",
+    "section",
+    "entry_type",
+    "reference",
+    "debit",
+    "credit",
+)
+ENTRIES_ORDERING: str = "entry_date, entry_type DESC, section, source_id"
+
+
+def as_entries(queryset: QuerySet, **expressions) -> QuerySet:
+    """Annotate in ENTRY_FIELDS order so every part of the UNION lines up"""
+
+    return (
+        queryset.annotate(**{field: expressions[field] for field in ENTRY_FIELDS})
+        .values(*ENTRY_FIELDS)
+        .order_by()
+    )
+
+
+def get_repaid(history_model, payment_field: str) -> Coalesce:
+    """Sum of the repayments of the credit payment of the outer row"""
+
+    repaid = (
+        history_model.objects.filter(**{payment_field: OuterRef("id")})
+        .values(payment_field)
+        .annotate(total=Sum("amount_paid"))
+        .values("total")
+        .order_by()
+    )
+
+    return Coalesce(Subquery(repaid, output_field=FloatField()), 0.0)
+
+
+def get_restaurant_repaid() -> Coalesce:
+    return get_repaid(CreditCustomerDishPaymentHistory, "credit_customer_dish_payment")
+
+
+def get_bar_repaid() -> Coalesce:
+    return get_repaid(
+        CreditCustomerRegularTequilaOrderRecordPaymentHistory, "credit_customer_payment"
+    )
+
+
+def get_restaurant_credit_taken() -> Cast:
+    """Dish total less the upfront payment of a CreditCustomerDishPayment"""
+
+    dish_total = (
+        CustomerDish.objects.filter(id=OuterRef("customer_dish_payment__customer_dish"))
+        .annotate(total=Sum(F("orders__quantity") * F("orders__sub_menu__price")))
+        .values("total")
+    )
+
+    return Cast(
+        Coalesce(Subquery(dish_total, output_field=FloatField()), 0.0)
+        - Coalesce("amount_paid", 0.0)
+        + get_restaurant_repaid(),
+        FloatField(),
+    )
+
+
+def get_restaurant_postings(customer_id: int) -> QuerySet:
+    return as_entries(
+        CreditCustomerDishPayment.objects.filter(customer_id=customer_id),
+        source_id=F("id"),
+        entry_date=F("date_created"),
+        section=Value("restaurant", output_field=CharField()),
+        entry_type=Value("posting", output_field=CharField()),
+        reference=F("customer_dish_payment__customer_dish__dish_number"),
+        debit=get_restaurant_credit_taken(),
+        credit=Value(0.0, output_field=FloatField()),
+    )
+
+
+def get_restaurant_payments(customer_id: int) -> QuerySet:
+    return as_entries(
+        CreditCustomerDishPaymentHistory.objects.filter(
+            credit_customer_dish_payment__customer_id=customer_id
+        ),
+        source_id=F("id"),
+        entry_date=F("date_paid"),
+        section=Value("restaurant", output_field=CharField()),
+        entry_type=Value("payment", output_field=CharField()),
+        reference=F(
+            "credit_customer_dish_payment__customer_dish_payment__customer_dish__dish_number"
+        ),
+        debit=Value(0.0, output_field=FloatField()),
+        credit=Cast("amount_paid", FloatField()),
+    )
+
+
+def get_bar_credit_taken() -> Cast:
+    """Order total less the upfront payment of a
+    CreditCustomerRegularTequilaOrderRecordPayment"""
+
+    order_record: str = (
+        "record_order_payment_record__customer_regular_tequila_order_record"
+        "__regular_tequila_order_record"
+    )
+    # Separate subqueries: joining both M2Ms at once would multiply the rows
+    regular_total = (
+        RegularTequilaOrderRecord.objects.filter(id=OuterRef(order_record))
+        .annotate(
+            total=Sum(
+                F("regular_items__quantity")
+                * F("regular_items__item__selling_price_per_item")
+            )
+        )
+        .values("total")
+    )
+    tequila_total = (
+        RegularTequilaOrderRecord.objects.filter(id=OuterRef(order_record))
+        .annotate(
+            total=Sum(
+                F("tequila_items__quantity")
+                * F("tequila_items__item__selling_price_per_shot")
+            )
+        )
+        .values("total")
+    )
+
+    return Cast(
+        Coalesce(Subquery(regular_total, output_field=FloatField()), 0.0)
+        + Coalesce(Subquery(tequila_total, output_field=FloatField()), 0.0)
+        - Coalesce("amount_paid", 0.0)
+        + get_bar_repaid(),
+        FloatField(),
+    )
+
+
+def get_bar_postings(customer_id: int) -> QuerySet:
+    return as_entries(
+        CreditCustomerRegularTequilaOrderRecordPayment.objects.filter(
+            customer_id=customer_id
+        ),
+        source_id=F("id"),
+        entry_date=F("date_created"),
+        section=Value("bar", output_field=CharField()),
+        entry_type=Value("posting", output_field=CharField()),
+        reference=F(
+            "record_order_payment_record__customer_regular_tequila_order_record"
+            "__customer_orders_number"
+        ),
+        debit=get_bar_credit_taken(),
+        credit=Value(0.0, output_field=FloatField()),
+    )
+
+
+def get_bar_payments(customer_id: int) -> QuerySet:
+    return as_entries(
+        CreditCustomerRegularTequilaOrderRecordPaymentHistory.objects.filter(
+            credit_customer_payment__customer_id=customer_id
+        ),
+        source_id=F("id"),
+        entry_date=F("date_paid"),
+        section=Value("bar", output_field=CharField()),
+        entry_type=Value("payment", output_field=CharField()),
+        reference=F(
+            "credit_customer_payment__record_order_payment_record"
+            "__customer_regular_tequila_order_record__customer_orders_number"
+        ),
+        debit=Value(0.0, output_field=FloatField()),
+        credit=Cast("amount_paid", FloatField()),
+    )
+
+
+def get_entries_sql(customer_id: int) -> Tuple[str, Tuple]:
+    """SQL and params of all postings and payments of a customer"""
+
+    entries = get_restaurant_postings(customer_id).union(
+        get_restaurant_payments(customer_id),
+        get_bar_postings(customer_id),
+        get_bar_payments(customer_id),
+        all=True,
+    )
+
+    return entries.query.sql_with_params()
+
+
+def get_statement_summary(
+    entries_sql: str,
+    params: Tuple,
+    from_date: Optional[datetime.date] = None,
+    to_date: Optional[datetime.date] = None,
+) -> Tuple[int, float, float]:
+    """Entry count of the period, balance before it and balance at its end"""
+
+    in_period: List[str] = []
+    before: str = "FALSE"
+    until: str = "TRUE"
+    filters: List = []
+    bounds: List = []
+    if from_date:
+        in_period.append("entry_date >= %s")
+        filters.append(from_date)
+        before = "entry_date < %s"
+        bounds.append(from_date)
+    if to_date:
+        in_period.append("entry_date <= %s")
+        filters.append(to_date)
+        until = "entry_date <= %s"
+        bounds.append(to_date)
+
+    sql: str = f"""
+        SELECT COUNT(*) FILTER (WHERE {' AND '.join(in_period) or 'TRUE'}),
+               COALESCE(SUM(debit - credit) FILTER (WHERE {before}), 0),
+               COALESCE(SUM(debit - credit) FILTER (WHERE {until}), 0)
+        FROM ({entries_sql}) AS entries
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (*filters, *bounds, *params))
+        count, opening_balance, closing_balance = cursor.fetchone()
+
+    return count, float(opening_balance), float(closing_balance)
+
+
+def get_statement(
+    customer_id: int,
+    from_date: Optional[datetime.date] = None,
+    to_date: Optional[datetime.date] = None,
+    page: int = 1,
+    page_size: int = 50,
+) -> Dict:
+    """One page of a customer's statement with opening and closing balances.
+
+    Balances are computed over the whole history before the date filter is
+    applied, so the first entry of a period carries the right balance, and
+    a period without entries opens and closes at the last balance before it.
+    """
+
+    entries_sql, params = get_entries_sql(customer_id)
+    conditions: List[str] = []
+    filters: List = []
+    if from_date:
+        conditions.append("entry_date >= %s")
+        filters.append(from_date)
+    if to_date:
+        conditions.append("entry_date <= %s")
+        filters.append(to_date)
+    where: str = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    sql: str = f"""
+        SELECT statement.*
+        FROM (
+            SELECT entries.*,
+                   SUM(debit - credit) OVER (
+                       ORDER BY {ENTRIES_ORDERING} ROWS UNBOUNDED PRECEDING
+                   ) AS balance
+            FROM ({entries_sql}) AS entries
+        ) AS statement
+        {where}
+        ORDER BY {ENTRIES_ORDERING}
+        LIMIT %s OFFSET %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (*params, *filters, page_size, (page - 1) * page_size))
+        columns: List[str] = [column[0] for column in cursor.description]
+        rows: List[Dict] = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    count, opening_balance, closing_balance = get_statement_summary(
+        entries_sql, params, from_date, to_date
+    )
+
+    return {
+        "count": count,
+        "page": page,
+        "page_size": page_size,
+        "opening_balance": opening_balance,
+        "closing_balance": closing_balance,
+        "entries": [
+            {
+                "id": row["source_id"],
+                "date": str(row["entry_date"]),
+                "section": row["section"],
+                "type": row["entry_type"],
+                "reference": row["reference"],
+                "debit": row["debit"],
+                "credit": row["credit"],
+                "balance": row["balance"],
+            }
+            for row in rows
+        ],
+    }
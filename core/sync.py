@@ -0,0 +1,267 @@
+"""
+Delta sync for offline-capable waiter tablets.
+
+Signals append a ChangeLog entry whenever a synced row is saved or deleted,
+tagged with the id of the writing transaction (txid_current()). Entry ids
+are handed out before commit, so a long transaction can commit entries below
+ids that were already read; transaction ids give a commit-safe cursor
+instead. A client's sync token is a transaction horizon: it has seen every
+entry written by transactions below it. A request reads the entries from
+the token up to the current snapshot's xmin, below which every transaction
+has committed or rolled back, so no entry can still appear behind the new
+token however long its transaction ran. Rows that no longer exist, or no
+longer match their model's queryset (e.g. orders that have been paid), are
+reported as deleted.
+"""
+import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, F, Func, IntegerField, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.query import QuerySet
+from django.utils import timezone
+
+from bar.models import (
+    CustomerRegularTequilaOrderRecord,
+    RegularInventoryRecord,
+    RegularInventoryRecordsTrunk,
+    RegularTequilaOrderRecord,
+    TekilaInventoryRecord,
+    TequilaInventoryRecordsTrunk,
+)
+from core.models import ChangeLog, CreditCustomer, Item
+from restaurant.models import Additive, CustomerDish, MainInventoryItemRecordTrunk, Menu
+
+SYNC_LIMIT: int = 5000
+RETENTION_DAYS: int = 30
+
+
+class TxidCurrent(Func):
+    """Id of the current transaction (assigned on first use)"""
+
+    function = "txid_current"
+    template = "%(function)s()"
+    output_field = BigIntegerField()
+
+
+def get_regular_trunks() -> QuerySet:
+    latest_price = (
+        RegularInventoryRecord.objects.filter(item=OuterRef("item"), stock_status="available")
+        .order_by("-id")
+        .values("selling_price_per_item")[:1]
+    )
+
+    return RegularInventoryRecordsTrunk.objects.values(
+        "id", "item", name=F("item__name"), unit_name=F("item__unit__name")
+    ).annotate(
+        available_quantity=Sum(
+            "regular_inventory_record__available_quantity",
+            filter=Q(regular_inventory_record__stock_status="available"),
+        ),
+        selling_price_per_item=Subquery(latest_price, output_field=IntegerField()),
+    )
+
+
+def get_tequila_trunks() -> QuerySet:
+    latest_price = (
+        TekilaInventoryRecord.objects.filter(item=OuterRef("item"), stock_status="available")
+        .order_by("-id")
+        .values("selling_price_per_shot")[:1]
+    )
+
+    return TequilaInventoryRecordsTrunk.objects.values(
+        "id", "item", name=F("item__name"), unit_name=F("item__unit__name")
+    ).annotate(
+        available_quantity=Sum(
+            "tequila_inventory_record__available_quantity",
+            filter=Q(tequila_inventory_record__stock_status="available"),
+        ),
+        selling_price_per_shot=Subquery(latest_price, output_field=IntegerField()),
+    )
+
+
+def get_restaurant_trunks() -> QuerySet:
+    return MainInventoryItemRecordTrunk.objects.values(
+        "id", "item", name=F("item__name"), unit_name=F("item__unit__name")
+    ).annotate(
+        available_quantity=Sum(
+            "inventory_items__available_quantity",
+            filter=Q(inventory_items__stock_status="available"),
+        ),
+    )
+
+
+def get_open_dishes() -> QuerySet:
+    return (
+        CustomerDish.objects.filter(status__in=("unpaid", "partial"))
+        .values(
+            "id",
+            "customer_name",
+            "customer_phone",
+            "dish_number",
+            "status",
+            "date_created",
+            created_by_username=F("created_by__username"),
+        )
+        .annotate(total_price=Sum(F("orders__quantity") * F("orders__sub_menu__price")))
+    )
+
+
+def get_open_bar_orders() -> QuerySet:
+    # Separate subqueries: joining both M2Ms at once would multiply the rows
+    regular_total = (
+        RegularTequilaOrderRecord.objects.filter(id=OuterRef("regular_tequila_order_record"))
+        .annotate(
+            total=Sum(
+                F("regular_items__quantity") * F("regular_items__item__selling_price_per_item")
+            )
+        )
+        .values("total")
+    )
+    tequila_total = (
+        RegularTequilaOrderRecord.objects.filter(id=OuterRef("regular_tequila_order_record"))
+        .annotate(
+            total=Sum(
+                F("tequila_items__quantity") * F("tequila_items__item__selling_price_per_shot")
+            )
+        )
+        .values("total")
+    )
+
+    return CustomerRegularTequilaOrderRecord.objects.filter(
+        status__in=("unpaid", "partial")
+    ).values(
+        "id",
+        "customer_name",
+        "customer_phone",
+        "customer_orders_number",
+        "status",
+        "date_created",
+        "regular_tequila_order_record",
+        created_by_username=F("created_by__username"),
+        drinks_total=Subquery(regular_total, output_field=IntegerField()),
+        shots_total=Subquery(tequila_total, output_field=IntegerField()),
+    )
+
+
+# name: (rows queryset, key identifying a row in the change log)
+SYNCED: Dict[str, Dict] = {
+    "menus": {"rows": lambda: Menu.objects.values("id", "name", "price"), "key": "id"},
+    "additives": {"rows": lambda: Additive.objects.values("id", "name"), "key": "id"},
+    "items": {
+        "rows": lambda: Item.objects.values(
+            "id", "name", "item_for", "tequila", unit_name=F("unit__name")
+        ),
+        "key": "id",
+    },
+    "regular_trunks": {"rows": get_regular_trunks, "key": "item"},
+    "tequila_trunks": {"rows": get_tequila_trunks, "key": "item"},
+    "restaurant_trunks": {"rows": get_restaurant_trunks, "key": "item"},
+    "credit_customers": {
+        "rows": lambda: CreditCustomer.objects.values(
+            "id", "name", "phone", "address", "credit_limit"
+        ),
+        "key": "id",
+    },
+    "open_dishes": {"rows": get_open_dishes, "key": "id"},
+    "open_bar_orders": {"rows": get_open_bar_orders, "key": "id"},
+}
+
+
+def log_change(model: str, object_id: int, action: str = "upsert"):
+    ChangeLog.objects.create(model=model, object_id=object_id, action=action, txid=TxidCurrent())
+
+
+def get_rows(name: str, ids: Optional[Iterable[int]] = None) -> List[Dict]:
+    rows_queryset: Callable[[], QuerySet] = SYNCED[name]["rows"]
+    queryset = rows_queryset().order_by()
+    if ids is not None:
+        queryset = queryset.filter(**{f"{SYNCED[name]['key']}__in": list(ids)})
+
+    return list(queryset)
+
+
+def get_horizon() -> int:
+    """Transaction id below which every transaction has finished"""
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+        return cursor.fetchone()[0]
+
+
+def is_expired(token: int) -> bool:
+    """Entries at or after the token have been pruned; the client must resync"""
+
+    return ChangeLog.objects.filter(action="prune", txid__gte=token).exists()
+
+
+def get_changes(token: Optional[int], limit: int = SYNC_LIMIT) -> Dict:
+    """Rows changed by transactions from token up to the horizon; a full
+    snapshot when there is no usable token"""
+
+    horizon: int = get_horizon()
+    if token is None or is_expired(token):
+        return {
+            "token": horizon,
+            "full": True,
+            "has_more": False,
+            "changes": {
+                name: {"upserted": get_rows(name), "deleted": []} for name in SYNCED
+            },
+        }
+
+    entries = ChangeLog.objects.filter(txid__gte=token, txid__lt=horizon).exclude(action="prune")
+    logs: List = list(entries.order_by("txid", "id").values_list("txid", "model", "object_id")[:limit])
+    next_token: int = horizon
+    has_more: bool = len(logs) == limit
+    if has_more:
+        # A page ends on a whole transaction: the last one is left for the
+        # next page, unless it is the only one, which is then read entirely
+        last_txid: int = logs[-1][0]
+        if logs[0][0] == last_txid:
+            logs = list(entries.filter(txid=last_txid).values_list("txid", "model", "object_id"))
+            next_token = last_txid + 1
+        else:
+            logs = [log for log in logs if log[0] != last_txid]
+            next_token = last_txid
+
+    changed: Dict[str, Set[int]] = {}
+    for _, model, object_id in logs:
+        changed.setdefault(model, set()).add(object_id)
+
+    changes: Dict[str, Dict] = {}
+    for name, ids in changed.items():
+        if name not in SYNCED:
+            continue
+        rows: List[Dict] = get_rows(name, ids)
+        found: Set[int] = {row[SYNCED[name]["key"]] for row in rows}
+        changes[name] = {"upserted": rows, "deleted": sorted(ids - found)}
+
+    return {
+        "token": next_token,
+        "full": False,
+        "has_more": has_more,
+        "changes": changes,
+    }
+
+
+def prune_change_log(days: int = RETENTION_DAYS) -> int:
+    """Delete entries older than days, recording the newest transaction
+    pruned; clients whose token is not past it get a full sync"""
+
+    with transaction.atomic():
+        expired = ChangeLog.objects.filter(
+            changed_at__lt=timezone.now() - datetime.timedelta(days=days)
+        ).exclude(action="prune")
+        pruned_txid: Optional[int] = expired.aggregate(txid=Max("txid"))["txid"]
+        if pruned_txid is None:
+            return 0
+        deleted, _ = expired.delete()
+        marker, _ = ChangeLog.objects.get_or_create(
+            action="prune", defaults={"model": "change_log", "object_id": 0, "txid": pruned_txid}
+        )
+        if marker.txid < pruned_txid:
+            marker.txid = pruned_txid
+            marker.save(update_fields=["txid"])
+
+    return deleted
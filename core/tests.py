@@ -1,3 +1,234 @@
+import random
+import statistics
+import time
+from typing import Dict, List, Tuple
+
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from bar.models import (
+    CustomerRegularTequilaOrderRecord,
+    RegularInventoryRecord,
+    RegularTequilaOrderRecord,
+)
+from core.models import CreditCustomer, Item, MeasurementUnit, StockMovement
+from core.movements import get_balances
+from core.search import MAX_PAGE_SIZE, normalize_name, normalize_phone, search
+from restaurant.models import CustomerDish
+from user.models import User
+
+FILLER_NAMES: List[str] = ["Neema", "Baraka", "Rehema", "Amani", "Hamisi", "Mwanaidi"]
+
+
+class StockMovementApiTestCase(TestCase):
+    """A receipt, a breakage and a sale through the API, each on the ledger"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="manager",
+            password="secret",
+            mobile_phone="0700000000",
+            user_type="manager",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        unit = MeasurementUnit.objects.create(name="Bottle")
+        self.item = Item.objects.create(name="Beer", unit=unit, item_for="bar", tequila=False)
+
+    def test_receipt_breakage_and_sale(self):
+        response = self.client.post(
+            "/w/api/bar/regular-inventory-record/",
+            {
+                "item": self.item.id,
+                "quantity": 1,
+                "total_items": 24,
+                "threshold": 5,
+                "purchasing_price": 24000,
+                "selling_price_per_item": 1500,
+                "date_purchased": "2021-06-01",
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        record = RegularInventoryRecord.objects.get(item=self.item)
+
+        response = self.client.post(
+            "/w/api/bar/regular/inventory/add-broken-items/",
+            {"regular_inventory_record_id": record.id, "quantity_broken": 2},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.post(
+            "/w/api/bar/sales/order-records/",
+            {
+                "orders": {
+                    "regular_orders": [{"item_id": record.id, "quantity": 3}],
+                    "tequila_orders": [],
+                },
+                "customer_name": "Customer",
+                "customer_phone": "0711111111",
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        movements = StockMovement.objects.filter(item=self.item).order_by("id")
+        self.assertEqual(
+            list(movements.values_list("section", "kind", "quantity", "balance")),
+            [
+                ("regular", "receipt", 24, 24),
+                ("regular", "breakage", -2, 22),
+                ("regular", "sale", -3, 19),
+            ],
+        )
+        self.assertEqual(get_balances([self.item.id]), {(self.item.id, "regular"): 19})
+        record.refresh_from_db()
+        self.assertEqual(record.available_quantity, 19)
+
+
+class SearchTestCase(TestCase):
+    """Search over bulk seeded credit customers and customer orders"""
+
+    SEEDED: int = 3000
+    MAX_LATENCY: float = 0.5
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(
+            username="cashier", password="secret", mobile_phone="0700000001", user_type="bar_cashier"
+        )
+        now = timezone.now()
+        # Filler that matches neither "juma" nor "71234"
+        names: List[str] = [f"{random.choice(FILLER_NAMES)} {index}" for index in range(cls.SEEDED)]
+        phones: List[str] = [f"0765{index:06d}" for index in range(cls.SEEDED)]
+        # bulk_create sends no pre_save, so the search fields are set here
+        CreditCustomer.objects.bulk_create(
+            [
+                CreditCustomer(
+                    name=name,
+                    phone=phone,
+                    address="Seed",
+                    search_name=normalize_name(name),
+                    search_phone=normalize_phone(phone),
+                )
+                for name, phone in zip(names, phones)
+            ]
+            + [
+                CreditCustomer(
+                    name=f"Juma {index}",
+                    phone=f"0788{index:06d}",
+                    address="Seed",
+                    search_name=normalize_name(f"Juma {index}"),
+                    search_phone=normalize_phone(f"0788{index:06d}"),
+                )
+                for index in range(30)
+            ],
+            batch_size=1000,
+        )
+        CreditCustomer.objects.create(name="Mjuma Ally", phone="0799000000", address="Seed")
+        CreditCustomer.objects.create(name="Zawadi Juma", phone="+255712345678", address="Seed")
+        CreditCustomer.objects.create(name="Rehema Said", phone="0712 340 000", address="Seed")
+        CreditCustomer.objects.create(name="Amani Said", phone="0712 999 000", address="Seed")
+
+        order_records = RegularTequilaOrderRecord.objects.bulk_create(
+            [RegularTequilaOrderRecord(created_by=user) for _ in range(cls.SEEDED)], batch_size=1000
+        )
+        CustomerRegularTequilaOrderRecord.objects.bulk_create(
+            [
+                CustomerRegularTequilaOrderRecord(
+                    regular_tequila_order_record=order_record,
+                    customer_name=name,
+                    customer_phone=phone,
+                    customer_orders_number=str(index),
+                    created_by=user,
+                    date_created=now,
+                    status="unpaid",
+                    search_name=normalize_name(name),
+                    search_phone=normalize_phone(phone),
+                )
+                for index, (order_record, name, phone) in enumerate(zip(order_records, names, phones))
+            ],
+            batch_size=1000,
+        )
+        CustomerDish.objects.bulk_create(
+            [
+                CustomerDish(
+                    customer_name=name,
+                    customer_phone=phone,
+                    dish_number=str(index),
+                    created_by=user,
+                    date_created=now,
+                    status="unpaid",
+                    search_name=normalize_name(name),
+                    search_phone=normalize_phone(phone),
+                )
+                for index, (name, phone) in enumerate(zip(names, phones))
+            ]
+            + [
+                CustomerDish(
+                    customer_name=f"Juma {index}",
+                    customer_phone=None,
+                    dish_number=f"J{index}",
+                    created_by=user,
+                    date_created=now,
+                    status="unpaid",
+                    search_name=normalize_name(f"Juma {index}"),
+                )
+                for index in range(30)
+            ],
+            batch_size=1000,
+        )
+        cls.user = user
+
+    def test_name_matches_rank_prefixes_first(self):
+        results: List[Dict] = search("juma ", page_size=MAX_PAGE_SIZE)["results"]
+
+        names: List[str] = [result["name"] for result in results]
+        self.assertEqual(len(results), 62)
+        self.assertIn("Zawadi Juma", names)
+        self.assertIn("Mjuma Ally", names)
+        self.assertTrue(all(name.startswith("Juma ") for name in names[:60]))
+        ranks: List[float] = [result["rank"] for result in results]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+        self.assertEqual({result["source"] for result in results[:60]}, {"credit_customers", "dishes"})
+
+    def test_phone_prefix_matches(self):
+        results: List[Dict] = search("0712 34")["results"]
+
+        self.assertEqual(
+            sorted(result["name"] for result in results), ["Rehema Said", "Zawadi Juma"]
+        )
+
+    def test_pages_do_not_overlap(self):
+        pages: List[Dict] = [search("juma", page=page, page_size=25) for page in (1, 2, 3)]
+
+        self.assertEqual([page["has_next"] for page in pages], [True, True, False])
+        seen: List[Tuple] = [
+            (result["source"], result["id"]) for page in pages for result in page["results"]
+        ]
+        self.assertEqual(len(seen), 62)
+        self.assertEqual(len(set(seen)), 62)
+        ranks: List[float] = [result["rank"] for page in pages for result in page["results"]]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+
+    def test_latency(self):
+        for query in ("juma", "jum", "jmua", "0712"):
+            latencies: List[float] = []
+            for _ in range(5):
+                started = time.perf_counter()
+                search(query)
+                latencies.append(time.perf_counter() - started)
+            self.assertLess(statistics.median(latencies), self.MAX_LATENCY, query)
+
+    def test_paging_is_capped(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
 
-# Create your tests here.
+        response = client.get("/w/api/core/search/", {"q": "juma", "page": 100000, "page_size": 100})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = client.get("/w/api/core/search/", {"q": "juma", "page": 2, "page_size": 25})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 25)
@@ -12,6 +12,14 @@ v1 = routers.DefaultRouter()  # a router instance
 v1.register("core/measurement-units", core_views.MeasurementUnitViewSet)
 v1.register("core/items", core_views.ItemViewSet)
 v1.register("core/credit-customers", core_views.CreditCustomerViewSet, basename="CreditCustomer")
+v1.register("core/stock-out-projections", core_views.StockOutProjectionViewSet, basename="StockOutProjection")
+v1.register("core/sync", core_views.SyncViewSet, basename="Sync")
+v1.register("core/offline-submissions", core_views.OfflineSubmissionViewSet, basename="OfflineSubmission")
+v1.register("core/payroll-summary", core_views.PayrollSummaryViewSet, basename="PayrollSummary")
+v1.register("core/sales-analytics", core_views.SalesAnalyticsViewSet, basename="SalesAnalytics")
+v1.register("core/stock-valuation", core_views.StockValuationViewSet, basename="StockValuation")
+v1.register("core/stock-movements", core_views.StockMovementViewSet, basename="StockMovement")
+v1.register("core/search", core_views.SearchViewSet, basename="Search")
 
 # bar endpoints
 v1.register("bar/regular-inventory-record", bar_views.RegularInventoryRecordViewSet, basename="RegularInventoryRecord")
@@ -1,4 +1,8 @@
+import datetime
+from typing import Optional, Tuple
+
 from dateutil import parser
+from django.utils import timezone
 
 
 def get_date_objects(date1, date2):
@@ -7,6 +11,30 @@ def get_date_objects(date1, date2):
     return parser.parse(date1).date(), parser.parse(date2).date()
 
 
+def get_day_start(date: datetime.date) -> datetime.datetime:
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+
+def get_day_range(
+    first_date: datetime.date, last_date: Optional[datetime.date] = None
+) -> Tuple[datetime.datetime, datetime.datetime]:
+    """Start of first_date and of the day after last_date (first_date by
+    default). Filtering a datetime column on them (gte, lt) is an index
+    range scan, where a __date lookup converts every row first."""
+
+    return get_day_start(first_date), get_day_start((last_date or first_date) + datetime.timedelta(days=1))
+
+
+def get_month_start(date: datetime.date) -> datetime.datetime:
+    return get_day_start(datetime.date(date.year, date.month, 1))
+
+
+def get_month_end(date: datetime.date) -> datetime.datetime:
+    """Start of the month after date's month"""
+
+    return get_day_start(datetime.date(date.year + date.month // 12, date.month % 12 + 1, 1))
+
+
 def validate_dates(date1, date2):
     """Validation: Check if the from_date is less than or equal to the to_date otherwise rise an error"""
     if date1 > date2:
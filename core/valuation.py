@@ -0,0 +1,224 @@
+"""
+End of day FIFO valuation of bar and restaurant stock.
+
+Valuing the stock of a past date from the live tables means replaying every
+receipt, sale, breakage and issue. Instead, a nightly job values each item
+first in, first out: whatever was consumed up to the end of the day (sold,
+broken or issued) is taken from the oldest batches first, and what is left of
+each batch is worth its unit cost (purchasing price / units received). A
+section is read with one query for its batches and one grouped query per
+consumption table, whatever the number of items, and the result is stored as
+one StockValuation row per item and day; the valuation and the cost of sales
+of any past date are then a read of the (date, section) index.
+"""
+import datetime
+from typing import Dict, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from bar.models import (
+    RegularInventoryRecord,
+    RegularInventoryRecordBroken,
+    RegularOrderRecord,
+    TekilaInventoryRecord,
+    TequilaInventoryRecordBroken,
+    TequilaOrderRecord,
+)
+from core.models import StockValuation
+from restaurant.models import MainInventoryItemRecord, MainInventoryItemRecordStockOut
+
+# Batches are counted in the units available_quantity starts from
+SECTIONS: Dict[str, Dict] = {
+    "regular": {
+        "batches": RegularInventoryRecord,
+        "item_field": "item",
+        "units_field": "total_items",
+        # (model, item field, quantity field, day field)
+        "consumption": (
+            (RegularOrderRecord, "item__item", "quantity", "date_created__date"),
+            (
+                RegularInventoryRecordBroken,
+                "regular_inventory_record__item",
+                "quantity_broken",
+                "created_at",
+            ),
+        ),
+    },
+    "tequila": {
+        "batches": TekilaInventoryRecord,
+        "item_field": "item",
+        "units_field": "total_shots_per_tekila",
+        "consumption": (
+            (TequilaOrderRecord, "item__item", "quantity", "date_created__date"),
+            (
+                TequilaInventoryRecordBroken,
+                "tequila_inventory_record__item",
+                "quantity_broken",
+                "created_at",
+            ),
+        ),
+    },
+    "restaurant": {
+        "batches": MainInventoryItemRecord,
+        "item_field": "main_inventory_item__item",
+        "units_field": "quantity",
+        "consumption": (
+            (
+                MainInventoryItemRecordStockOut,
+                "item_record__main_inventory_item__item",
+                "quantity_out",
+                "date_out",
+            ),
+        ),
+    },
+}
+
+
+def get_batches(section: Dict, date: datetime.date) -> Dict[int, List[Tuple[int, float]]]:
+    """(units, unit cost) of the batches received up to date, oldest first, per item"""
+
+    batches: Dict[int, List[Tuple[int, float]]] = {}
+    rows = (
+        section["batches"]
+        .objects.filter(date_purchased__lte=date)
+        .order_by(section["item_field"], "date_purchased", "id")
+        .values_list(section["item_field"], section["units_field"], "purchasing_price")
+    )
+    for item_id, units, purchasing_price in rows:
+        if units and units > 0:
+            batches.setdefault(item_id, []).append((units, purchasing_price / units))
+
+    return batches
+
+
+def get_consumed(section: Dict, date: datetime.date) -> Dict[int, Tuple[int, int]]:
+    """Quantity consumed per item up to the end of date, and on date alone"""
+
+    consumed: Dict[int, Tuple[int, int]] = {}
+    for model, item_field, quantity_field, day_field in section["consumption"]:
+        rows = (
+            model.objects.filter(**{f"{day_field}__lte": date})
+            .values(item_field)
+            .annotate(
+                total=Sum(quantity_field),
+                on_date=Sum(quantity_field, filter=Q(**{day_field: date})),
+            )
+            .values_list(item_field, "total", "on_date")
+            .order_by()
+        )
+        for item_id, total, on_date in rows:
+            through_date, date_only = consumed.get(item_id, (0, 0))
+            consumed[item_id] = (through_date + (total or 0), date_only + (on_date or 0))
+
+    return consumed
+
+
+def get_fifo_cost(batches: List[Tuple[int, float]], quantity: int) -> Tuple[float, int]:
+    """Cost of the first quantity units of batches, and how many of them the
+    batches cover (consumption beyond the receipts has no cost)"""
+
+    cost: float = 0.0
+    covered: int = 0
+    for units, unit_cost in batches:
+        taken: int = min(units, quantity - covered)
+        if taken <= 0:
+            break
+        cost += taken * unit_cost
+        covered += taken
+
+    return cost, covered
+
+
+def value_item(batches: List[Tuple[int, float]], consumed: int, consumed_on_date: int) -> Dict:
+    received: int = sum(units for units, _ in batches)
+    received_cost: float = sum(units * unit_cost for units, unit_cost in batches)
+    consumed_cost, covered = get_fifo_cost(batches, consumed)
+    opening_consumed_cost, _ = get_fifo_cost(batches, consumed - consumed_on_date)
+
+    return {
+        "quantity": received - covered,
+        "value": round(received_cost - consumed_cost, 2),
+        "consumed_quantity": consumed_on_date,
+        "cost_of_sales": round(consumed_cost - opening_consumed_cost, 2),
+    }
+
+
+@transaction.atomic
+def snapshot_stock_valuation(date: datetime.date) -> int:
+    """Compute and store the valuation of every item at the end of date"""
+
+    now = timezone.now()
+    valuations: List[StockValuation] = []
+    for name, section in SECTIONS.items():
+        consumed: Dict[int, Tuple[int, int]] = get_consumed(section, date)
+        for item_id, batches in get_batches(section, date).items():
+            valuations.append(
+                StockValuation(
+                    item_id=item_id,
+                    section=name,
+                    date=date,
+                    computed_at=now,
+                    **value_item(batches, *consumed.get(item_id, (0, 0))),
+                )
+            )
+
+    StockValuation.objects.filter(date=date).delete()
+    StockValuation.objects.bulk_create(valuations, batch_size=1000)
+
+    return len(valuations)
+
+
+def get_valuation(date: datetime.date, section: Optional[str] = None) -> Dict:
+    """Stored valuation of every item at the end of date"""
+
+    queryset = StockValuation.objects.filter(date=date)
+    if section:
+        queryset = queryset.filter(section=section)
+    items: List[Dict] = list(
+        queryset.values(
+            "item",
+            "section",
+            "quantity",
+            "value",
+            "consumed_quantity",
+            "cost_of_sales",
+            name=F("item__name"),
+            unit=F("item__unit__name"),
+        ).order_by("section", "name")
+    )
+
+    return {
+        "date": str(date),
+        "section": section or "all",
+        "value": round(sum(item["value"] for item in items), 2),
+        "cost_of_sales": round(sum(item["cost_of_sales"] for item in items), 2),
+        "items": items,
+    }
+
+
+def get_cost_of_sales(
+    from_date: datetime.date, to_date: datetime.date, section: Optional[str] = None
+) -> Dict:
+    """Stored cost of sales per day and per item over a period"""
+
+    queryset = StockValuation.objects.filter(date__range=(from_date, to_date))
+    if section:
+        queryset = queryset.filter(section=section)
+    days: List[Dict] = list(
+        queryset.values("date").annotate(cost=Sum("cost_of_sales")).order_by("date")
+    )
+    items: List[Dict] = list(
+        queryset.values("item", "section", name=F("item__name"))
+        .annotate(consumed=Sum("consumed_quantity"), cost=Sum("cost_of_sales"))
+        .order_by("-cost")
+    )
+
+    return {
+        "dates": "{} TO {}".format(str(from_date), str(to_date)),
+        "section": section or "all",
+        "cost_of_sales": round(sum(day["cost"] for day in days), 2),
+        "days": [{"date": str(day["date"]), "cost": round(day["cost"], 2)} for day in days],
+        "items": items,
+    }
@@ -1,20 +1,50 @@
+import datetime
 from typing import Dict, List
 
+from dateutil import parser
+from django.db.models import Max
+from django.utils import timezone
 from rest_framework import status, viewsets, serializers
+from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from core.models import CreditCustomer, Item, MeasurementUnit, Expenditure
+from core.analytics import BUCKETS, DIMENSIONS, MAX_DAYS, get_sales_analytics
+from core.models import (
+    CreditCustomer,
+    Item,
+    MOVEMENT_KIND_CHOICES,
+    MOVEMENT_SECTION_CHOICES,
+    MeasurementUnit,
+    Expenditure,
+    StockOutProjection,
+    StockValuation,
+)
 from core.serializers import (
     CreditCustomerSerializer,
     MeasurementUnitSerializer,
     ItemSerializer,
+    StockOutProjectionSerializer,
 )
+from core.movements import get_movement_report, get_movements, get_stock_at
+from core.offline import MAX_BATCH_SIZE, submit_batch
+from core.payroll import get_payroll_summary
+from core.receivables import get_aging
+from core.reference import get_reference_data
+from core.search import MAX_PAGE_SIZE, MAX_RESULTS, PAGE_SIZE, SEARCH_DAYS, SOURCES as SEARCH_SOURCES, search
+from core.serialization import FlatSerializer, timestamp
+from core.statements import get_statement
+from core.sync import get_changes
+from core.utils import get_date_objects, get_day_range, validate_dates
+from core.valuation import SECTIONS as VALUATION_SECTIONS, get_cost_of_sales, get_valuation
 
 
 class MeasurementUnitViewSet(viewsets.ModelViewSet):
     queryset = MeasurementUnit.objects.all()
     serializer_class = MeasurementUnitSerializer
 
+    def list(self, request, *args, **kwargs):
+        return Response(data=get_reference_data("units"), status=status.HTTP_200_OK)
+
 
 class ItemViewSet(viewsets.ModelViewSet):
     """ Item View API """
@@ -28,6 +58,9 @@ class ItemViewSet(viewsets.ModelViewSet):
     queryset = Item.objects.select_related("unit")
     serializer_class = ItemSerializer
 
+    def list(self, request, *args, **kwargs):
+        return Response(data=get_reference_data("items"), status=status.HTTP_200_OK)
+
     def create(self, request, *args, **kwargs):
         serializer = self.InputSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -73,23 +106,60 @@ class CreditCustomerViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return CreditCustomer.objects.all()
 
+    @action(
+        detail=False,
+        methods=["GET"],
+    )
+    def get_receivables_aging(self, request, *args, **kwargs):
+        """Outstanding credit per customer in 0-7, 8-30, 31-60 and 60+ day buckets"""
+
+        return Response(data=get_aging(), status=status.HTTP_200_OK)
+
+    @action(
+        detail=True,
+        methods=["GET"],
+    )
+    def get_statement(self, request, *args, **kwargs):
+        """Bar and restaurant credit postings and repayments with a running balance"""
+
+        customer: CreditCustomer = self.get_object()
+        from_date = request.query_params.get("from_date")
+        to_date = request.query_params.get("to_date")
+        if from_date and to_date:
+            try:
+                from_date, to_date = get_date_objects(from_date, to_date)
+            except (ValueError, OverflowError):
+                raise serializers.ValidationError({"message": "Invalid dates."})
+            if validate_dates(from_date, to_date):
+                raise serializers.ValidationError(
+                    {"message": "from_date must be less than or equal to to_date"}
+                )
+        else:
+            from_date = to_date = None
+        try:
+            page = max(int(request.query_params.get("page", 1)), 1)
+            page_size = min(max(int(request.query_params.get("page_size", 50)), 1), 500)
+        except ValueError:
+            raise serializers.ValidationError({"message": "page and page_size must be numbers."})
+
+        data: Dict = {
+            "customer": {"id": customer.id, "name": customer.name, "phone": customer.phone},
+            **get_statement(customer.id, from_date, to_date, page, page_size),
+        }
+
+        return Response(data=data, status=status.HTTP_200_OK)
+
 
 class ExpenditureView(viewsets.ModelViewSet):
     """  """
 
-    class OutputSerializer(serializers.ModelSerializer):
-        class Meta:
-            model = Expenditure
-            fields = "__all__"
-
-        def to_representation(self, instance) -> Dict:
-            return {
-                "id": instance.id,
-                "name": instance.name,
-                "amount": instance.amount,
-                "expenditure_for": instance.expenditure_for.capitalize(),
-                "date_created": instance.date_created.timestamp()
-            }
+    output_serializer = FlatSerializer(
+        id="id",
+        name="name",
+        amount="amount",
+        expenditure_for=("expenditure_for", str.capitalize),
+        date_created=("date_created", timestamp),
+    )
 
     class InputSerializer(serializers.Serializer):
         name = serializers.CharField(max_length=128)
@@ -109,6 +179,279 @@ class ExpenditureView(viewsets.ModelViewSet):
         return Response(status.HTTP_201_CREATED)
 
     def list(self, request, *args, **kwargs):
-        data = self.OutputSerializer(self.get_queryset(), many=True).data
+        data = self.output_serializer.serialize(self.get_queryset())
 
         return Response(data=data, status=status.HTTP_200_OK)
+
+
+class StockOutProjectionViewSet(viewsets.ReadOnlyModelViewSet):
+    """ Projected stock out dates computed by the nightly forecast """
+
+    serializer_class = StockOutProjectionSerializer
+
+    def get_queryset(self):
+        queryset = StockOutProjection.objects.select_related("item", "item__unit")
+        section = self.request.query_params.get("section")
+        if section:
+            queryset = queryset.filter(section=section)
+        return queryset
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(data=self.get_serializer(self.get_object()).data, status=status.HTTP_200_OK)
+
+    def list(self, request, *args, **kwargs):
+        response: List[Dict] = self.get_serializer(self.get_queryset(), many=True).data
+
+        return Response(data=response, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False,
+        methods=["GET"],
+    )
+    def get_at_risk(self, request, *args, **kwargs):
+        try:
+            days = int(request.query_params.get("days", 7))
+        except ValueError:
+            raise serializers.ValidationError({"message": "days must be a number."})
+        queryset = self.get_queryset().filter(days_to_stock_out__lte=days)
+        response: List[Dict] = self.get_serializer(queryset, many=True).data
+
+        return Response(data=response, status=status.HTTP_200_OK)
+
+
+class SyncViewSet(viewsets.ViewSet):
+    """ Rows changed since the client's sync token, for offline tablets """
+
+    def list(self, request, *args, **kwargs):
+        token = request.query_params.get("token")
+        try:
+            token = int(token) if token else None
+        except ValueError:
+            raise serializers.ValidationError({"message": "token must be a number."})
+
+        return Response(data=get_changes(token), status=status.HTTP_200_OK)
+
+
+class OfflineSubmissionViewSet(viewsets.ViewSet):
+    """ Orders and payments queued by tablets while offline, keyed for idempotency """
+
+    def create(self, request, *args, **kwargs):
+        submissions = request.data.get("submissions")
+        if not isinstance(submissions, list) or not submissions:
+            raise serializers.ValidationError({"message": "submissions must be a non empty list."})
+        if len(submissions) > MAX_BATCH_SIZE:
+            raise serializers.ValidationError(
+                {"message": f"A batch must not exceed {MAX_BATCH_SIZE} submissions."}
+            )
+
+        return Response(
+            data={"results": submit_batch(request, submissions)}, status=status.HTTP_200_OK
+        )
+
+
+class PayrollSummaryViewSet(viewsets.ViewSet):
+    """ Bar and restaurant payroll totals per payee, month and year to date """
+
+    def list(self, request, *args, **kwargs):
+        today = timezone.localdate()
+        try:
+            year = int(request.query_params.get("year", today.year))
+            month = int(request.query_params.get("month", today.month))
+        except ValueError:
+            raise serializers.ValidationError({"message": "year and month must be numbers."})
+        if not 1 <= month <= 12 or not 1 <= year <= 9998:
+            raise serializers.ValidationError({"message": "Invalid year or month."})
+
+        return Response(data=get_payroll_summary(year, month), status=status.HTTP_200_OK)
+
+
+class SalesAnalyticsViewSet(viewsets.ViewSet):
+    """ Quantity and revenue per hour, day or week bucket and item or waiter """
+
+    def list(self, request, *args, **kwargs):
+        params = request.query_params
+        bucket = params.get("bucket", "day")
+        dimension = params.get("by", "item")
+        section = params.get("section") or None
+        if bucket not in BUCKETS:
+            raise serializers.ValidationError({"message": f"bucket must be one of {', '.join(BUCKETS)}."})
+        if dimension not in DIMENSIONS:
+            raise serializers.ValidationError({"message": f"by must be one of {', '.join(DIMENSIONS)}."})
+        if section not in (None, "bar", "restaurant"):
+            raise serializers.ValidationError({"message": "section must be bar or restaurant."})
+
+        to_date = timezone.localdate()
+        from_date = to_date - datetime.timedelta(days=6)
+        if params.get("from_date") and params.get("to_date"):
+            try:
+                from_date, to_date = get_date_objects(params["from_date"], params["to_date"])
+            except (ValueError, OverflowError):
+                raise serializers.ValidationError({"message": "Invalid dates."})
+        if validate_dates(from_date, to_date):
+            raise serializers.ValidationError(
+                {"message": "from_date must be less than or equal to to_date"}
+            )
+        if (to_date - from_date).days >= MAX_DAYS:
+            raise serializers.ValidationError(
+                {"message": f"The period must not exceed {MAX_DAYS} days."}
+            )
+        try:
+            top = min(max(int(params.get("top", 10)), 1), 100)
+        except ValueError:
+            raise serializers.ValidationError({"message": "top must be a number."})
+
+        data = get_sales_analytics(bucket, dimension, from_date, to_date, section, top)
+
+        return Response(data=data, status=status.HTTP_200_OK)
+
+
+class StockValuationViewSet(viewsets.ViewSet):
+    """ Stored end of day FIFO stock valuation and cost of sales """
+
+    def get_section(self):
+        section = self.request.query_params.get("section") or None
+        if section not in (None, *VALUATION_SECTIONS):
+            raise serializers.ValidationError(
+                {"message": f"section must be one of {', '.join(VALUATION_SECTIONS)}."}
+            )
+        return section
+
+    def list(self, request, *args, **kwargs):
+        section = self.get_section()
+        date = StockValuation.objects.aggregate(latest=Max("date"))["latest"]
+        if request.query_params.get("date"):
+            try:
+                date = get_date_objects(request.query_params["date"], request.query_params["date"])[0]
+            except (ValueError, OverflowError):
+                raise serializers.ValidationError({"message": "Invalid date."})
+        if date is None or not StockValuation.objects.filter(date=date).exists():
+            raise serializers.ValidationError({"message": f"No stock valuation for {date or 'any date'}."})
+
+        return Response(data=get_valuation(date, section), status=status.HTTP_200_OK)
+
+    @action(
+        detail=False,
+        methods=["GET"],
+    )
+    def get_cost_of_sales(self, request, *args, **kwargs):
+        section = self.get_section()
+        to_date = timezone.localdate()
+        from_date = to_date.replace(day=1)
+        if request.query_params.get("from_date") and request.query_params.get("to_date"):
+            try:
+                from_date, to_date = get_date_objects(
+                    request.query_params["from_date"], request.query_params["to_date"]
+                )
+            except (ValueError, OverflowError):
+                raise serializers.ValidationError({"message": "Invalid dates."})
+        if validate_dates(from_date, to_date):
+            raise serializers.ValidationError(
+                {"message": "from_date must be less than or equal to to_date"}
+            )
+
+        return Response(data=get_cost_of_sales(from_date, to_date, section), status=status.HTTP_200_OK)
+
+
+class StockMovementViewSet(viewsets.ViewSet):
+    """ Append-only stock movement ledger: movements, stock at a time and movement reports """
+
+    MAX_ROWS: int = 1000
+
+    def get_filters(self):
+        section = self.request.query_params.get("section") or None
+        if section not in (None, *dict(MOVEMENT_SECTION_CHOICES)):
+            raise serializers.ValidationError({"message": "Invalid section."})
+        kind = self.request.query_params.get("kind") or None
+        if kind not in (None, *dict(MOVEMENT_KIND_CHOICES)):
+            raise serializers.ValidationError({"message": "Invalid kind."})
+        return section, kind
+
+    def get_period(self):
+        to_date = timezone.localdate()
+        from_date = to_date - datetime.timedelta(days=6)
+        params = self.request.query_params
+        if params.get("from_date") and params.get("to_date"):
+            try:
+                from_date, to_date = get_date_objects(params["from_date"], params["to_date"])
+            except (ValueError, OverflowError):
+                raise serializers.ValidationError({"message": "Invalid dates."})
+        if validate_dates(from_date, to_date):
+            raise serializers.ValidationError(
+                {"message": "from_date must be less than or equal to to_date"}
+            )
+        return get_day_range(from_date, to_date)
+
+    def list(self, request, *args, **kwargs):
+        section, kind = self.get_filters()
+        start, end = self.get_period()
+        try:
+            item_id = int(request.query_params.get("item", 0))
+            limit = min(max(int(request.query_params.get("limit", 200)), 1), self.MAX_ROWS)
+        except ValueError:
+            raise serializers.ValidationError({"message": "item and limit must be numbers."})
+
+        movements = get_movements(start, end, item_id, section, kind)[:limit]
+        response: List[Dict] = [
+            {**movement, "created_at": timestamp(movement["created_at"])} for movement in movements
+        ]
+
+        return Response(data=response, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False,
+        methods=["GET"],
+    )
+    def get_stock_at(self, request, *args, **kwargs):
+        section, _ = self.get_filters()
+        at = timezone.now()
+        if request.query_params.get("at"):
+            try:
+                at = parser.parse(request.query_params["at"])
+            except (ValueError, OverflowError):
+                raise serializers.ValidationError({"message": "Invalid time."})
+            if timezone.is_naive(at):
+                at = timezone.make_aware(at)
+
+        return Response(
+            data={"at": at.isoformat(), "items": get_stock_at(at, section)}, status=status.HTTP_200_OK
+        )
+
+    @action(
+        detail=False,
+        methods=["GET"],
+    )
+    def get_report(self, request, *args, **kwargs):
+        section, _ = self.get_filters()
+        start, end = self.get_period()
+
+        return Response(data=get_movement_report(start, end, section), status=status.HTTP_200_OK)
+
+
+class SearchViewSet(viewsets.ViewSet):
+    """ Fuzzy search of credit customers and customer orders by name or phone """
+
+    MIN_QUERY_LENGTH: int = 2
+
+    def list(self, request, *args, **kwargs):
+        query = request.query_params.get("q", "").strip()
+        if len(query) < self.MIN_QUERY_LENGTH:
+            raise serializers.ValidationError(
+                {"message": f"q must have at least {self.MIN_QUERY_LENGTH} characters."}
+            )
+        sources = [source for source in request.query_params.get("sources", "").split(",") if source]
+        if any(source not in SEARCH_SOURCES for source in sources):
+            raise serializers.ValidationError(
+                {"message": "sources must be among {}.".format(", ".join(SEARCH_SOURCES))}
+            )
+        try:
+            days = max(int(request.query_params.get("days", SEARCH_DAYS)), 0)
+            page = max(int(request.query_params.get("page", 1)), 1)
+            page_size = min(max(int(request.query_params.get("page_size", PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        except ValueError:
+            raise serializers.ValidationError({"message": "days, page and page_size must be numbers."})
+        if page * page_size > MAX_RESULTS:
+            raise serializers.ValidationError(
+                {"message": f"Only the first {MAX_RESULTS} matches can be paged through."}
+            )
+
+        return Response(data=search(query, sources, days, page, page_size), status=status.HTTP_200_OK)
@@ -0,0 +1,23 @@
+"""Gunicorn settings, read from the working directory: gunicorn waiterbackend.wsgi
+
+The display websockets are served by a separate daphne process (see
+waiterbackend/asgi.py); both reach each other through the Redis channel
+layer, so set REDIS_URL for both."""
+import logging
+
+wsgi_app = "waiterbackend.wsgi:application"
+
+
+def post_worker_init(worker):
+    """Prewarm each worker once it has loaded the app, before it accepts
+    requests. post_fork runs before the app is imported, and the database
+    connection must be opened by the worker itself, not the arbiter."""
+
+    from core.prewarm import prewarm
+
+    logger = logging.getLogger("gunicorn.error")
+    for step in prewarm():
+        if step["error"]:
+            logger.warning("Prewarm %s failed: %s", step["step"], step["error"])
+        else:
+            logger.info("Prewarm %s: %.3fs (%d)", step["step"], step["seconds"], step["count"])
@@ -3,7 +3,7 @@ from django.db.models.aggregates import Sum
 from rest_framework.views import APIView
 
 from bar.models import CustomerRegularTequilaOrderRecordPayment
-from core.utils import get_date_objects
+from core.utils import get_date_objects, get_day_range, get_month_end, get_month_start
 from restaurant.models import (
     MainInventoryItemRecordStockOut,
     MiscellaneousInventoryRecord,
@@ -78,7 +78,7 @@ class DailyReport(BaseReport, APIView):
 
     def get_todays_response(self, response: Dict) -> str:
         todays_date = timezone.localdate()
-        response["todays_date"] = todays_date.__str__
+        response["todays_date"] = str(todays_date)
 
         return todays_date
 
@@ -102,8 +102,9 @@ class DailyReport(BaseReport, APIView):
         return total_misc_expense, misc_qs
 
     def get_queryset(self, todays_date):
+        start, end = get_day_range(todays_date)
         return (
-            CustomerRegularTequilaOrderRecordPayment.objects.filter(date_paid__date=todays_date)
+            CustomerRegularTequilaOrderRecordPayment.objects.filter(date_paid__gte=start, date_paid__lt=end)
             .select_related("customer_regular_tequila_order_record", "created_by")
         )
 
@@ -227,8 +228,7 @@ class MonthlyReport(BaseReport, APIView):
     def get_queryset(self, this_month):
         return (
             CustomerDishPayment.objects.filter(
-                date_paid__date__year=this_month.year,
-                date_paid__date__month=this_month.month,
+                date_paid__gte=get_month_start(this_month), date_paid__lt=get_month_end(this_month)
             )
             .select_related("customer_dish")
             .prefetch_related("customer_dish__orders")
@@ -1,11 +1,78 @@
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Tuple
 
+from django.db import close_old_connections
+from django.db.models import DecimalField, ExpressionWrapper, F
 from django.db.models.aggregates import Sum
+from django.db.models.functions import Cast
+
+REPORT_WORKERS: int = 4
+# Cost of issued stock: quantity_out * purchasing_price / quantity, computed
+# with exact numeric arithmetic (casting first avoids integer division)
+ISSUED_COST = ExpressionWrapper(
+    Cast("quantity_out", DecimalField(max_digits=30, decimal_places=10))
+    * F("item_record__purchasing_price")
+    / F("item_record__quantity"),
+    output_field=DecimalField(max_digits=30, decimal_places=10),
+)
+report_executor = ThreadPoolExecutor(
+    max_workers=REPORT_WORKERS, thread_name_prefix="report-section"
+)
+
+
+def run_section(section: Callable):
+    """Run a section on a worker thread with that thread's own DB connection"""
+
+    close_old_connections()
+    try:
+        return section()
+    finally:
+        close_old_connections()
+
+
+def compute_sections(sections: Dict[str, Callable]) -> Dict:
+    """Compute independent report sections in parallel, each exactly once.
+
+    Sections must return evaluated data (not lazy querysets), the report then
+    takes as long as its slowest section instead of the sum of all of them.
+    """
+
+    futures: Dict = {
+        name: report_executor.submit(run_section, section)
+        for name, section in sections.items()
+    }
+
+    return {name: future.result() for name, future in futures.items()}
+
+
+def to_amount(value: Optional[Decimal]) -> float:
+    """Round an exact database amount to cents for the response"""
+
+    return float(round(value or Decimal(0), 2))
 
 
 class BaseReport(object):
     """"""
 
+    def get_misc_section(self, *dates) -> Tuple[float, List]:
+        total_misc_expense, misc_qs = self.get_total_misc_expense_and_misc_qs(*dates)
+
+        return total_misc_expense, self.append_misc_items(misc_qs)
+
+    def get_main_section(self, *dates) -> Tuple[float, List]:
+        """Consumption cost and issued items of main inventory in one query"""
+
+        rows: List[Dict] = list(self.get_issued_rows(self.get_main_qs(*dates)))
+        total_main_expense: float = to_amount(sum(row["cost"] or 0 for row in rows))
+
+        return total_main_expense, self.structure_issued_items(rows)
+
+    def get_total_main_expense_and_main_qs(self, *dates):
+        main_qs = self.get_main_qs(*dates)
+
+        return self.get_total_main_expense(main_qs), main_qs
+
     def append_misc_items(self, misc_qs) -> List:
         temp_miscellenous_items: List = []
         for misc_item in misc_qs:
@@ -22,18 +89,32 @@ class BaseReport(object):
 
         return temp_miscellenous_items
 
+    def get_issued_rows(self, main_qs):
+        """Issued quantity and its cost per item, grouped by the database"""
+
+        return (
+            main_qs.values("item_record__main_inventory_item__item")
+            .annotate(
+                item_name=F("item_record__main_inventory_item__item__name"),
+                unit=F("item_record__main_inventory_item__item__unit__name"),
+                issued_quantity=Sum("quantity_out"),
+                cost=Sum(ISSUED_COST),
+            )
+            .order_by("item_name")
+        )
+
     def append_temp_issued_items(self, main_qs) -> List:
+        return self.structure_issued_items(self.get_issued_rows(main_qs))
+
+    def structure_issued_items(self, rows) -> List:
         temp_issued_items: List = []
-        for qs in main_qs:
+        for row in rows:
             temp_issued_items.append(
                 {
-                    "item_id": qs.id,
-                    "item_name": qs.item_record.main_inventory_item.item.name,
-                    "issued_quantity": "{} {}".format(
-                        qs.quantity_out,
-                        qs.item_record.main_inventory_item.item.unit.name,
-                    ),
-                    "estimated_price": qs.item_record.ppu,
+                    "item_id": row["item_record__main_inventory_item__item"],
+                    "item_name": row["item_name"],
+                    "issued_quantity": "{} {}".format(row["issued_quantity"], row["unit"]),
+                    "estimated_price": to_amount(row["cost"]),
                 },
             )
 
@@ -47,11 +128,7 @@ class BaseReport(object):
         return sales
 
     def get_total_main_expense(self, main_qs) -> float:
-        total_main_expense: float = 0.0
-        for qs in main_qs:
-            total_main_expense += qs.get_ppu()
-
-        return total_main_expense
+        return to_amount(main_qs.aggregate(total=Sum(ISSUED_COST))["total"])
 
     def structure_dishes(self, qs, sales):
         sales["dishes_structure"] = []
@@ -1,5 +1,5 @@
 import calendar
-from typing import Dict
+from typing import Dict, List, Tuple
 
 from django.db.models import Sum
 from django.utils import timezone
@@ -10,12 +10,14 @@ from rest_framework.views import APIView
 from bar.models import CustomerRegularTequilaOrderRecord, BarPayrol, RegularInventoryRecord, TekilaInventoryRecord, \
     CustomerRegularTequilaOrderRecordPayment
 from core.models import Expenditure
-from core.utils import get_date_objects
+from core.utils import get_date_objects, get_day_range, get_month_end, get_month_start, validate_dates
+from reports.base import compute_sections
+from reports.profit_and_loss import get_profit_and_loss
 
 
 def get_today_response(response: Dict) -> str:
     today_date = timezone.localdate()
-    response["today_date"] = today_date.__str__
+    response["today_date"] = str(today_date)
 
     return today_date
 
@@ -60,8 +62,9 @@ class DailyReport(APIView):
         return Response(response, status.HTTP_200_OK)
 
     def get_queryset(self, today_date):
+        start, end = get_day_range(today_date)
         return (
-            CustomerRegularTequilaOrderRecord.objects.filter(date_created__date=today_date)
+            CustomerRegularTequilaOrderRecord.objects.filter(date_created__gte=start, date_created__lt=end)
                 .select_related("regular_tequila_order_record", "created_by")
         )
 
@@ -85,14 +88,16 @@ class MonthlyReport(APIView):
 
     def get(self, request, *args, **kwargs):
         response: Dict = {}
-        qs = self.get_queryset(self.this_month)
         self.get_current_month(response)
 
-        sales: Dict = self.get_sales_response(qs)
-        response["sales"] = sales
-
-        expenses: Dict = self.get_expenses_response(response, self.this_month)
-        response["expenses"] = expenses
+        sections: Dict = compute_sections(
+            {
+                "sales": lambda: self.get_sales_response(self.get_queryset(self.this_month)),
+                "expenses": lambda: self.get_expenses_response(response, self.this_month),
+            }
+        )
+        response["sales"] = sections["sales"]
+        response["expenses"] = sections["expenses"]
 
         total_sales = response["sales"]["total_sales"]
         total_expenses = response["expenses"]["payrolls"]
@@ -146,8 +151,7 @@ class MonthlyReport(APIView):
     def get_queryset(self, this_month):
         return (
             CustomerRegularTequilaOrderRecord.objects.filter(
-                date_created__date__year=this_month.year,
-                date_created__date__month=this_month.month,
+                date_created__gte=get_month_start(this_month), date_created__lt=get_month_end(this_month)
             )
                 .select_related("regular_tequila_order_record", "created_by")
         )
@@ -166,47 +170,32 @@ class CustomDateReport(APIView):
         except TypeError:
             return Response({"message": "Choose dates."}, status.HTTP_400_BAD_REQUEST)
 
-        qs = self.get_queryset(date1, date2)
-
         self.get_custom_dates(response, date1, date2)
+
+        sections: Dict = compute_sections(
+            {
+                "orders": lambda: self.get_orders_section(self.get_queryset(date1, date2)),
+                "expenditure": lambda: self.get_total_expenditure(date1, date2),
+                "payroll": lambda: self.get_custom_payrolls(date1, date2),
+                "regular_inventory": lambda: self.get_total_inventory_cost(
+                    RegularInventoryRecord, date1, date2
+                ),
+                "tequila_inventory": lambda: self.get_total_inventory_cost(
+                    TekilaInventoryRecord, date1, date2
+                ),
+            }
+        )
+
         # Orders
-        orders_list = []
-        for q in qs:
-            orders_list.append({
-                "order_number": q.customer_regular_tequila_order_record.dish_number,
-                "date": int(q.date_paid.timestamp()),
-                "total_price": q.customer_regular_tequila_order_record.get_total_price(),
-                "total_paid": q.customer_regular_tequila_order_record.paid_amount,
-                "total_unpaid": q.customer_regular_tequila_order_record.remained_amount,
-                "status": q.customer_regular_tequila_order_record.status.capitalize(),
-                "order_items": q.customer_regular_tequila_order_record.get_orders_detail
-            })
+        orders_list, total_sales, total_unpaid = sections["orders"]
         response["orders_list"] = orders_list
 
         # Total Sales
-        total_sales: int = 0
-        total_unpaid: int = 0
-        for i in qs:
-            total_sales += i.customer_regular_tequila_order_record.paid_amount
-            total_unpaid += i.customer_regular_tequila_order_record.remained_amount
         response["total_sales"] = total_sales or 0
         response["total_unpaid"] = total_unpaid or 0
-        response["total_expenditure"] = Expenditure.objects.filter(
-            expenditure_for__in=["bar", "both"], date_created__range=(date1, date2)
-        ).aggregate(total=Sum("amount"))["total"] or 0
-        bar_payrolls: int = \
-            BarPayrol.objects.filter(date_paid__range=(date1, date2)).aggregate(total=Sum("amount_paid"))[
-                "total"]
-        response["total_payroll"] = bar_payrolls or 0
-        total_regular_inv = RegularInventoryRecord.objects.filter(
-            date_purchased__range=(date1, date2)
-        ).aggregate(total=Sum("purchasing_price"))["total"] or 0
-
-        total_tequila_inv = TekilaInventoryRecord.objects.filter(
-            date_purchased__range=(date1, date2)
-        ).aggregate(total=Sum("purchasing_price"))["total"] or 0
-
-        response["total_inventory_cost"] = total_regular_inv + total_tequila_inv
+        response["total_expenditure"] = sections["expenditure"]
+        response["total_payroll"] = sections["payroll"]
+        response["total_inventory_cost"] = sections["regular_inventory"] + sections["tequila_inventory"]
 
         response["net_profit"] = total_sales or 0 - (
                 total_unpaid or 0 + response["total_expenditure"] or 0 + response["total_payroll"] or 0 + response[
@@ -214,6 +203,38 @@ class CustomDateReport(APIView):
 
         return Response(response, status.HTTP_200_OK)
 
+    def get_orders_section(self, qs) -> Tuple[List[Dict], int, int]:
+        orders_list: List[Dict] = []
+        total_sales: int = 0
+        total_unpaid: int = 0
+        for q in qs:
+            order_record = q.customer_regular_tequila_order_record
+            paid_amount = order_record.paid_amount
+            remained_amount = order_record.remained_amount
+            orders_list.append({
+                "order_number": order_record.dish_number,
+                "date": int(q.date_paid.timestamp()),
+                "total_price": order_record.get_total_price(),
+                "total_paid": paid_amount,
+                "total_unpaid": remained_amount,
+                "status": order_record.status.capitalize(),
+                "order_items": order_record.get_orders_detail
+            })
+            total_sales += paid_amount
+            total_unpaid += remained_amount
+
+        return orders_list, total_sales, total_unpaid
+
+    def get_total_expenditure(self, date1, date2) -> int:
+        return Expenditure.objects.filter(
+            expenditure_for__in=["bar", "both"], date_created__range=(date1, date2)
+        ).aggregate(total=Sum("amount"))["total"] or 0
+
+    def get_total_inventory_cost(self, model, date1, date2) -> int:
+        return model.objects.filter(
+            date_purchased__range=(date1, date2)
+        ).aggregate(total=Sum("purchasing_price"))["total"] or 0
+
     def get_expenses_response(self, response: Dict, date1, date2) -> Dict:
         expenses: Dict = {}
         custom_payroll = self.get_custom_payrolls(date1, date2)
@@ -245,3 +266,25 @@ class CustomDateReport(APIView):
             )
                 .select_related("customer_regular_tequila_order_record__regular_tequila_order_record", "created_by")
         )
+
+
+class ProfitAndLossReport(APIView):
+    """Bar and restaurant profit and loss for a date range, per section and combined"""
+
+    def post(self, request, *args, **kwargs):
+        first_date = request.data.get("first_date")
+        second_date = request.data.get("second_date")
+
+        try:
+            date1, date2 = get_date_objects(first_date, second_date)
+        except TypeError:
+            return Response({"message": "Choose dates."}, status.HTTP_400_BAD_REQUEST)
+        except (ValueError, OverflowError):
+            return Response({"message": "Invalid dates."}, status.HTTP_400_BAD_REQUEST)
+        if validate_dates(date1, date2):
+            return Response(
+                {"message": "first_date must be less than or equal to second_date"},
+                status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(get_profit_and_loss(date1, date2), status.HTTP_200_OK)
@@ -0,0 +1,231 @@
+"""
+Profit and loss of the bar and the restaurant over a date range.
+
+Every line of the statement (sales, credit taken and repaid, expenditures,
+payroll, inventory cost) is one aggregate tagged with its section; all of
+them are combined into a single UNION ALL statement, so both sections are
+computed in one database round trip. Credit taken is dated by its posting
+and credit repaid by the repayment, so credit_outstanding is the period's
+net change in customer credit. Expenditures are read once, grouped by
+expenditure_for: "both" expenditures are reported as shared costs, counted
+once in the combined totals instead of once per section.
+"""
+import datetime
+from decimal import Decimal
+from typing import Dict, List, Tuple
+
+from django.db import connection
+from django.db.models import CharField, DecimalField, F, Sum, Value
+from django.db.models.functions import Cast
+from django.db.models.query import QuerySet
+
+from bar.models import (
+    BarPayrol,
+    CreditCustomerRegularTequilaOrderRecordPayment,
+    CreditCustomerRegularTequilaOrderRecordPaymentHistory,
+    CustomerRegularTequilaOrderRecordPayment,
+    RegularInventoryRecord,
+    TekilaInventoryRecord,
+)
+from core.models import Expenditure
+from core.statements import get_bar_credit_taken, get_restaurant_credit_taken
+from core.utils import get_day_range
+from reports.base import ISSUED_COST, to_amount
+from restaurant.models import (
+    CreditCustomerDishPayment,
+    CreditCustomerDishPaymentHistory,
+    CustomerDishPayment,
+    MainInventoryItemRecordStockOut,
+    MiscellaneousInventoryRecord,
+    RestaurantPayrol,
+)
+
+SECTIONS: Tuple[str, ...] = ("bar", "restaurant")
+# line: lines of the statement it adds up
+COST_LINES: Dict[str, Tuple[str, ...]] = {
+    "expenditures": ("expenditures",),
+    "payroll": ("payroll",),
+    "inventory_cost": (
+        "regular_purchases",
+        "tequila_purchases",
+        "miscellaneous_purchases",
+        "main_consumption",
+    ),
+}
+
+
+def as_line(queryset: QuerySet, section: str, line: str, amount) -> QuerySet:
+    """One aggregate row of (section, line, amount), the UNION's column order"""
+
+    return (
+        queryset.annotate(
+            section=Value(section, output_field=CharField()),
+            line=Value(line, output_field=CharField()),
+        )
+        .values("section", "line")
+        .annotate(amount=Cast(Sum(amount), DecimalField(max_digits=30, decimal_places=10)))
+        .order_by()
+    )
+
+
+def get_expenditure_lines(date1: datetime.date, date2: datetime.date) -> QuerySet:
+    """Expenditures per expenditure_for ("bar", "restaurant" or "both")"""
+
+    start, end = get_day_range(date1, date2)
+
+    return (
+        Expenditure.objects.filter(date_created__gte=start, date_created__lt=end)
+        .values(section=F("expenditure_for"))
+        .annotate(
+            line=Value("expenditures", output_field=CharField()),
+            amount=Cast(Sum("amount"), DecimalField(max_digits=30, decimal_places=10)),
+        )
+        .order_by()
+    )
+
+
+def get_restaurant_lines(date1: datetime.date, date2: datetime.date) -> List[QuerySet]:
+    start, end = get_day_range(date1, date2)
+
+    return [
+        as_line(
+            CustomerDishPayment.objects.filter(date_paid__gte=start, date_paid__lt=end),
+            "restaurant",
+            "sales",
+            "amount_paid",
+        ),
+        as_line(
+            CreditCustomerDishPayment.objects.filter(date_created__range=(date1, date2)),
+            "restaurant",
+            "credit_taken",
+            get_restaurant_credit_taken(),
+        ),
+        as_line(
+            CreditCustomerDishPaymentHistory.objects.filter(date_paid__range=(date1, date2)),
+            "restaurant",
+            "credit_repaid",
+            "amount_paid",
+        ),
+        as_line(
+            RestaurantPayrol.objects.filter(date_paid__range=(date1, date2)),
+            "restaurant",
+            "payroll",
+            "amount_paid",
+        ),
+        as_line(
+            MiscellaneousInventoryRecord.objects.filter(date_purchased__range=(date1, date2)),
+            "restaurant",
+            "miscellaneous_purchases",
+            "purchasing_price",
+        ),
+        as_line(
+            MainInventoryItemRecordStockOut.objects.filter(date_out__range=(date1, date2)),
+            "restaurant",
+            "main_consumption",
+            ISSUED_COST,
+        ),
+    ]
+
+
+def get_bar_lines(date1: datetime.date, date2: datetime.date) -> List[QuerySet]:
+    start, end = get_day_range(date1, date2)
+
+    return [
+        as_line(
+            CustomerRegularTequilaOrderRecordPayment.objects.filter(
+                date_paid__gte=start, date_paid__lt=end
+            ),
+            "bar",
+            "sales",
+            "amount_paid",
+        ),
+        as_line(
+            CreditCustomerRegularTequilaOrderRecordPayment.objects.filter(
+                date_created__range=(date1, date2)
+            ),
+            "bar",
+            "credit_taken",
+            get_bar_credit_taken(),
+        ),
+        as_line(
+            CreditCustomerRegularTequilaOrderRecordPaymentHistory.objects.filter(
+                date_paid__range=(date1, date2)
+            ),
+            "bar",
+            "credit_repaid",
+            "amount_paid",
+        ),
+        as_line(
+            BarPayrol.objects.filter(date_paid__range=(date1, date2)),
+            "bar",
+            "payroll",
+            "amount_paid",
+        ),
+        as_line(
+            RegularInventoryRecord.objects.filter(date_purchased__range=(date1, date2)),
+            "bar",
+            "regular_purchases",
+            "purchasing_price",
+        ),
+        as_line(
+            TekilaInventoryRecord.objects.filter(date_purchased__range=(date1, date2)),
+            "bar",
+            "tequila_purchases",
+            "purchasing_price",
+        ),
+    ]
+
+
+def get_lines(date1: datetime.date, date2: datetime.date) -> Dict[Tuple[str, str], Decimal]:
+    """Every (section, line) amount of the period, from one statement"""
+
+    first, *others = get_bar_lines(date1, date2) + get_restaurant_lines(date1, date2)
+    lines_sql, params = first.union(
+        *others, get_expenditure_lines(date1, date2), all=True
+    ).query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(lines_sql, params)
+        rows: List[Tuple] = cursor.fetchall()
+
+    return {(section, line): amount or Decimal(0) for section, line, amount in rows}
+
+
+def get_totals(lines: Dict[Tuple[str, str], Decimal], sections: Tuple[str, ...]) -> Dict:
+    def get(*names: str) -> Decimal:
+        return sum(
+            (lines.get((section, name), Decimal(0)) for section in sections for name in names),
+            Decimal(0),
+        )
+
+    sales: Decimal = get("sales")
+    costs: Dict[str, Decimal] = {name: get(*parts) for name, parts in COST_LINES.items()}
+    total_costs: Decimal = sum(costs.values(), Decimal(0))
+
+    return {
+        "sales": to_amount(sales),
+        "credit_taken": to_amount(get("credit_taken")),
+        "credit_repaid": to_amount(get("credit_repaid")),
+        "credit_outstanding": to_amount(get("credit_taken") - get("credit_repaid")),
+        **{name: to_amount(amount) for name, amount in costs.items()},
+        "inventory_cost_breakdown": {
+            name: to_amount(get(name))
+            for name in COST_LINES["inventory_cost"]
+            if any((section, name) in lines for section in sections)
+        },
+        "total_costs": to_amount(total_costs),
+        "net_profit": to_amount(sales - total_costs),
+    }
+
+
+def get_profit_and_loss(date1: datetime.date, date2: datetime.date) -> Dict:
+    lines: Dict[Tuple[str, str], Decimal] = get_lines(date1, date2)
+
+    return {
+        "dates": "{} TO {}".format(str(date1), str(date2)),
+        "sections": {section: get_totals(lines, (section,)) for section in SECTIONS},
+        # Shared ("both") expenditures count once, in the combined totals only
+        "combined": {
+            **get_totals(lines, SECTIONS + ("both",)),
+            "shared_expenditures": to_amount(lines.get(("both", "expenditures"))),
+        },
+    }
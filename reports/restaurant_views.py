@@ -1,5 +1,5 @@
 import calendar
-from typing import Dict
+from typing import Dict, List, Tuple
 
 from django.db.models.aggregates import Sum
 from django.utils import timezone
@@ -8,8 +8,8 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from core.models import Expenditure
-from core.utils import get_date_objects
-from reports.base import BaseReport
+from core.utils import get_date_objects, get_day_range, get_month_end, get_month_start
+from reports.base import BaseReport, compute_sections
 from restaurant.models import (
     MainInventoryItemRecordStockOut,
     MiscellaneousInventoryRecord,
@@ -25,12 +25,16 @@ class DailyReport(BaseReport, APIView):
         response: Dict = {}
         todays_date = self.get_todays_response(response)
 
-        qs = self.get_queryset(todays_date)
-
-        sales: Dict = self.get_sales_response(qs)
-        response["sales"] = sales
+        sections: Dict = compute_sections(
+            {
+                "sales": lambda: self.get_sales_response(self.get_queryset(todays_date)),
+                "misc": lambda: self.get_misc_section(todays_date),
+                "main": lambda: self.get_main_section(todays_date),
+            }
+        )
+        response["sales"] = sections["sales"]
 
-        expenses: Dict = self.get_expenses_response(response, todays_date)
+        expenses: Dict = self.get_expenses_response(sections)
         response["expenses"] = expenses
 
         total_sales = response["sales"]["total_sales"]
@@ -40,14 +44,10 @@ class DailyReport(BaseReport, APIView):
 
         return Response(response, status.HTTP_200_OK)
 
-    def get_expenses_response(self, response: Dict, todays_date) -> Dict:
+    def get_expenses_response(self, sections: Dict) -> Dict:
         expenses: Dict = {}
-        total_misc_expense, misc_qs = self.get_total_misc_expense_and_misc_qs(
-            todays_date
-        )
-        total_main_expense, garbage = self.get_total_main_expense_and_main_qs(
-            todays_date
-        )
+        total_misc_expense, temp_miscellenous_items = sections["misc"]
+        total_main_expense, temp_issued_items = sections["main"]
         misc_inventory = self.assign_total_expense(
             expenses, total_misc_expense, total_main_expense
         )
@@ -55,17 +55,12 @@ class DailyReport(BaseReport, APIView):
         misc_inventory["total_miscellenous_purchases"] = total_misc_expense
 
         expenses["misc_inventory"] = misc_inventory
-        temp_miscellenous_items = self.append_misc_items(misc_qs)
         misc_inventory["miscellenous_items"] = temp_miscellenous_items
 
-        main_inventory: Dict = {}
-        (
-            main_inventory["total_consuption_estimation"],
-            main_qs,
-        ) = self.get_total_main_expense_and_main_qs(todays_date)
-        temp_issued_items = self.append_temp_issued_items(main_qs)
-
-        main_inventory["issued_items"] = temp_issued_items
+        main_inventory: Dict = {
+            "total_consuption_estimation": total_main_expense,
+            "issued_items": temp_issued_items,
+        }
 
         expenses["main_inventory"] = main_inventory
 
@@ -79,18 +74,14 @@ class DailyReport(BaseReport, APIView):
 
     def get_todays_response(self, response: Dict) -> str:
         todays_date = timezone.localdate()
-        response["todays_date"] = todays_date.__str__
+        response["todays_date"] = str(todays_date)
 
         return todays_date
 
-    def get_total_main_expense_and_main_qs(self, todays_date):
-        main_qs = MainInventoryItemRecordStockOut.objects.filter(
+    def get_main_qs(self, todays_date):
+        return MainInventoryItemRecordStockOut.objects.filter(
             date_out=todays_date
-        ).select_related("item_record")
-        total_main_expense: float = self.get_total_main_expense(main_qs)
-        # total_main_expense: float = main_qs.aggregate(total=Sum("get_ppu"))["total"]
-
-        return total_main_expense, main_qs
+        )
 
     def get_total_misc_expense_and_misc_qs(self, todays_date):
         misc_qs = MiscellaneousInventoryRecord.objects.filter(
@@ -103,8 +94,9 @@ class DailyReport(BaseReport, APIView):
         return total_misc_expense or 0.0, misc_qs
 
     def get_queryset(self, todays_date):
+        start, end = get_day_range(todays_date)
         return (
-            CustomerDishPayment.objects.filter(date_paid__date=todays_date)
+            CustomerDishPayment.objects.filter(date_paid__gte=start, date_paid__lt=end)
                 .select_related("customer_dish")
                 .prefetch_related("customer_dish__orders")
         )
@@ -117,13 +109,19 @@ class MonthlyReport(BaseReport, APIView):
 
     def get(self, request, *args, **kwargs):
         response: Dict = {}
-        qs = self.get_queryset(self.this_month)
         self.get_current_month(response)
 
-        sales: Dict = self.get_sales_response(qs)
-        response["sales"] = sales
+        sections: Dict = compute_sections(
+            {
+                "sales": lambda: self.get_sales_response(self.get_queryset(self.this_month)),
+                "misc": lambda: self.get_misc_section(self.this_month),
+                "main": lambda: self.get_main_section(self.this_month),
+                "payrols": lambda: self.get_monthly_payrol(self.this_month),
+            }
+        )
+        response["sales"] = sections["sales"]
 
-        expenses: Dict = self.get_expenses_response(response, self.this_month)
+        expenses: Dict = self.get_expenses_response(sections)
         response["expenses"] = expenses
 
         total_sales = response["sales"]["total_sales"]
@@ -140,48 +138,32 @@ class MonthlyReport(BaseReport, APIView):
                 + str(self.this_month.year)
         )
 
-    def get_expenses_response(self, response: Dict, this_month) -> Dict:
+    def get_expenses_response(self, sections: Dict) -> Dict:
         expenses: Dict = {}
-        total_misc_expense, misc_qs = self.get_total_misc_expense_and_misc_qs(
-            this_month
-        )
-        total_main_expense, gabbage = self.get_total_main_expense_and_main_qs(
-            this_month
-        )
-        total_payrol = self.get_total(this_month)
+        total_misc_expense, temp_miscellenous_items = sections["misc"]
+        total_main_expense, temp_issued_items = sections["main"]
+        monthly_payrol: Dict = sections["payrols"]
         misc_inventory = self.assign_total_expense(
-            expenses, total_misc_expense, total_main_expense, total_payrol
+            expenses, total_misc_expense, total_main_expense, monthly_payrol["total_payment"]
         )
 
         misc_inventory["total_miscellenous_purchases"] = total_misc_expense
 
         expenses["misc_inventory"] = misc_inventory
-        temp_miscellenous_items = self.append_misc_items(misc_qs)
         misc_inventory["miscellenous_items"] = temp_miscellenous_items
 
-        main_inventory: Dict = {}
-        (
-            main_inventory["total_consuption_estimation"],
-            main_qs,
-        ) = self.get_total_main_expense_and_main_qs(this_month)
-        temp_issued_items = self.append_temp_issued_items(main_qs)
-
-        main_inventory["issued_items"] = temp_issued_items
+        main_inventory: Dict = {
+            "total_consuption_estimation": total_main_expense,
+            "issued_items": temp_issued_items,
+        }
 
         expenses["main_inventory"] = main_inventory
 
         # Payrols
-        monthly_payrol = self.get_monthly_payrol(this_month)
-
         expenses["payrols"] = monthly_payrol
 
         return expenses
 
-    def get_total(self, this_month):
-        return RestaurantPayrol.objects.filter(
-            date_paid__month=this_month.month, date_paid__year=this_month.year
-        ).aggregate(total=Sum("amount_paid"))["total"]
-
     def get_monthly_payrol(self, this_month) -> Dict:
         monthly_payrol: Dict = {}
         qs = RestaurantPayrol.objects.filter(
@@ -206,14 +188,10 @@ class MonthlyReport(BaseReport, APIView):
 
         return misc_inventory
 
-    def get_total_main_expense_and_main_qs(self, this_month):
-        main_qs = MainInventoryItemRecordStockOut.objects.filter(
+    def get_main_qs(self, this_month):
+        return MainInventoryItemRecordStockOut.objects.filter(
             date_out__month=this_month.month, date_out__year=this_month.year
-        ).select_related("item_record")
-        total_main_expense: float = self.get_total_main_expense(main_qs)
-        # total_main_expense: float = main_qs.aggregate(total=Sum("get_ppu"))["total"]
-
-        return total_main_expense, main_qs
+        )
 
     def get_total_misc_expense_and_misc_qs(self, this_month):
         misc_qs = MiscellaneousInventoryRecord.objects.filter(
@@ -229,8 +207,7 @@ class MonthlyReport(BaseReport, APIView):
     def get_queryset(self, this_month):
         return (
             CustomerDishPayment.objects.filter(
-                date_paid__date__year=this_month.year,
-                date_paid__date__month=this_month.month,
+                date_paid__gte=get_month_start(this_month), date_paid__lt=get_month_end(this_month)
             )
                 .select_related("customer_dish")
                 .prefetch_related("customer_dish__orders")
@@ -250,53 +227,59 @@ class CustomDateReport(BaseReport, APIView):
         except TypeError:
             return Response({"message": "Choose dates."}, status.HTTP_400_BAD_REQUEST)
 
-        # Get queryset
-        qs = self.get_queryset(date1, date2)
-
         # Get the posted custom dates
         self.get_custom_dates(response, date1, date2)
 
+        sections: Dict = compute_sections(
+            {
+                "orders": lambda: self.get_orders_section(self.get_queryset(date1, date2)),
+                "expenditure": lambda: self.get_total_expenditure(date1, date2),
+                "payroll": lambda: self.get_total(date1, date2),
+                "misc": lambda: self.get_total_misc_expense_and_misc_qs(date1, date2)[0],
+                "main": lambda: self.get_total_main_expense_and_main_qs(date1, date2)[0],
+            }
+        )
+
         # Orders
-        orders_list = []
+        orders_list, total_sales, total_unpaid = sections["orders"]
+        response["orders_list"] = orders_list
+
+        # Total Sales
+        response["total_sales"] = total_sales
+        response["total_unpaid"] = total_unpaid
+        response["total_expenditure"] = sections["expenditure"]
+        response["total_payroll"] = sections["payroll"]
+        response["total_inventory_cost"] = sections["misc"] + sections["main"]
+        costs: int = total_unpaid + response["total_expenditure"] + response["total_payroll"] + response["total_inventory_cost"]
+        response["net_profit"] = total_sales - costs
+
+        return Response(response, status.HTTP_200_OK)
+
+    def get_orders_section(self, qs) -> Tuple[List[Dict], int, int]:
+        orders_list: List[Dict] = []
+        total_sales: int = 0
+        total_unpaid: int = 0
         for q in qs:
+            paid_amount = q.customer_dish.paid_amount
+            remained_amount = q.customer_dish.remained_amount
             orders_list.append({
                 "dish_number": q.customer_dish.dish_number,
                 "date": int(q.customer_dish.date_created.timestamp()),
                 "total_price": q.customer_dish.get_total_price,
-                "total_paid": q.customer_dish.paid_amount,
-                "total_unpaid": q.customer_dish.remained_amount,
+                "total_paid": paid_amount,
+                "total_unpaid": remained_amount,
                 "status": q.customer_dish.status.capitalize(),
                 "order_items": q.customer_dish.dish_detail
             })
-        response["orders_list"] = orders_list
+            total_sales += paid_amount
+            total_unpaid += remained_amount
 
-        # Total Sales
-        total_sales: int = 0
-        total_unpaid: int = 0
-        for i in qs:
-            total_sales += i.customer_dish.paid_amount
-            total_unpaid += i.customer_dish.remained_amount
-        response["total_sales"] = total_sales
-        response["total_unpaid"] = total_unpaid
-        response["total_expenditure"] = Expenditure.objects.filter(
+        return orders_list, total_sales, total_unpaid
+
+    def get_total_expenditure(self, date1, date2) -> int:
+        return Expenditure.objects.filter(
             expenditure_for__in=["restaurant", "both"], date_created__range=(date1, date2)
         ).aggregate(total=Sum("amount"))["total"] or 0
-        restaurant_payrolls: int = \
-            RestaurantPayrol.objects.filter(date_paid__range=(date1, date2)).aggregate(total=Sum("amount_paid"))[
-                "total"]
-
-        response["total_payroll"] = restaurant_payrolls or 0
-        total_misc_expense, misc_qs = self.get_total_misc_expense_and_misc_qs(
-            date1, date2
-        )
-        total_main_expense, gabbage = self.get_total_main_expense_and_main_qs(
-            date1, date2
-        )
-        response["total_inventory_cost"] = total_misc_expense + total_main_expense
-        costs: int = total_unpaid + response["total_expenditure"] + response["total_payroll"] + response["total_inventory_cost"]
-        response["net_profit"] = total_sales - costs
-
-        return Response(response, status.HTTP_200_OK)
 
     def get_custom_dates(self, response: Dict, date1, date2):
         response["dates"] = "{} TO {}".format(str(date1), str(date2))
@@ -367,14 +350,10 @@ class CustomDateReport(BaseReport, APIView):
 
         return misc_inventory
 
-    def get_total_main_expense_and_main_qs(self, date1, date2):
-        main_qs = MainInventoryItemRecordStockOut.objects.filter(
+    def get_main_qs(self, date1, date2):
+        return MainInventoryItemRecordStockOut.objects.filter(
             date_out__range=(date1, date2)
-        ).select_related("item_record")
-        total_main_expense: float = self.get_total_main_expense(main_qs)
-        # total_main_expense: float = main_qs.aggregate(total=Sum("get_ppu"))["total"]
-
-        return total_main_expense, main_qs
+        )
 
     def get_total_misc_expense_and_misc_qs(self, date1, date2):
         misc_qs = MiscellaneousInventoryRecord.objects.filter(
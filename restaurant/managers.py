@@ -6,15 +6,7 @@ class RestaurantPayrolCustomManager(Manager):
     """Custom Manager for Restaurant Payrols"""
 
     def get_monthly_payments(self, queryset) -> List[Dict]:
-        response: List[Dict] = []
-
-        for q in queryset:
-            response.append(
-                {
-                    "id": q.id,
-                    "payee": q.name,
-                    "amount": q.amount_paid,
-                }
-            )
-
-        return response
+        return [
+            {"id": id_, "payee": name, "amount": amount_paid}
+            for id_, name, amount_paid in queryset.values_list("id", "name", "amount_paid")
+        ]
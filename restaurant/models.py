@@ -1,6 +1,7 @@
 from abc import abstractmethod
 from typing import Dict, List, Set
 
+from django.contrib.postgres.indexes import BrinIndex, GinIndex
 from django.db import models
 from django.db.models.aggregates import Sum
 from django.db.models.manager import Manager
@@ -102,22 +103,15 @@ class MainInventoryItemRecord(BaseInventory):
 
     @property
     def stock_out_history(self) -> List[Dict]:
-        response: List[Dict] = []
-        [
-            response.append(
-                {
-                    "history_id": _.id,
-                    "quantity_out": f"{_.quantity_out} {_.item_record.main_inventory_item.item.unit.name}",
-                    "date_out": _.date_out.__str__(),
-                    "created_by": _.created_by.__str__(),
-                }
-            )
-            for _ in self.maininventoryitemrecordstockout_set.select_related(
-                "item_record__main_inventory_item__item__unit"
-            )
-        ]
+        """Uses the prefetched stock outs when the queryset prefetches
+        maininventoryitemrecordstockout_set with created_by selected"""
 
-        return response
+        unit: str = self.main_inventory_item.item.unit.name
+
+        return [
+            stock_out.get_history(unit)
+            for stock_out in self.maininventoryitemrecordstockout_set.all()
+        ]
 
 
 class MainInventoryItemRecordTrunk(models.Model):
@@ -157,6 +151,26 @@ class MainInventoryItemRecordTrunk(models.Model):
     def total_items_available_repr(self) -> str:
         return str(self.total_items_available) + " " + self.item.unit.name
 
+    def get_latest_stocks_out(self) -> List[Dict]:
+        """The latest stock out of every record in one DISTINCT ON query"""
+
+        unit: str = self.item.unit.name
+        latest = (
+            MainInventoryItemRecordStockOut.objects.filter(
+                item_record__in=self.inventory_items.values("id")
+            )
+            .select_related("created_by")
+            # item_record would expand to the record's ordering (-id), which
+            # DISTINCT ON does not accept
+            .order_by("item_record_id", "-id")
+            .distinct("item_record_id")
+        )
+
+        return [
+            stock_out.get_history(unit)
+            for stock_out in sorted(latest, key=lambda _: _.item_record_id, reverse=True)
+        ]
+
     def get_stock_in(self) -> List[Dict]:
         stock_in: List[Dict] = []
         for record in self.inventory_items.select_related(
@@ -207,6 +221,14 @@ class MainInventoryItemRecordStockOut(models.Model):
 
         return float(self.quantity_out * self.item_record.ppu)
 
+    def get_history(self, unit: str) -> Dict:
+        return {
+            "history_id": self.id,
+            "quantity_out": f"{self.quantity_out} {unit}",
+            "date_out": self.date_out.__str__(),
+            "created_by": self.created_by.__str__(),
+        }
+
     def __str__(self):
         return (
             f"{self.item_record.main_inventory_item.item.name}: {self.quantity_out} Out"
@@ -219,7 +241,10 @@ class MainInventoryItemRecordStockOut(models.Model):
         indexes = [
             models.Index(
                 fields=["item_record", "quantity_out", "date_out", "created_by"]
-            )
+            ),
+            models.Index(
+                fields=["item_record", "-id"], name="stock_out_latest_per_record"
+            ),
         ]
 
 
@@ -316,6 +341,8 @@ class CustomerDish(models.Model):
 
     customer_name = models.CharField(max_length=255)
     customer_phone = models.CharField(max_length=15, null=True, blank=True)
+    search_name = models.CharField(max_length=255, blank=True, default="", editable=False)
+    search_phone = models.CharField(max_length=15, blank=True, default="", editable=False)
     orders = models.ManyToManyField(RestaurantCustomerOrder)
     dish_number = models.CharField(
         max_length=255, null=True, blank=True, help_text="Leave blank"
@@ -466,7 +493,12 @@ class CustomerDish(models.Model):
                     "created_by",
                     "status",
                 ]
-            )
+            ),
+            BrinIndex(fields=["date_created"], name="dish_date_brin"),
+            GinIndex(fields=["search_name"], opclasses=["gin_trgm_ops"], name="dish_name_trgm"),
+            models.Index(
+                fields=["search_phone"], opclasses=["varchar_pattern_ops"], name="dish_phone_prefix"
+            ),
         ]
 
 
@@ -489,17 +521,15 @@ class CustomerDishPayment(BasePayment):
         return self.get_total_amount_to_pay - self.amount_paid
 
     def get_payments_history(self) -> List[Dict]:
-        histories: List[Dict] = []
-        for val in CreditCustomerDishPaymentHistory.objects.all():
-            if val.credit_customer_dish_payment.customer_dish_payment == self:
-                histories.append(
-                    {
-                        "amount_paid": float(val.amount_paid),
-                        "date_paid": str(val.date_paid),
-                    }
-                )
+        return [
+            {"amount_paid": float(amount_paid), "date_paid": str(date_paid)}
+            for amount_paid, date_paid in CreditCustomerDishPaymentHistory.objects.filter(
+                credit_customer_dish_payment__customer_dish_payment=self
+            ).values_list("amount_paid", "date_paid")
+        ]
 
-        return histories
+    class Meta(BasePayment.Meta):
+        indexes = [BrinIndex(fields=["date_paid"], name="dish_payment_date_brin")]
 
 
 class CreditCustomerDishPayment(BaseCreditCustomerPayment):
@@ -517,6 +547,7 @@ class CreditCustomerDishPayment(BaseCreditCustomerPayment):
     class Meta:
         verbose_name: str = "Credit Customer Dish Payment"
         verbose_name_plural: str = "Credit Customer Dish Payments"
+        indexes = [models.Index(fields=["customer", "date_created"])]
 
 
 class CreditCustomerDishPaymentHistory(models.Model):
@@ -534,6 +565,7 @@ class CreditCustomerDishPaymentHistory(models.Model):
         ordering: List[str] = ["-id"]
         verbose_name: str = "Credit Customer Dish Payment History"
         verbose_name_plural: str = "Credit Customer Dish Payment Histories"
+        indexes = [models.Index(fields=["credit_customer_dish_payment", "date_paid"])]
 
 
 # Payrolling Management
@@ -549,11 +581,26 @@ class RestaurantPayrol(BasePayrol):
     restaurant_payer = models.ForeignKey(
         User, related_name="restaurant_payer", on_delete=models.CASCADE, db_index=True
     )
+    payee = models.ForeignKey(
+        User,
+        related_name="restaurant_payrolls",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        help_text="The paid worker; name is kept for display and older payments",
+    )
     objects = RestaurantPayrolCustomManager()
 
     def __str__(self):
         return f"{self.name} Paid: {self.amount_paid}"
 
+    class Meta(BasePayrol.Meta):
+        indexes = [
+            models.Index(fields=["payment_method", "amount_paid", "date_paid"]),
+            models.Index(fields=["payee", "date_paid"], name="restaurant_payrol_payee_date"),
+            models.Index(fields=["date_paid"], name="restaurant_payrol_date"),
+        ]
+
     # def get_monthly_payrolls(self):
     #     start_of_month = datetime.date.today().replace(
     #         day=1
@@ -4,13 +4,13 @@ from django.dispatch import receiver
 from django.utils import timezone
 from rest_framework import serializers
 
+from core.models import StockMovement
+from core.movements import record_movements
 from restaurant.models import (
     CreditCustomerDishPaymentHistory,
-    MainInventoryItemRecordStockOut,
     MiscellaneousInventoryRecord,
     MainInventoryItemRecord, MainInventoryItemRecordTrunk,
 )
-from restaurant.utils import get_recipients
 
 
 @receiver(post_save, sender=MainInventoryItemRecord)
@@ -35,37 +35,27 @@ def set_update_misc_inventory(sender, instance, created, **kwargs):
         instance.available_quantity = instance.quantity
         instance.save()
         # Set all the previous misc items to unavailable
-        MiscellaneousInventoryRecord.objects.filter(
+        previous = MiscellaneousInventoryRecord.objects.filter(
             item=instance.item, stock_status="available"
-        ).exclude(pk=instance.pk).update(
+        ).exclude(pk=instance.pk)
+        written_off = list(previous.filter(available_quantity__gt=0).values_list("id", "available_quantity"))
+        previous.update(
             stock_status="unavailable",
             available_quantity=0,
             date_perished=timezone.localdate(),
         )
-
-
-@receiver(post_save, sender=MainInventoryItemRecordStockOut)
-def send_notification(sender, instance, created, **kwargs):
-    if (
-            created
-            and instance.item_record.threshold >= instance.item_record.available_quantity
-    ):
-        # Send notification
-        message: str = (
-            "{} is nearly out of stock. The remained quantity is {} {}".format(
-                instance.item_record.main_inventory_item.item.name,
-                instance.item_record.available_quantity,
-                instance.item_record.main_inventory_item.item.unit.name,
-            )
+        record_movements(
+            [
+                StockMovement(
+                    item_id=instance.item_id,
+                    section="miscellaneous",
+                    kind="adjustment",
+                    quantity=-available_quantity,
+                    record_id=record_id,
+                )
+                for record_id, available_quantity in written_off
+            ]
         )
-        send_notif(instance, message)
-
-
-def send_notif(instance, message: str):
-    instance.item_record.send_notification(
-        message=message,
-        recipients=get_recipients(),
-    )
 
 
 @receiver(post_save, sender=CreditCustomerDishPaymentHistory)
@@ -1,5 +1,5 @@
 from user.models import User
-from typing import List
+from typing import List, Optional
 
 
 def get_recipients():
@@ -10,7 +10,7 @@ def get_recipients():
     return response
 
 
-def send_notification(message: str, recipients: List[str]):
+def send_notification(message: str, recipients: List[str], source_addr: Optional[str] = None):
     from BeemAfrica import Authorize, SMS
     import requests
     import json
@@ -21,7 +21,10 @@ def send_notification(message: str, recipients: List[str]):
     Authorize(api_key, secret_key)
 
     try:
-        SMS.send_sms(message, recipients)
+        if source_addr:
+            SMS.send_sms(message, recipients, source_addr=source_addr)
+        else:
+            SMS.send_sms(message, recipients)
     except Exception as e:
         error_name: str = str(e)
         return requests.models.Response(
@@ -1,5 +1,6 @@
 from typing import Dict, List, NoReturn, Tuple
 
+from django.db.models import Count, F, Max, Prefetch, Q
 from django.db.models.aggregates import Sum
 from django.db.models.query import QuerySet
 from django.utils import timezone
@@ -10,8 +11,11 @@ from rest_framework.generics import ListAPIView
 from rest_framework.response import Response
 
 from core.models import CreditCustomer, Item
+from core.payroll import get_month_range, get_payee, get_payee_totals
+from core.reference import get_reference_data
+from core.serialization import FlatSerializer, date_part, time_part
 from core.serializers import InventoryItemSerializer
-from core.utils import orders_number_generator
+from core.utils import get_day_range, orders_number_generator
 from restaurant.models import (
     CreditCustomerDishPaymentHistory,
     MainInventoryItemRecordStockOut,
@@ -37,7 +41,6 @@ from restaurant.serializers import (
     AdditiveSerializer,
     MenuSerializer, ChangeMenuImageSerializer,
 )
-from restaurant.utils import get_recipients
 from user.models import User
 
 
@@ -49,6 +52,9 @@ class MenuViewSet(viewsets.ModelViewSet):
     serializer_class = MenuSerializer
     menu_image_class = ChangeMenuImageSerializer
 
+    def list(self, request, *args, **kwargs):
+        return Response(data=get_reference_data("menus"), status=status.HTTP_200_OK)
+
     def update(self, request, pk=None):
         instance = self.get_object()
         name = request.data.get("name")
@@ -134,14 +140,8 @@ class MainInventoryItemRecordTrunkView(viewsets.ModelViewSet):
     )
     def get_stocks_out(self, request, pk=None):
         try:
-            trunk = MainInventoryItemRecordTrunk.objects.get(id=pk)
-            res = []
-            for i in trunk.inventory_items.all():
-                try:
-                    res.append(i.stock_out_history[0])
-                except IndexError:
-                    continue
-            return Response(data=res, status=status.HTTP_200_OK)
+            trunk = MainInventoryItemRecordTrunk.objects.select_related("item__unit").get(id=pk)
+            return Response(data=trunk.get_latest_stocks_out(), status=status.HTTP_200_OK)
         except MainInventoryItemRecordTrunk.DoesNotExist:
             return Response(data={"message": "Not Contents"}, status=status.HTTP_204_NO_CONTENT)
 
@@ -152,6 +152,11 @@ class MainInventoryItemRecordViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return MainInventoryItemRecord.objects.select_related(
             "main_inventory_item__item", "main_inventory_item__item__unit"
+        ).prefetch_related(
+            Prefetch(
+                "maininventoryitemrecordstockout_set",
+                queryset=MainInventoryItemRecordStockOut.objects.select_related("created_by"),
+            )
         )
 
     def create(self, request, *args, **kwargs):
@@ -213,70 +218,58 @@ class MainInventoryItemRecordViewSet(viewsets.ModelViewSet):
         methods=["GET"],
     )
     def list_items(self, request, *args, **kwargs) -> Response:
-        names: List = self.get_items_names(self.get_queryset())
-        response: List = []
-        data = self.get_response(names, response)
-
-        return Response(data, status.HTTP_200_OK)
-
-    def get_response(self, names, response):
-        for index in range(len(names)):
-            temp_response: Dict = {"id": index + 1, "item_name": names[index]}
-            item_qs, available_quantity, unit = self.get_items_available_quantity_unit(
-                names, index
+        """Per item summary from one GROUP BY query; pass ?records=false to
+        skip the nested records (fetched with one more query otherwise)"""
+
+        summary = (
+            MainInventoryItemRecord.objects.values(
+                "main_inventory_item__item",
+                item_name=F("main_inventory_item__item__name"),
+                unit=F("main_inventory_item__item__unit__name"),
             )
-            temp_response["available_quantity"] = str(available_quantity) + " " + unit
-            self.get_stock_status(temp_response, available_quantity)
-            self.get_records(response, temp_response, item_qs, unit)
-
-        return response
-
-    def get_records(self, response, temp_response, item_qs, unit) -> NoReturn:
-        temp_response["records_items"] = []
-        temp_records: Dict = {}
-        counter: int = 0
-        for item in item_qs:
-            temp_records["record_id"] = counter + 1
-            temp_records["available_quantity"] = (
-                    str(item.available_quantity) + " " + unit
+            .annotate(available=Sum("available_quantity"), latest_id=Max("id"))
+            .order_by("-latest_id")
+        )
+        records: Dict[int, List[Dict]] = {}
+        if request.query_params.get("records") != "false":
+            records = self.get_records()
+
+        response: List[Dict] = []
+        for index, item in enumerate(summary):
+            available: int = item["available"] or 0
+            response.append(
+                {
+                    "id": index + 1,
+                    "item_name": item["item_name"],
+                    "available_quantity": f"{available} {item['unit']}",
+                    "stock_status": "Available" if available > 0 else "Unavailable",
+                    "records_items": records.get(item["main_inventory_item__item"], []),
+                }
             )
-            temp_records["received_quantity"] = str(item.quantity) + " " + unit
-            temp_records["estimated_sales"] = item.estimate_sales
-            temp_records["estimated_profit"] = item.estimate_profit
-            temp_records["stock_issued_history"] = item.stock_out_history
-            temp_response["records_items"].append(temp_records)
-            temp_records: Dict = {}
-            counter += 1
-        response.append(temp_response)
-
-    def get_stock_status(
-            self, temp_response: dict, available_quantity: int
-    ) -> NoReturn:
-        if available_quantity > 0:
-            temp_response["stock_status"] = "Available"
-        else:
-            temp_response["stock_status"] = "Unavailable"
 
-    def get_items_available_quantity_unit(
-            self, names, index
-    ) -> Tuple[QuerySet, int, str]:
-        item_qs = self.get_queryset().filter(main_inventory_item__item__name=names[index])
-        available_quantity = item_qs.aggregate(
-            available_quantity=Sum("available_quantity")
-        )["available_quantity"]
-        item = item_qs.first()
-        unit = item.main_inventory_item.item.unit.name
+        return Response(response, status.HTTP_200_OK)
 
-        return item_qs, available_quantity, unit
+    def get_records(self) -> Dict[int, List[Dict]]:
+        """Records of every item keyed by item id, newest first"""
 
-    def get_items_names(self, queryset) -> List:
-        names: List = []
-        for item in queryset:
-            name = item.main_inventory_item.item.name
-            if name not in names:
-                names.append(name)
+        records: Dict[int, List[Dict]] = {}
+        for record in self.get_queryset():
+            unit: str = record.main_inventory_item.item.unit.name
+            item_records: List[Dict] = records.setdefault(
+                record.main_inventory_item.item_id, []
+            )
+            item_records.append(
+                {
+                    "record_id": len(item_records) + 1,
+                    "available_quantity": f"{record.available_quantity} {unit}",
+                    "received_quantity": f"{record.quantity} {unit}",
+                    "estimated_sales": record.estimate_sales,
+                    "estimated_profit": record.estimate_profit,
+                    "stock_issued_history": record.stock_out_history,
+                }
+            )
 
-        return names
+        return records
 
     @action(
         detail=False,
@@ -306,27 +299,8 @@ class MainInventoryItemRecordViewSet(viewsets.ModelViewSet):
                 )
             self.create_stock_out(request, quantity_out, item)
             self.reduce_availability(quantity_out, item, available_quantity)
-            if (
-                    item.threshold >= item.available_quantity > 0
-            ):
-                item.send_notification(
-                    message="{} is nearly out of stock. The remained quantity is {} {}".format(
-                        item.main_inventory_item.item.name,
-                        item.available_quantity,
-                        item.main_inventory_item.item.unit.name,
-                    ),
-                    recipients=get_recipients(),
-                )  # mzigo unakaribia kuisha
             if item.available_quantity == 0:
                 self.set_unavailable(item)
-                item.send_notification(
-                    message="{} is out of stock. The remained quantity is {} {}".format(
-                        item.main_inventory_item.item.name,
-                        item.available_quantity,
-                        item.main_inventory_item.item.unit.name,
-                    ),
-                    recipients=get_recipients(),
-                )  # mzigo umeisha
             return Response(
                 {
                     "item": str(item),
@@ -410,70 +384,69 @@ class MiscellaneousInventoryRecordViewSet(viewsets.ModelViewSet):
         methods=["GET"],
     )
     def list_items(self, request, *args, **kwargs):
-        names: List = self.get_items_names(self.get_queryset())
-        response: List = []
+        """Per item summary from one GROUP BY query; pass ?records=false to
+        skip the nested records (fetched with one more query otherwise)"""
+
+        summary = (
+            MiscellaneousInventoryRecord.objects.values("item", name=F("item__name"))
+            .annotate(
+                available_records=Count("id", filter=Q(stock_status="available")),
+                latest_id=Max("id"),
+            )
+            .order_by("-latest_id")
+        )
+        records: Dict[int, List[Dict]] = {}
+        if request.query_params.get("records") != "false":
+            records = self.get_records()
+
+        response: List[Dict] = []
+        for index, item in enumerate(summary):
+            response.append(
+                {
+                    "id": index + 1,
+                    "name": item["name"],
+                    "stock_status": "Available" if item["available_records"] else "Unavailable",
+                    "items": records.get(item["item"], []),
+                }
+            )
 
-        data = self.get_response(names, response)
+        return Response(response, status.HTTP_200_OK)
 
-        return Response(data, status.HTTP_200_OK)
+    def get_records(self) -> Dict[int, List[Dict]]:
+        """Records of every item keyed by item id, newest first"""
 
-    def get_response(self, names: list, response: list) -> List:
-        for i in range(len(names)):
-            temp_resp: Dict = {"id": i + 1, "name": names[i], "stock_status": self.get_stock_status(names[i]),
-                               "items": []}
-            qs = self.queryset.filter(item__name=names[i])
-            temp: Dict = {}
-            self.append_items(temp_resp, qs, temp)
-            response.append(temp_resp)
-
-        return response
-
-    def append_items(self, temp_resp: dict, qs, temp: dict):
-        counter: int = 0
-        for j in qs:
-            counter += 1
-            temp: Dict = {"item_id": counter, "purchased_quantity": j.quantity,
-                          "available_quantity": j.available_quantity, "purchasing_price": j.purchasing_price,
-                          "date_purchased": j.date_purchased}
-            temp_resp["items"].append(temp)
-
-    def get_stock_status(self, item_name: str) -> str:
-        qs = self.queryset.filter(item__name=item_name, stock_status="available")
-        if qs:
-            return "Available"
-        return "Unavailable"
-
-    def get_items_names(self, queryset) -> List:
-        response: List = []
-        for item in queryset:
-            if item.item.name not in response:
-                response.append(item.item.name)
-
-        return response
+        records: Dict[int, List[Dict]] = {}
+        for record in MiscellaneousInventoryRecord.objects.order_by("-id"):
+            item_records: List[Dict] = records.setdefault(record.item_id, [])
+            item_records.append(
+                {
+                    "item_id": len(item_records) + 1,
+                    "purchased_quantity": record.quantity,
+                    "available_quantity": record.available_quantity,
+                    "purchasing_price": record.purchasing_price,
+                    "date_purchased": record.date_purchased,
+                }
+            )
+
+        return records
 
 
 class RestaurantCustomerOrderViewSet(viewsets.ModelViewSet):
     serializer_class = RestaurantCustomerOrderSerializer
+    output_serializer = FlatSerializer(
+        sub_menu="sub_menu__name",
+        quantity="quantity",
+        order_number="order_number",
+        created_by="created_by__username",
+        date_created=("date_created", date_part),
+        time_created=("date_created", time_part),
+    )
 
     def get_queryset(self):
         return RestaurantCustomerOrder.objects.select_related("sub_menu", "created_by")
 
     def list(self, request, *args, **kwargs):
-        res: List[Dict] = []
-        [
-            res.append(
-                {
-                    "sub_menu": order.sub_menu.name,
-                    "quantity": order.quantity,
-                    "order_number": order.order_number,
-                    "created_by": order.created_by.username,
-                    "date_created": str(order.date_created).split(" ")[0],
-                    "time_created": str(order.date_created).split(" ")[1].split(".")[0],
-                }
-            )
-            for order in self.get_queryset()
-        ]
-        return Response(res, status=status.HTTP_200_OK)
+        return Response(self.output_serializer.serialize(self.get_queryset()), status=status.HTTP_200_OK)
 
     def create(self, request, *args, **kwargs):
         serializer = RestaurantCustomerOrderSerializer(data=request.data)
@@ -498,8 +471,8 @@ class RestaurantCustomerOrderViewSet(viewsets.ModelViewSet):
             "quantity": object.quantity,
             "order_number": object.order_number,
             "created_by": object.created_by.username,
-            "date_created": str(object.date_created).split("T")[0],
-            "time_created": str(object.date_created).split("T")[1].split(".")[0],
+            "date_created": date_part(object.date_created),
+            "time_created": time_part(object.date_created),
         }
 
 
@@ -536,9 +509,11 @@ class CustomerDishViewSet(viewsets.ModelViewSet):
     serializer_class = OutputSerializer
 
     def get_queryset(self):
+        start, end = get_day_range(self.today.date())
         return CustomerDish.objects.prefetch_related("orders").filter(
             status__in=["partial", "unpaid", "paid"],
-            date_created__date=self.today.date()
+            date_created__gte=start,
+            date_created__lt=end,
         )
 
     def list(self, request, *args, **kwargs):
@@ -654,7 +629,6 @@ class CustomerDishPaymentViewSet(viewsets.ModelViewSet):
     def list(self, request, *args, **kwargs):
         response: List[Dict] = []
         for qs in self.get_queryset():
-            splitted_date = str(qs.date_paid).split(" ")
             response.append(
                 {
                     "id": qs.id,
@@ -662,8 +636,8 @@ class CustomerDishPaymentViewSet(viewsets.ModelViewSet):
                     "payment_status": qs.payment_status,
                     "payment_method": qs.payment_method,
                     "amount_paid": float(qs.amount_paid),
-                    "date_paid": splitted_date[0],
-                    "time_paid": splitted_date[1].split(".")[0],
+                    "date_paid": date_part(qs.date_paid),
+                    "time_paid": time_part(qs.date_paid),
                     "customer_dish": {
                         "dish_id": qs.customer_dish.id,
                         "customer_name": qs.customer_dish.customer_name,
@@ -742,8 +716,8 @@ class CustomerDishPaymentViewSet(viewsets.ModelViewSet):
         for qs in filtered_qs:
             temp_pay: Dict = {}
             temp_pay["paid_amount"] = qs.amount_paid
-            temp_pay["date_paid"] = str(qs.date_paid).split(" ")[0]
-            temp_pay["time_paid"] = str(qs.date_paid).split(" ")[1].split(".")[0]
+            temp_pay["date_paid"] = date_part(qs.date_paid)
+            temp_pay["time_paid"] = time_part(qs.date_paid)
             temp_res["payments_history"].append(temp_pay)
 
     @action(
@@ -762,8 +736,8 @@ class CustomerDishPaymentViewSet(viewsets.ModelViewSet):
                     "payable_amount": qs.get_total_amount_to_pay,
                     "paid_amount": qs.amount_paid,
                     "remaining_amount": qs.get_remaining_amount,
-                    "date_paid": str(qs.date_paid).split(" ")[0],
-                    "time_paid": str(qs.date_paid).split(" ")[1].split(".")[0],
+                    "date_paid": date_part(qs.date_paid),
+                    "time_paid": time_part(qs.date_paid),
                     "dish_detail": qs.customer_dish.get_dish_detail,
                     "payments_history": qs.get_payments_history(),
                 }
@@ -1037,6 +1011,8 @@ class RestaurantPayrolViewSet(viewsets.ModelViewSet):
         payment_method = request.data.get("payment_method")
         if restaurant_payee:
             instance.name = restaurant_payee
+        if "payee" in request.data:
+            instance.payee = get_payee(request.data.get("payee"))
         if amount_paid:
             instance.amount_paid = amount_paid
         if payment_method:
@@ -1088,27 +1064,26 @@ class RestaurantPayrolViewSet(viewsets.ModelViewSet):
     )
     def get_monthly_payments(self, request, *args, **kwargs):
         today = timezone.localdate()
+        start, end = get_month_range(today.year, today.month)
         payments_this_month = RestaurantPayrol.objects.filter(
-            date_paid__year=today.year,
-            date_paid__month=today.month,
-        ).select_related("restaurant_payer")
-        response: Dict = {}
-        response["total_paid_amount"] = (
-                payments_this_month.aggregate(total=Sum("amount_paid"))["total"] or 0
+            date_paid__gte=start, date_paid__lt=end
         )
-        payments: List = []
-        [
-            payments.append(
-                {
-                    "id": payment.id,
-                    "payee": payment.name,
-                    "payer": payment.restaurant_payer.username,
-                    "amount_paid": payment.amount_paid,
-                    "date_paid": payment.date_paid,
-                    "payment_method": payment.payment_method,
-                }
+        payments: List[Dict] = list(
+            payments_this_month.values(
+                "id",
+                "amount_paid",
+                "date_paid",
+                "payment_method",
+                "payee_id",
+                payee_name=F("name"),
+                payer=F("restaurant_payer__username"),
             )
-            for payment in payments_this_month
-        ]
-        response["payments"] = payments
+        )
+        for payment in payments:
+            payment["payee"] = payment.pop("payee_name")
+        response: Dict = {
+            "total_paid_amount": sum(payment["amount_paid"] for payment in payments),
+            "payments": payments,
+            "payees": list(get_payee_totals(payments_this_month)),
+        }
         return Response(response, status.HTTP_200_OK)
@@ -0,0 +1,33 @@
+"""
+ASGI config for waiterbackend project.
+
+It exposes the ASGI callable as a module-level variable named ``application``:
+HTTP is served by Django and websockets by the channels routes.
+
+Run with e.g. ``daphne -b 0.0.0.0 -p 8001 waiterbackend.asgi:application``
+next to the gunicorn (WSGI) workers serving the API (see gunicorn.conf.py),
+with the proxy routing websocket paths (``ws/``) to it.
+Display events published by the WSGI workers reach the websockets through
+the Redis channel layer, which both processes must share: set REDIS_URL for
+both. Without it the layer is in-memory and only serves a single process.
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'waiterbackend.settings')
+
+django_application = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+
+from core.consumers import TokenAuthMiddleware  # noqa: E402
+from core.routing import websocket_urlpatterns  # noqa: E402
+
+application = ProtocolTypeRouter(
+    {
+        "http": django_application,
+        "websocket": TokenAuthMiddleware(URLRouter(websocket_urlpatterns)),
+    }
+)
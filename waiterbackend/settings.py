@@ -1,5 +1,6 @@
 from icecream import ic
 import os
+import sys
 
 ic.enable()
 
@@ -18,6 +19,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "core.apps.CoreConfig",
     "user.apps.UserConfig",
     "bar.apps.BarConfig",
@@ -25,6 +27,7 @@ INSTALLED_APPS = [
     "restaurant.apps.RestaurantConfig",
     "rest_framework",
     "rest_framework.authtoken",
+    "channels",
 ]
 
 AUTH_USER_MODEL = "user.User"
@@ -50,6 +53,10 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
 }
 
 TEMPLATES = [
@@ -70,6 +77,49 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "waiterbackend.wsgi.application"
 
+ASGI_APPLICATION = "waiterbackend.asgi.application"
+
+# Unset on single node setups, which then keep the channel layer in process
+REDIS_URL = os.environ.get("REDIS_URL")
+
+TESTING = sys.argv[1:2] == ["test"]
+
+# Display events are published by the gunicorn (WSGI) workers serving the API
+# and delivered by the daphne (ASGI) process holding the websockets, so with
+# both running the layer must be Redis, shared across processes.
+if REDIS_URL and not TESTING:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {
+                "hosts": [f"{REDIS_URL}/0"],
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer",
+        },
+    }
+
+# Shared by every gunicorn worker, so invalidating a cached entry (reference
+# data, analytics, aging) on a write is seen by all of them. Single node
+# setups and tests keep a cache per process.
+if REDIS_URL and not TESTING:
+    CACHES = {
+        "default": {
+            "BACKEND": "django_redis.cache.RedisCache",
+            "LOCATION": f"{REDIS_URL}/1",
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+    }
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql_psycopg2",
@@ -78,6 +128,8 @@ DATABASES = {
         "PASSWORD": "shedrackGodso4n",
         "USER": "waiteradm",
         "PORT": 5432,
+        # Persistent connections, so the one opened by the worker prewarm is reused
+        "CONN_MAX_AGE": 60,
     }
 }
 
@@ -4,9 +4,9 @@ from django.conf.urls import include
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path
-from rest_framework.schemas import get_schema_view
 
 from bar import views as bar_views
+from core.schema import get_cached_schema_view
 from reports import combined_views as combined_views
 from reports import restaurant_views as reports_restaurant_views
 from restaurant import views as restaurant_views
@@ -53,7 +53,12 @@ urlpatterns = (
                 "w/api/bar/reports/get-custom-report",
                 combined_views.CustomDateReport.as_view(),
             ),
-            path("waiterapi/", get_schema_view(
+            # Reports Bar + Restaurant
+            path(
+                "w/api/reports/get-profit-and-loss",
+                combined_views.ProfitAndLossReport.as_view(),
+            ),
+            path("waiterapi/", get_cached_schema_view(
                 title="Waiter",
                 description="API for Waiter Project",
                 version="1.0.0"